@@ -0,0 +1,73 @@
+"""add entity_versions for etags
+
+Revision ID: 4a7c9e15d3f2
+Revises: 8d2e6f41a0b3
+Create Date: 2026-10-18 16:40:27.392114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7c9e15d3f2'
+down_revision: Union[str, Sequence[str], None] = '8d2e6f41a0b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LOG_CHANGE_V1 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        INSERT INTO change_log (user_id, entity, entity_id, op)
+        VALUES (rec.user_id, TG_ARGV[0], rec.id, CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+LOG_CHANGE_V2 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        INSERT INTO change_log (user_id, entity, entity_id, op)
+        VALUES (rec.user_id, TG_ARGV[0], rec.id, CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END);
+        INSERT INTO entity_versions (user_id, entity, version)
+        VALUES (rec.user_id, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, entity) DO UPDATE SET version = entity_versions.version + 1;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('entity_versions',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('entity', sa.String(length=16), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'entity')
+    )
+    op.execute(LOG_CHANGE_V2)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(LOG_CHANGE_V1)
+    op.drop_table('entity_versions')
@@ -0,0 +1,47 @@
+"""add task full-text and trigram search
+
+Revision ID: 5d8e2b9a4c71
+Revises: e27a4c8b5f19
+Create Date: 2026-10-18 21:14:03.218845
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8e2b9a4c71'
+down_revision: Union[str, Sequence[str], None] = 'e27a4c8b5f19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Lets user_id (a plain btree-type column) sit in the GIN indexes
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    # Adding a stored generated column rewrites the table once
+    op.add_column('tasks', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=False))
+    op.create_index('ix_tasks_user_id_search_vector', 'tasks', ['user_id', 'search_vector'], unique=False, postgresql_using='gin')
+    op.create_index(
+        'ix_tasks_user_id_title_trgm', 'tasks', ['user_id', 'title'], unique=False,
+        postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_user_id_title_trgm', table_name='tasks', postgresql_using='gin')
+    op.drop_index('ix_tasks_user_id_search_vector', table_name='tasks', postgresql_using='gin')
+    op.drop_column('tasks', 'search_vector')
+    # Extensions are left installed; other database objects may rely on them
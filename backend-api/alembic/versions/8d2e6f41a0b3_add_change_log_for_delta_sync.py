@@ -0,0 +1,69 @@
+"""add change_log for delta sync
+
+Revision ID: 8d2e6f41a0b3
+Revises: c3f1a9d2b7e4
+Create Date: 2026-10-18 14:02:11.503318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e6f41a0b3'
+down_revision: Union[str, Sequence[str], None] = 'c3f1a9d2b7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRACKED_TABLES = {'tasks': 'task', 'projects': 'project', 'categories': 'category'}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('change_log',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('txid', sa.BigInteger(), server_default=sa.text('pg_current_xact_id()::text::bigint'), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('entity', sa.String(length=16), nullable=False),
+    sa.Column('entity_id', sa.UUID(), nullable=False),
+    sa.Column('op', sa.String(length=8), nullable=False),
+    sa.Column('changed_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_change_log_user_id_txid_id', 'change_log', ['user_id', 'txid', 'id'], unique=False)
+    op.create_index('ix_change_log_changed_at', 'change_log', ['changed_at'], unique=False)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+        DECLARE
+            rec record;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                rec := OLD;
+            ELSE
+                rec := NEW;
+            END IF;
+            INSERT INTO change_log (user_id, entity, entity_id, op)
+            VALUES (rec.user_id, TG_ARGV[0], rec.id, CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table, entity in TRACKED_TABLES.items():
+        op.execute(
+            f"CREATE TRIGGER {table}_log_change AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION log_change('{entity}')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRACKED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_log_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS log_change()")
+    op.drop_index('ix_change_log_changed_at', table_name='change_log')
+    op.drop_index('ix_change_log_user_id_txid_id', table_name='change_log')
+    op.drop_table('change_log')
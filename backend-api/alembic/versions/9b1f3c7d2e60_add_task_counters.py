@@ -0,0 +1,107 @@
+"""add task counters to projects and categories
+
+Revision ID: 9b1f3c7d2e60
+Revises: 4a7c9e15d3f2
+Create Date: 2026-10-18 19:05:12.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1f3c7d2e60'
+down_revision: Union[str, Sequence[str], None] = '4a7c9e15d3f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COUNTED_TABLES = {'projects': 'project_id', 'categories': 'category_id'}
+
+# Net per-parent change of a statement's rows. Updates contribute -1 for the old
+# row and +1 for the new one, so edits that don't move a task cancel out and
+# leave the parent untouched (no change_log row, no ETag bump).
+APPLY_DELTAS = """
+        WITH delta AS ({source}),
+        projects_done AS (
+            UPDATE projects p
+            SET task_count = p.task_count + d.total,
+                completed_count = p.completed_count + d.done,
+                progress = CASE WHEN p.task_count + d.total > 0
+                                THEN (p.completed_count + d.done) * 100 / (p.task_count + d.total)
+                                ELSE 0 END
+            FROM (SELECT project_id AS id, sum(total) AS total, sum(done) AS done
+                  FROM delta WHERE project_id IS NOT NULL GROUP BY project_id) d
+            WHERE p.id = d.id AND (d.total <> 0 OR d.done <> 0)
+        )
+        UPDATE categories c
+        SET task_count = c.task_count + d.total,
+            completed_count = c.completed_count + d.done
+        FROM (SELECT category_id AS id, sum(total) AS total, sum(done) AS done
+              FROM delta WHERE category_id IS NOT NULL GROUP BY category_id) d
+        WHERE c.id = d.id AND (d.total <> 0 OR d.done <> 0);
+"""
+NEW_ROWS = "SELECT project_id, category_id, 1 AS total, is_completed::int AS done FROM new_rows"
+OLD_ROWS = "SELECT project_id, category_id, -1 AS total, -is_completed::int AS done FROM old_rows"
+BOTH_ROWS = f"{NEW_ROWS} UNION ALL {OLD_ROWS}"
+
+# Statement-level with transition tables: a batch of N tasks touches each
+# parent row once, not N times
+TASK_COUNTERS = f"""
+    CREATE OR REPLACE FUNCTION task_counters() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {APPLY_DELTAS.format(source=NEW_ROWS)}
+        ELSIF TG_OP = 'UPDATE' THEN
+            {APPLY_DELTAS.format(source=BOTH_ROWS)}
+        ELSE
+            {APPLY_DELTAS.format(source=OLD_ROWS)}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+TRIGGERS = {
+    'tasks_counters_insert': 'AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows',
+    'tasks_counters_update': 'AFTER UPDATE ON tasks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'tasks_counters_delete': 'AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in COUNTED_TABLES:
+        op.add_column(table, sa.Column('task_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('completed_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_tasks_project_id_due_date_open', 'tasks', ['project_id', 'due_date'], unique=False, postgresql_where=sa.text('NOT is_completed'))
+    op.create_index('ix_tasks_category_id_due_date_open', 'tasks', ['category_id', 'due_date'], unique=False, postgresql_where=sa.text('NOT is_completed'))
+
+    op.execute(TASK_COUNTERS)
+    for name, event in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {name} {event} FOR EACH STATEMENT EXECUTE FUNCTION task_counters()")
+
+    # Backfill; from here on the triggers keep the counters current
+    for table, column in COUNTED_TABLES.items():
+        op.execute(
+            f"UPDATE {table} t SET task_count = s.total, completed_count = s.done "
+            f"FROM (SELECT {column} AS id, count(*) AS total, count(*) FILTER (WHERE is_completed) AS done "
+            f"FROM tasks WHERE {column} IS NOT NULL GROUP BY {column}) s WHERE t.id = s.id"
+        )
+    op.execute(
+        "UPDATE projects SET progress = CASE WHEN task_count > 0 THEN completed_count * 100 / task_count ELSE 0 END"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON tasks")
+    op.execute("DROP FUNCTION IF EXISTS task_counters()")
+    op.drop_index('ix_tasks_category_id_due_date_open', table_name='tasks', postgresql_where=sa.text('NOT is_completed'))
+    op.drop_index('ix_tasks_project_id_due_date_open', table_name='tasks', postgresql_where=sa.text('NOT is_completed'))
+    for table in COUNTED_TABLES:
+        op.drop_column(table, 'completed_count')
+        op.drop_column(table, 'task_count')
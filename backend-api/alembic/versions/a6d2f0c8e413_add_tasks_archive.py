@@ -0,0 +1,77 @@
+"""add partitioned tasks_archive for completed tasks
+
+Revision ID: a6d2f0c8e413
+Revises: f3a8c51e9d27
+Create Date: 2026-10-18 23:48:09.215734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2f0c8e413'
+down_revision: Union[str, Sequence[str], None] = 'f3a8c51e9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The archive job sets app.archiving for its own transactions. Moving a task out
+# of `tasks` is not a delete as far as its project and category are concerned,
+# so the counters keep including archived tasks.
+COUNTERS_DELETE = 'AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT'
+SKIP_WHEN_ARCHIVING = "WHEN (current_setting('app.archiving', true) IS DISTINCT FROM 'on')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tasks_archive',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('category_id', sa.UUID(), nullable=True),
+    sa.Column('project_id', sa.UUID(), nullable=True),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('is_completed', sa.Boolean(), nullable=False),
+    sa.Column('due_date', postgresql.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('completed_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('archived_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id', 'completed_at'),
+    postgresql_partition_by='RANGE (completed_at)'
+    )
+    op.create_index('ix_tasks_archive_user_id_created_at_id', 'tasks_archive', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_archive_user_id_updated_at_id', 'tasks_archive', ['user_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_tasks_archive_user_id_due_date_id', 'tasks_archive', ['user_id', 'due_date', 'id'], unique=False)
+    op.create_index('ix_tasks_archive_user_id_priority_id', 'tasks_archive', ['user_id', 'priority', 'id'], unique=False)
+    op.create_index('ix_tasks_archive_category_id', 'tasks_archive', ['category_id'], unique=False)
+    op.create_index('ix_tasks_archive_project_id', 'tasks_archive', ['project_id'], unique=False)
+    op.create_index('ix_tasks_completed_at_done', 'tasks', ['completed_at'], unique=False, postgresql_where=sa.text('is_completed'))
+
+    op.execute('DROP TRIGGER tasks_counters_delete ON tasks')
+    op.execute(f'CREATE TRIGGER tasks_counters_delete {COUNTERS_DELETE} {SKIP_WHEN_ARCHIVING} EXECUTE FUNCTION task_counters()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived tasks go back to the hot table first; they are still counted
+    op.execute('ALTER TABLE tasks DISABLE TRIGGER tasks_counters_insert')
+    op.execute(
+        'INSERT INTO tasks (id, user_id, category_id, project_id, title, description, is_completed, '
+        'due_date, priority, updated_at, created_at, completed_at) '
+        'SELECT id, user_id, category_id, project_id, title, description, is_completed, '
+        'due_date, priority, updated_at, created_at, completed_at FROM tasks_archive'
+    )
+    op.execute('ALTER TABLE tasks ENABLE TRIGGER tasks_counters_insert')
+    op.execute('DROP TRIGGER tasks_counters_delete ON tasks')
+    op.execute(f'CREATE TRIGGER tasks_counters_delete {COUNTERS_DELETE} EXECUTE FUNCTION task_counters()')
+    op.drop_index('ix_tasks_completed_at_done', table_name='tasks', postgresql_where=sa.text('is_completed'))
+    op.drop_table('tasks_archive')
@@ -0,0 +1,98 @@
+"""archive moves stay out of change_log
+
+Revision ID: a9c4e2f7d816
+Revises: f6a1d3c9e825
+Create Date: 2026-10-19 11:26:05.917342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4e2f7d816'
+down_revision: Union[str, Sequence[str], None] = 'f6a1d3c9e825'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LOG_CHANGE_V4 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF current_setting('app.purging', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            IF OLD.deleted_at IS NOT NULL THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        INSERT INTO change_log (user_id, entity, entity_id, op)
+        VALUES (
+            rec.user_id, TG_ARGV[0], rec.id,
+            CASE WHEN TG_OP = 'DELETE' OR rec.deleted_at IS NOT NULL THEN 'delete' ELSE 'upsert' END
+        );
+        INSERT INTO entity_versions (user_id, entity, version)
+        VALUES (rec.user_id, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, entity) DO UPDATE SET version = entity_versions.version + 1;
+        PERFORM pg_notify('change_log', rec.user_id::text || ':' || pg_current_xact_id()::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# The archive job (app.archiving, see crud.archive) moves a task between
+# tasks and tasks_archive without changing it: sync clients must not hear a
+# delete, since include_archived=true still returns the task. The version is
+# still bumped, because the hot-only listings did change and their ETags must.
+LOG_CHANGE_V5 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF current_setting('app.purging', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            IF OLD.deleted_at IS NOT NULL THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        IF current_setting('app.archiving', true) IS DISTINCT FROM 'on' THEN
+            INSERT INTO change_log (user_id, entity, entity_id, op)
+            VALUES (
+                rec.user_id, TG_ARGV[0], rec.id,
+                CASE WHEN TG_OP = 'DELETE' OR rec.deleted_at IS NOT NULL THEN 'delete' ELSE 'upsert' END
+            );
+            PERFORM pg_notify('change_log', rec.user_id::text || ':' || pg_current_xact_id()::text);
+        END IF;
+        INSERT INTO entity_versions (user_id, entity, version)
+        VALUES (rec.user_id, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, entity) DO UPDATE SET version = entity_versions.version + 1;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(LOG_CHANGE_V5)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(LOG_CHANGE_V4)
@@ -0,0 +1,37 @@
+"""archived tasks moved back to tasks are not counted twice
+
+Revision ID: b3e7d1f5a062
+Revises: a9c4e2f7d816
+Create Date: 2026-10-19 12:04:41.530218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7d1f5a062'
+down_revision: Union[str, Sequence[str], None] = 'a9c4e2f7d816'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Updating or deleting an archived task first moves it back into `tasks`
+# (crud.archive.restore_archived) with app.archiving set. Its project and
+# category counted it all along, so the insert is skipped like the archive
+# move's delete.
+COUNTERS_INSERT = 'AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT'
+SKIP_WHEN_ARCHIVING = "WHEN (current_setting('app.archiving', true) IS DISTINCT FROM 'on')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('DROP TRIGGER tasks_counters_insert ON tasks')
+    op.execute(f'CREATE TRIGGER tasks_counters_insert {COUNTERS_INSERT} {SKIP_WHEN_ARCHIVING} EXECUTE FUNCTION task_counters()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER tasks_counters_insert ON tasks')
+    op.execute(f'CREATE TRIGGER tasks_counters_insert {COUNTERS_INSERT} EXECUTE FUNCTION task_counters()')
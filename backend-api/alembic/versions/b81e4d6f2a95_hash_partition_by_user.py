@@ -0,0 +1,129 @@
+"""hash-partition categories, projects and tasks by user_id
+
+Revision ID: b81e4d6f2a95
+Revises: a6d2f0c8e413
+Create Date: 2026-10-19 00:31:52.804117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81e4d6f2a95'
+down_revision: Union[str, Sequence[str], None] = 'a6d2f0c8e413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Rewrites all three tables under an exclusive lock: run it in a maintenance
+# window.
+#
+# Partitions per table. Changing it later means another rebuild, so pick a
+# count that keeps each partition's indexes comfortably in memory at the
+# expected size (a few million tasks per partition is fine).
+PARTITIONS = 16
+
+# Parents first: the task foreign keys are recreated once every table is rebuilt
+PARTITIONED_TABLES = ['categories', 'projects', 'tasks']
+
+# (table, columns, referenced table, referenced columns, ON DELETE) as partitioned
+USER_FOREIGN_KEYS = [
+    ('categories', ['user_id'], 'users', ['id'], 'CASCADE'),
+    ('projects', ['user_id'], 'users', ['id'], 'CASCADE'),
+    ('tasks', ['user_id'], 'users', ['id'], None),
+]
+PARENT_FOREIGN_KEYS = [
+    (table, ['user_id', column], parent, ['user_id', 'id'], f'SET NULL ({column})')
+    for table in ('tasks', 'tasks_archive')
+    for column, parent in (('category_id', 'categories'), ('project_id', 'projects'))
+]
+# ... and as they were before
+PLAIN_PARENT_FOREIGN_KEYS = [
+    (table, [column], parent, ['id'], 'SET NULL')
+    for table, columns, parent, _, _ in PARENT_FOREIGN_KEYS
+    for column in columns[1:]
+]
+
+
+def _rebuild(table: str, partitioned: bool) -> None:
+    """Recreate `table` with the same columns, data, indexes and triggers,
+    hash-partitioned by user_id (or back to a plain table).
+
+    Indexes and triggers are replayed from the catalog, so the rebuild follows
+    whatever earlier revisions put on the table. Foreign keys are dropped with
+    the old table; the caller recreates them.
+    """
+    bind = op.get_bind()
+    indexes = bind.execute(sa.text(
+        "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table "
+        "AND indexname <> :table || '_pkey'"
+    ), {'table': table}).scalars().all()
+    triggers = bind.execute(sa.text(
+        "SELECT pg_get_triggerdef(t.oid) FROM pg_trigger t "
+        "WHERE t.tgrelid = to_regclass(:table) AND NOT t.tgisinternal"
+    ), {'table': table}).scalars().all()
+    columns = bind.execute(sa.text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :table AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position"
+    ), {'table': table}).scalars().all()
+    column_list = ', '.join(columns)
+
+    rebuilt = f'{table}_rebuilt'
+    op.execute(
+        f'CREATE TABLE {rebuilt} (LIKE {table} INCLUDING DEFAULTS INCLUDING GENERATED)'
+        + (' PARTITION BY HASH (user_id)' if partitioned else '')
+    )
+    if partitioned:
+        op.execute(f'ALTER TABLE {rebuilt} ADD CONSTRAINT {table}_rebuilt_pkey PRIMARY KEY (id, user_id)')
+        for remainder in range(PARTITIONS):
+            op.execute(
+                f'CREATE TABLE {table}_p{remainder:02d} PARTITION OF {rebuilt} '
+                f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})'
+            )
+    else:
+        op.execute(f'ALTER TABLE {rebuilt} ADD CONSTRAINT {table}_rebuilt_pkey PRIMARY KEY (id)')
+    # No triggers on the new table yet, so the copy leaves change_log and the
+    # counters alone
+    op.execute(f'INSERT INTO {rebuilt} ({column_list}) SELECT {column_list} FROM {table}')
+    op.execute(f'DROP TABLE {table} CASCADE')
+    op.execute(f'ALTER TABLE {rebuilt} RENAME TO {table}')
+    op.execute(f'ALTER TABLE {table} RENAME CONSTRAINT {table}_rebuilt_pkey TO {table}_pkey')
+    # Indexes of a partitioned table are listed as ON ONLY; recreated without
+    # it they cascade to every partition
+    for statement in indexes + triggers:
+        op.execute(statement.replace(' ON ONLY ', ' ON '))
+
+
+def _add_foreign_keys(foreign_keys) -> None:
+    for table, columns, parent, parent_columns, ondelete in foreign_keys:
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{'_'.join(columns)}_fkey "
+            f"FOREIGN KEY ({', '.join(columns)}) REFERENCES {parent} ({', '.join(parent_columns)})"
+            + (f' ON DELETE {ondelete}' if ondelete else '')
+        )
+
+
+def _drop_parent_foreign_keys() -> None:
+    # The archive keeps its table; only its references to the parents change
+    for constraint in ('category_id', 'project_id', 'user_id_category_id', 'user_id_project_id'):
+        op.execute(f'ALTER TABLE tasks_archive DROP CONSTRAINT IF EXISTS tasks_archive_{constraint}_fkey')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _drop_parent_foreign_keys()
+    for table in PARTITIONED_TABLES:
+        _rebuild(table, partitioned=True)
+    _add_foreign_keys(USER_FOREIGN_KEYS + PARENT_FOREIGN_KEYS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _drop_parent_foreign_keys()
+    for table in PARTITIONED_TABLES:
+        _rebuild(table, partitioned=False)
+    _add_foreign_keys(USER_FOREIGN_KEYS + PLAIN_PARENT_FOREIGN_KEYS)
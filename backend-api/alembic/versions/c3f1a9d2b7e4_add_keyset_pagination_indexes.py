@@ -0,0 +1,46 @@
+"""add keyset pagination indexes
+
+Revision ID: c3f1a9d2b7e4
+Revises: 516b4df4d25b
+Create Date: 2026-10-18 10:12:40.118231
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a9d2b7e4'
+down_revision: Union[str, Sequence[str], None] = '516b4df4d25b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_tasks_user_id_created_at_id', 'tasks', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_user_id_updated_at_id', 'tasks', ['user_id', 'updated_at', 'id'], unique=False)
+    op.create_index('ix_tasks_user_id_due_date_id', 'tasks', ['user_id', 'due_date', 'id'], unique=False)
+    op.create_index('ix_tasks_user_id_priority_id', 'tasks', ['user_id', 'priority', 'id'], unique=False)
+    op.create_index('ix_tasks_user_id_category_id', 'tasks', ['user_id', 'category_id'], unique=False)
+    op.create_index('ix_tasks_user_id_project_id', 'tasks', ['user_id', 'project_id'], unique=False)
+    op.create_index('ix_projects_user_id_create_day_id', 'projects', ['user_id', 'create_day', 'id'], unique=False)
+    op.create_index('ix_projects_user_id_due_date_id', 'projects', ['user_id', 'due_date', 'id'], unique=False)
+    op.create_index('ix_projects_user_id_name_id', 'projects', ['user_id', 'name', 'id'], unique=False)
+    op.create_index('ix_categories_user_id_name_id', 'categories', ['user_id', 'name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_categories_user_id_name_id', table_name='categories')
+    op.drop_index('ix_projects_user_id_name_id', table_name='projects')
+    op.drop_index('ix_projects_user_id_due_date_id', table_name='projects')
+    op.drop_index('ix_projects_user_id_create_day_id', table_name='projects')
+    op.drop_index('ix_tasks_user_id_project_id', table_name='tasks')
+    op.drop_index('ix_tasks_user_id_category_id', table_name='tasks')
+    op.drop_index('ix_tasks_user_id_priority_id', table_name='tasks')
+    op.drop_index('ix_tasks_user_id_due_date_id', table_name='tasks')
+    op.drop_index('ix_tasks_user_id_updated_at_id', table_name='tasks')
+    op.drop_index('ix_tasks_user_id_created_at_id', table_name='tasks')
@@ -0,0 +1,35 @@
+"""email directory for unique emails across shards
+
+Revision ID: c8f2a6d4e917
+Revises: b3e7d1f5a062
+Create Date: 2026-10-19 13:12:58.204716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f2a6d4e917'
+down_revision: Union[str, Sequence[str], None] = 'b3e7d1f5a062'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Created on every database for a uniform schema; only the first shard's is used
+    op.create_table('user_emails',
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('claimed_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('email')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_emails')
@@ -0,0 +1,176 @@
+"""soft delete: deleted_at on users, categories, projects and tasks
+
+Revision ID: d4b7e9a1c352
+Revises: b81e4d6f2a95
+Create Date: 2026-10-19 02:14:37.519846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b7e9a1c352'
+down_revision: Union[str, Sequence[str], None] = 'b81e4d6f2a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SOFT_DELETED_TABLES = ['users', 'categories', 'projects', 'tasks']
+
+STATS_INCLUDE = ['priority', 'category_id', 'is_completed', 'due_date', 'completed_at']
+
+LOG_CHANGE_V3 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        INSERT INTO change_log (user_id, entity, entity_id, op)
+        VALUES (rec.user_id, TG_ARGV[0], rec.id, CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END);
+        INSERT INTO entity_versions (user_id, entity, version)
+        VALUES (rec.user_id, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, entity) DO UPDATE SET version = entity_versions.version + 1;
+        PERFORM pg_notify('change_log', rec.user_id::text || ':' || pg_current_xact_id()::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Setting deleted_at is the delete clients hear about. Later writes to the row
+# (the purge clearing a reference, then removing it) are not reported again,
+# and neither is anything the purge does to a deleted user's rows
+# (app.purging, see crud.purge).
+LOG_CHANGE_V4 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF current_setting('app.purging', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            IF OLD.deleted_at IS NOT NULL THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        INSERT INTO change_log (user_id, entity, entity_id, op)
+        VALUES (
+            rec.user_id, TG_ARGV[0], rec.id,
+            CASE WHEN TG_OP = 'DELETE' OR rec.deleted_at IS NOT NULL THEN 'delete' ELSE 'upsert' END
+        );
+        INSERT INTO entity_versions (user_id, entity, version)
+        VALUES (rec.user_id, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, entity) DO UPDATE SET version = entity_versions.version + 1;
+        PERFORM pg_notify('change_log', rec.user_id::text || ':' || pg_current_xact_id()::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+APPLY_DELTAS = """
+        WITH delta AS ({source}),
+        projects_done AS (
+            UPDATE projects p
+            SET task_count = p.task_count + d.total,
+                completed_count = p.completed_count + d.done,
+                progress = CASE WHEN p.task_count + d.total > 0
+                                THEN (p.completed_count + d.done) * 100 / (p.task_count + d.total)
+                                ELSE 0 END
+            FROM (SELECT project_id AS id, sum(total) AS total, sum(done) AS done
+                  FROM delta WHERE project_id IS NOT NULL GROUP BY project_id) d
+            WHERE p.id = d.id AND (d.total <> 0 OR d.done <> 0)
+        )
+        UPDATE categories c
+        SET task_count = c.task_count + d.total,
+            completed_count = c.completed_count + d.done
+        FROM (SELECT category_id AS id, sum(total) AS total, sum(done) AS done
+              FROM delta WHERE category_id IS NOT NULL GROUP BY category_id) d
+        WHERE c.id = d.id AND (d.total <> 0 OR d.done <> 0);
+"""
+
+
+def _task_counters(live_only: bool) -> str:
+    # Soft-deleted tasks don't count: setting deleted_at subtracts the task
+    # like a delete, and the purge's real DELETE later finds nothing to subtract
+    where = " WHERE deleted_at IS NULL" if live_only else ""
+    new_rows = f"SELECT project_id, category_id, 1 AS total, is_completed::int AS done FROM new_rows{where}"
+    old_rows = f"SELECT project_id, category_id, -1 AS total, -is_completed::int AS done FROM old_rows{where}"
+    # Purging a deleted user's tasks: their projects and categories go too
+    purging = """
+        IF current_setting('app.purging', true) = 'on' THEN
+            RETURN NULL;
+        END IF;""" if live_only else ""
+    return f"""
+    CREATE OR REPLACE FUNCTION task_counters() RETURNS trigger AS $$
+    BEGIN{purging}
+        IF TG_OP = 'INSERT' THEN
+            {APPLY_DELTAS.format(source=new_rows)}
+        ELSIF TG_OP = 'UPDATE' THEN
+            {APPLY_DELTAS.format(source=f"{new_rows} UNION ALL {old_rows}")}
+        ELSE
+            {APPLY_DELTAS.format(source=old_rows)}
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in SOFT_DELETED_TABLES:
+        op.add_column(table, sa.Column('deleted_at', sa.TIMESTAMP(timezone=True), nullable=True))
+        # What the purge job scans for; stays tiny
+        op.create_index(f'ix_{table}_deleted_at', table, ['deleted_at'], unique=False, postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+    # A deleted account's email can be registered again before the purge runs
+    op.drop_constraint('users_email_key', 'users', type_='unique')
+    op.create_index('uq_users_email_live', 'users', ['email'], unique=True, postgresql_where=sa.text('deleted_at IS NULL'))
+
+    # The stats aggregate filters on deleted_at; keep it index-only
+    op.drop_index('ix_tasks_user_id_stats', table_name='tasks')
+    op.create_index('ix_tasks_user_id_stats', 'tasks', ['user_id'], unique=False, postgresql_include=STATS_INCLUDE + ['deleted_at'])
+
+    op.execute(LOG_CHANGE_V4)
+    op.execute(_task_counters(live_only=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Finish what the purge job would have done while the functions still
+    # ignore deleted rows, so counters and change_log stay as they are
+    op.execute("SELECT set_config('app.purging', 'on', false)")
+    op.execute("DELETE FROM tasks WHERE deleted_at IS NOT NULL OR user_id IN (SELECT id FROM users WHERE deleted_at IS NOT NULL)")
+    op.execute("DELETE FROM tasks_archive WHERE user_id IN (SELECT id FROM users WHERE deleted_at IS NOT NULL)")
+    op.execute("DELETE FROM change_log WHERE user_id IN (SELECT id FROM users WHERE deleted_at IS NOT NULL)")
+    op.execute("DELETE FROM entity_versions WHERE user_id IN (SELECT id FROM users WHERE deleted_at IS NOT NULL)")
+    op.execute("DELETE FROM users WHERE deleted_at IS NOT NULL")
+    op.execute("SELECT set_config('app.purging', 'off', false)")
+    # Their tasks lose the reference, as a hard delete would have done
+    op.execute("DELETE FROM categories WHERE deleted_at IS NOT NULL")
+    op.execute("DELETE FROM projects WHERE deleted_at IS NOT NULL")
+
+    op.execute(_task_counters(live_only=False))
+    op.execute(LOG_CHANGE_V3)
+
+    op.drop_index('ix_tasks_user_id_stats', table_name='tasks')
+    op.create_index('ix_tasks_user_id_stats', 'tasks', ['user_id'], unique=False, postgresql_include=STATS_INCLUDE)
+
+    op.drop_index('uq_users_email_live', table_name='users', postgresql_where=sa.text('deleted_at IS NULL'))
+    op.create_unique_constraint('users_email_key', 'users', ['email'])
+
+    for table in SOFT_DELETED_TABLES:
+        op.drop_index(f'ix_{table}_deleted_at', table_name=table, postgresql_where=sa.text('deleted_at IS NOT NULL'))
+        op.drop_column(table, 'deleted_at')
@@ -0,0 +1,64 @@
+"""add tasks.completed_at and stats index
+
+Revision ID: e27a4c8b5f19
+Revises: 9b1f3c7d2e60
+Create Date: 2026-10-18 20:31:48.775102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e27a4c8b5f19'
+down_revision: Union[str, Sequence[str], None] = '9b1f3c7d2e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Inserts keep an explicit completed_at (imports carry their history); updates
+# stamp the moment a task becomes completed and clear it when reopened.
+SET_COMPLETED_AT = """
+    CREATE OR REPLACE FUNCTION set_completed_at() RETURNS trigger AS $$
+    BEGIN
+        IF NOT coalesce(NEW.is_completed, false) THEN
+            NEW.completed_at := NULL;
+        ELSIF TG_OP = 'INSERT' THEN
+            NEW.completed_at := coalesce(NEW.completed_at, now());
+        ELSIF NOT coalesce(OLD.is_completed, false) THEN
+            NEW.completed_at := now();
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tasks', sa.Column('completed_at', sa.TIMESTAMP(timezone=True), nullable=True))
+    # Best available history for tasks completed before this column existed.
+    # Triggers are off so the backfill doesn't flood change_log.
+    op.execute("ALTER TABLE tasks DISABLE TRIGGER USER")
+    op.execute("UPDATE tasks SET completed_at = updated_at WHERE is_completed")
+    op.execute("ALTER TABLE tasks ENABLE TRIGGER USER")
+
+    op.execute(SET_COMPLETED_AT)
+    op.execute(
+        "CREATE TRIGGER tasks_set_completed_at BEFORE INSERT OR UPDATE OF is_completed ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION set_completed_at()"
+    )
+    op.create_index(
+        'ix_tasks_user_id_stats', 'tasks', ['user_id'], unique=False,
+        postgresql_include=['priority', 'category_id', 'is_completed', 'due_date', 'completed_at'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_user_id_stats', table_name='tasks')
+    op.execute("DROP TRIGGER IF EXISTS tasks_set_completed_at ON tasks")
+    op.execute("DROP FUNCTION IF EXISTS set_completed_at()")
+    op.drop_column('tasks', 'completed_at')
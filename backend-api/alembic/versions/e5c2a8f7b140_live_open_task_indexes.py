@@ -0,0 +1,39 @@
+"""overdue indexes: open, live tasks only
+
+Revision ID: e5c2a8f7b140
+Revises: d4b7e9a1c352
+Create Date: 2026-10-19 09:12:44.301582
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c2a8f7b140'
+down_revision: Union[str, Sequence[str], None] = 'd4b7e9a1c352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# overdue_count on projects and categories (models.models) also filters on
+# deleted_at; with it in the predicate the count is an index-only scan
+OPEN = sa.text('NOT is_completed')
+OPEN_LIVE = sa.text('NOT is_completed AND deleted_at IS NULL')
+PARENT_COLUMNS = ['project_id', 'category_id']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in PARENT_COLUMNS:
+        op.drop_index(f'ix_tasks_{column}_due_date_open', table_name='tasks', postgresql_where=OPEN)
+        op.create_index(f'ix_tasks_{column}_due_date_open', 'tasks', [column, 'due_date'], unique=False, postgresql_where=OPEN_LIVE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in PARENT_COLUMNS:
+        op.drop_index(f'ix_tasks_{column}_due_date_open', table_name='tasks', postgresql_where=OPEN_LIVE)
+        op.create_index(f'ix_tasks_{column}_due_date_open', 'tasks', [column, 'due_date'], unique=False, postgresql_where=OPEN)
@@ -0,0 +1,72 @@
+"""notify listeners of change_log writes
+
+Revision ID: f3a8c51e9d27
+Revises: 5d8e2b9a4c71
+Create Date: 2026-10-18 23:05:41.673209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8c51e9d27'
+down_revision: Union[str, Sequence[str], None] = '5d8e2b9a4c71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LOG_CHANGE_V2 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        INSERT INTO change_log (user_id, entity, entity_id, op)
+        VALUES (rec.user_id, TG_ARGV[0], rec.id, CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END);
+        INSERT INTO entity_versions (user_id, entity, version)
+        VALUES (rec.user_id, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, entity) DO UPDATE SET version = entity_versions.version + 1;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# NOTIFY is delivered on commit and identical payloads within a transaction
+# are folded into one, so a 500-row batch still wakes listeners once.
+LOG_CHANGE_V3 = """
+    CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        INSERT INTO change_log (user_id, entity, entity_id, op)
+        VALUES (rec.user_id, TG_ARGV[0], rec.id, CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END);
+        INSERT INTO entity_versions (user_id, entity, version)
+        VALUES (rec.user_id, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, entity) DO UPDATE SET version = entity_versions.version + 1;
+        PERFORM pg_notify('change_log', rec.user_id::text || ':' || pg_current_xact_id()::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(LOG_CHANGE_V3)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(LOG_CHANGE_V2)
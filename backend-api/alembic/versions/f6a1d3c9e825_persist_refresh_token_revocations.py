@@ -0,0 +1,40 @@
+"""refresh-token revocations in the database
+
+Revision ID: f6a1d3c9e825
+Revises: e5c2a8f7b140
+Create Date: 2026-10-19 10:03:27.648190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a1d3c9e825'
+down_revision: Union[str, Sequence[str], None] = 'e5c2a8f7b140'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Refresh tokens issued before it are refused (password change)
+    op.add_column('users', sa.Column('tokens_revoked_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    # Spent and logged-out refresh tokens, until they would have expired anyway
+    op.create_table('revoked_tokens',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('token_id', sa.String(length=64), nullable=False),
+    sa.Column('expires_at', postgresql.TIMESTAMP(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'token_id')
+    )
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
+    op.drop_column('users', 'tokens_revoked_at')
@@ -1,8 +1,11 @@
 from fastapi import APIRouter
-from .endpoints import users, categories, tasks, projects
+from .endpoints import auth, users, categories, tasks, projects, sync, admin
 
 api_router = APIRouter()
+api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(categories.router, prefix="/categories", tags=["categories"])
 api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
-api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
\ No newline at end of file
+api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
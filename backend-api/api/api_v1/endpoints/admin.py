@@ -0,0 +1,42 @@
+import hmac
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.schemas import ImportReport
+from core.config import settings
+from crud.crud import get_user
+from crud.importer import READERS, import_tasks
+from db.session import get_user_db
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    if not settings.admin_api_token:
+        raise HTTPException(status_code=403, detail="Admin API disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_api_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/users/{user_id}/import", response_model=ImportReport)
+async def import_user_tasks(
+    user_id: UUID,
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int | None = Query(None, ge=1, le=100_000),
+    db: AsyncSession = Depends(get_user_db),
+):
+    """Bulk-load tasks from an NDJSON or CSV request body (streamed, not buffered)."""
+    if not await get_user(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    def progress(report: ImportReport) -> None:
+        logger.info("import %s: %d rows read, %d imported, %d failed", user_id, report.rows_read, report.rows_imported, report.rows_failed)
+
+    records = READERS[format](request.stream())
+    return await import_tasks(db, user_id, records, batch_size=batch_size, on_progress=progress)
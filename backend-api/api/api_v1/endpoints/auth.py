@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordRequestForm
+from schemas.schemas import TokenPair, RefreshRequest
+from core.security import PasswordHasherBusy, pwd_context, verify_password
+from core.tokens import ACCESS, REFRESH, InvalidToken, denylist, issue_token, verify_access_token, verify_refresh_token
+from crud.repository import Repository
+from db.session import get_repository
+
+router = APIRouter()
+
+# Verified against when the email is unknown, so a miss costs as much as a hit
+_DUMMY_HASH = pwd_context.hash("dummy-password")
+
+
+def _issue_pair(user_id) -> TokenPair:
+    access_token, expires_in = issue_token(user_id, ACCESS)
+    refresh_token, _ = issue_token(user_id, REFRESH)
+    return TokenPair(access_token=access_token, refresh_token=refresh_token, expires_in=expires_in)
+
+
+@router.post("/login", response_model=TokenPair)
+async def login(form: OAuth2PasswordRequestForm = Depends(), repo: Repository = Depends(get_repository)):
+    """OAuth2 password flow; `username` is the account email."""
+    db_user = await repo.get_user_by_email(form.username)
+    try:
+        matches, new_hash = await verify_password(form.password, db_user.password_hash if db_user else _DUMMY_HASH)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, retry later", headers={"Retry-After": "1"})
+    if not db_user or not matches:
+        raise HTTPException(status_code=401, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+    if new_hash:
+        await repo.set_password_hash(db_user.id, new_hash)
+    return _issue_pair(db_user.id)
+
+
+@router.post("/refresh", response_model=TokenPair)
+async def refresh(body: RefreshRequest, repo: Repository = Depends(get_repository)):
+    """Trade a refresh token for a new pair; the old refresh token is spent."""
+    try:
+        principal = verify_refresh_token(body.refresh_token)
+        if not await repo.spend_refresh_token(principal):
+            raise InvalidToken("Token revoked")
+    except InvalidToken as exc:
+        raise HTTPException(status_code=401, detail=str(exc), headers={"WWW-Authenticate": "Bearer"})
+    return _issue_pair(principal.user_id)
+
+
+@router.post("/logout", status_code=204)
+async def logout(
+    body: RefreshRequest,
+    credentials: HTTPAuthorizationCredentials | None = Depends(HTTPBearer(auto_error=False)),
+    repo: Repository = Depends(get_repository),
+):
+    """Revoke the refresh token and, if sent, the access token."""
+    try:
+        await repo.spend_refresh_token(verify_refresh_token(body.refresh_token))
+        if credentials is not None:
+            denylist.revoke(verify_access_token(credentials.credentials))
+    except InvalidToken:
+        pass
+    return Response(status_code=204)
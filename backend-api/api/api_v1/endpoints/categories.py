@@ -1,42 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from schemas.schemas import Category, CategoryCreate, CategoryUpdate
-from crud.crud import get_categories, get_category, create_category, update_category, delete_category
-from db.session import get_db
+from crud.repository import Repository
+from crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.etag import not_modified
+from api.responses import raw_json
+from api.auth import current_user_id
+from api.writes import get_read_repository, settle_writes
+from db.session import get_repository
 from uuid import UUID
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(settle_writes)])
 
 
 @router.get("/", response_model=list[Category])
-async def read_categories(user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    return await get_categories(db, user_id)
+async def read_categories(
+    request: Request,
+    response: Response,
+    user_id: UUID = Depends(current_user_id),
+    sort: str = Query("name", pattern="^-?(name)$"),
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    repo: Repository = Depends(get_read_repository),
+):
+    unchanged = await not_modified(request, response, repo, user_id, "category", "list", sort, cursor, limit)
+    if unchanged:
+        return unchanged
+    try:
+        body, next_cursor = await repo.get_categories_json(user_id, sort=sort, cursor=cursor, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return raw_json(body, response)
 
 
 @router.post("/", response_model=Category)
-async def create_new_category(category: CategoryCreate, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    return await create_category(db, category, user_id)
+async def create_new_category(category: CategoryCreate, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    return await repo.create_category(category, user_id)
 
 
 @router.get("/{category_id}", response_model=Category)
-async def read_category(category_id: UUID, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    db_category = await get_category(db, category_id, user_id)
+async def read_category(category_id: UUID, request: Request, response: Response, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_read_repository)):
+    unchanged = await not_modified(request, response, repo, user_id, "category", "item", category_id)
+    if unchanged:
+        return unchanged
+    db_category = await repo.get_category(category_id, user_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
     return db_category
 
 
 @router.put("/{category_id}", response_model=Category)
-async def update_existing_category(category_id: UUID, category_update: CategoryUpdate, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    db_category = await update_category(db, category_id, category_update, user_id)
+async def update_existing_category(category_id: UUID, category_update: CategoryUpdate, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    db_category = await repo.update_category(category_id, category_update, user_id)
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
     return db_category
 
 
 @router.delete("/{category_id}")
-async def delete_existing_category(category_id: UUID, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    success = await delete_category(db, category_id, user_id)
+async def delete_existing_category(category_id: UUID, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    success = await repo.delete_category(category_id, user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Category not found")
     return {"message": "Category deleted"}
\ No newline at end of file
@@ -1,42 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from schemas.schemas import Project, ProjectCreate, ProjectUpdate
-from crud.crud import get_projects, get_project, create_project, update_project, delete_project
-from db.session import get_db
+from crud.repository import Repository
+from crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.etag import not_modified
+from api.responses import raw_json
+from api.auth import current_user_id
+from api.writes import get_read_repository, settle_writes
+from db.session import get_repository
 from uuid import UUID
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(settle_writes)])
 
 
 @router.get("/", response_model=list[Project])
-async def read_projects(user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    return await get_projects(db, user_id)
+async def read_projects(
+    request: Request,
+    response: Response,
+    user_id: UUID = Depends(current_user_id),
+    sort: str = Query("create_day", pattern="^-?(create_day|due_date|name)$"),
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    repo: Repository = Depends(get_read_repository),
+):
+    unchanged = await not_modified(request, response, repo, user_id, "project", "list", sort, cursor, limit)
+    if unchanged:
+        return unchanged
+    try:
+        body, next_cursor = await repo.get_projects_json(user_id, sort=sort, cursor=cursor, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return raw_json(body, response)
 
 
 @router.post("/", response_model=Project)
-async def create_new_project(project: ProjectCreate, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    return await create_project(db, project, user_id)
+async def create_new_project(project: ProjectCreate, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    return await repo.create_project(project, user_id)
 
 
 @router.get("/{project_id}", response_model=Project)
-async def read_project(project_id: UUID, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    db_project = await get_project(db, project_id, user_id)
+async def read_project(project_id: UUID, request: Request, response: Response, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_read_repository)):
+    unchanged = await not_modified(request, response, repo, user_id, "project", "item", project_id)
+    if unchanged:
+        return unchanged
+    db_project = await repo.get_project(project_id, user_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
 
 @router.put("/{project_id}", response_model=Project)
-async def update_existing_project(project_id: UUID, project_update: ProjectUpdate, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    db_project = await update_project(db, project_id, project_update, user_id)
+async def update_existing_project(project_id: UUID, project_update: ProjectUpdate, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    db_project = await repo.update_project(project_id, project_update, user_id)
     if not db_project:
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
 
 @router.delete("/{project_id}")
-async def delete_existing_project(project_id: UUID, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    success = await delete_project(db, project_id, user_id)
+async def delete_existing_project(project_id: UUID, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    success = await repo.delete_project(project_id, user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project deleted"}
@@ -0,0 +1,136 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.websockets import WebSocketDisconnect
+from schemas.schemas import SyncResponse
+from core.tokens import InvalidToken
+from crud.repository import Repository, UnsupportedOperation
+from crud.sync import SyncTokenExpired, DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT, decode_token
+from api.auth import current_user_id, stream_user_id
+from api.writes import settle_writes
+from api.stream import CHANGES, HEARTBEAT, ChangeStream
+from db.session import all_sessions, get_repository, session_for
+from uuid import UUID
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SyncResponse, dependencies=[Depends(settle_writes)])
+async def read_changes(
+    user_id: UUID = Depends(current_user_id),
+    since: str | None = None,
+    limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT),
+    repo: Repository = Depends(get_repository),
+):
+    try:
+        return await repo.get_changes(user_id, since, limit)
+    except SyncTokenExpired as exc:
+        raise HTTPException(status_code=410, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _require_sql() -> None:
+    if not all_sessions():
+        raise UnsupportedOperation("The change stream requires STORAGE_BACKEND=sql")
+
+
+@router.get("/stream")
+async def stream_changes(request: Request, since: str | None = None, last_event_id: str | None = Header(None)):
+    """Server-sent events: a `changes` event (data: a SyncResponse, id: its
+    token) per batch, comment heartbeats while idle, and `reset` before closing
+    a client that fell too far behind. EventSource reconnects send the last
+    token back as Last-Event-ID, which takes precedence over `since`."""
+    _require_sql()
+    try:
+        user_id = stream_user_id(request)
+    except InvalidToken as exc:
+        raise HTTPException(status_code=401, detail=str(exc), headers={"WWW-Authenticate": "Bearer"})
+    since = last_event_id or since
+    if since is not None:
+        try:
+            decode_token(since)
+        except SyncTokenExpired as exc:
+            raise HTTPException(status_code=410, detail=str(exc))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    async def events():
+        async with ChangeStream(session_for(user_id), user_id, since) as stream:
+            while True:
+                kind, batch = await stream.next_frame()
+                if kind == CHANGES:
+                    yield f"id: {batch.token}\nevent: changes\ndata: {batch.model_dump_json()}\n\n"
+                elif kind == HEARTBEAT:
+                    yield ": heartbeat\n\n"
+                else:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+
+    # X-Accel-Buffering: nginx must pass events through as they are written
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+# WebSocket close codes (4000-4999 are application-defined)
+WS_UNAUTHORIZED = 4401
+WS_BAD_TOKEN = 4400
+WS_TOKEN_EXPIRED = 4410
+WS_UNSUPPORTED = 4501
+WS_RESET = 4429
+
+
+async def _send_frames(websocket: WebSocket, stream: ChangeStream) -> None:
+    while True:
+        kind, batch = await stream.next_frame()
+        if kind == CHANGES:
+            await websocket.send_text(f'{{"type":"changes","data":{batch.model_dump_json()}}}')
+        elif kind == HEARTBEAT:
+            await websocket.send_text('{"type":"heartbeat"}')
+        else:
+            await websocket.send_text('{"type":"reset"}')
+            await websocket.close(code=WS_RESET)
+            return
+
+
+async def _until_disconnect(websocket: WebSocket) -> None:
+    # Nothing is expected from the client; reading is how a close is noticed
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@router.websocket("/ws")
+async def stream_changes_ws(websocket: WebSocket, since: str | None = None):
+    """The /stream feed over a WebSocket: JSON messages typed `changes` (with
+    `data`, a SyncResponse), `heartbeat` and `reset`. Reconnect with the last
+    `data.token` as `since`."""
+    if not all_sessions():
+        await websocket.close(code=WS_UNSUPPORTED, reason="The change stream requires STORAGE_BACKEND=sql")
+        return
+    try:
+        user_id = stream_user_id(websocket)
+        if since is not None:
+            decode_token(since)
+    except InvalidToken as exc:
+        await websocket.close(code=WS_UNAUTHORIZED, reason=str(exc))
+        return
+    except SyncTokenExpired as exc:
+        await websocket.close(code=WS_TOKEN_EXPIRED, reason=str(exc))
+        return
+    except ValueError as exc:
+        await websocket.close(code=WS_BAD_TOKEN, reason=str(exc))
+        return
+
+    await websocket.accept()
+    async with ChangeStream(session_for(user_id), user_id, since) as stream:
+        tasks = {asyncio.create_task(_send_frames(websocket, stream)), asyncio.create_task(_until_disconnect(websocket))}
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            try:
+                task.result()
+            except WebSocketDisconnect:
+                pass
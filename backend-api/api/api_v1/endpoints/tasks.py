@@ -1,42 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
-from schemas.schemas import Task, TaskCreate, TaskUpdate
-from crud.crud import get_tasks, get_task, create_task, update_task, delete_task
-from db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from schemas.schemas import Task, TaskSearchResult, TaskCreate, TaskUpdate, TaskUpdateQueued, TaskBatchCreate, TaskBatchUpdate, TaskBatchDelete, TaskBatchResult
+from crud.repository import Repository
+from crud.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from api.etag import not_modified
+from api.responses import raw_json
+from api.auth import current_user_id
+from api.writes import get_read_repository, settle_writes, wants_queued_update
+from db.session import get_repository, write_behind
+from datetime import datetime
 from uuid import UUID
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(settle_writes)])
 
 
 @router.get("/", response_model=list[Task])
-async def read_tasks(user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    return await get_tasks(db, user_id)
+async def read_tasks(
+    request: Request,
+    response: Response,
+    user_id: UUID = Depends(current_user_id),
+    is_completed: bool | None = None,
+    category_id: UUID | None = None,
+    project_id: UUID | None = None,
+    due_after: datetime | None = None,
+    due_before: datetime | None = None,
+    priority: int | None = None,
+    sort: str = Query("created_at", pattern="^-?(due_date|priority|created_at|updated_at)$"),
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_archived: bool = False,
+    repo: Repository = Depends(get_read_repository),
+):
+    unchanged = await not_modified(request, response, repo, user_id, "task", "list", is_completed, category_id, project_id, due_after, due_before, priority, sort, cursor, limit, include_archived)
+    if unchanged:
+        return unchanged
+    try:
+        body, next_cursor = await repo.get_tasks_json(
+            user_id,
+            is_completed=is_completed,
+            category_id=category_id,
+            project_id=project_id,
+            due_after=due_after,
+            due_before=due_before,
+            priority=priority,
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            include_archived=include_archived,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return raw_json(body, response)
 
 
 @router.post("/", response_model=Task)
-async def create_new_task(task: TaskCreate, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    return await create_task(db, task, user_id)
+async def create_new_task(task: TaskCreate, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    return await repo.create_task(task, user_id)
+
+
+# Search and batch routes are registered before /{task_id} so "search" and
+# "batch" are not parsed as ids
+@router.get("/search", response_model=list[TaskSearchResult])
+async def search_user_tasks(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    user_id: UUID = Depends(current_user_id),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    repo: Repository = Depends(get_read_repository),
+):
+    unchanged = await not_modified(request, response, repo, user_id, "task", "search", q, cursor, limit)
+    if unchanged:
+        return unchanged
+    try:
+        body, next_cursor = await repo.search_tasks_json(user_id, q, cursor=cursor, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return raw_json(body, response)
+
+
+@router.post("/batch", response_model=TaskBatchResult)
+async def create_task_batch(batch: TaskBatchCreate, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    return await repo.create_tasks(batch.items, user_id, atomic=batch.atomic)
+
+
+@router.put("/batch", response_model=TaskBatchResult)
+async def update_task_batch(batch: TaskBatchUpdate, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    return await repo.update_tasks(batch.items, user_id, atomic=batch.atomic)
+
+
+@router.delete("/batch", response_model=TaskBatchResult)
+async def delete_task_batch(batch: TaskBatchDelete, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    return await repo.delete_tasks(batch.ids, user_id, atomic=batch.atomic)
 
 
 @router.get("/{task_id}", response_model=Task)
-async def read_task(task_id: UUID, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    db_task = await get_task(db, task_id, user_id)
+async def read_task(
+    task_id: UUID,
+    request: Request,
+    response: Response,
+    include_archived: bool = False,
+    user_id: UUID = Depends(current_user_id),
+    repo: Repository = Depends(get_read_repository),
+):
+    unchanged = await not_modified(request, response, repo, user_id, "task", "item", task_id, include_archived)
+    if unchanged:
+        return unchanged
+    db_task = await repo.get_task(task_id, user_id, include_archived)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
 
-@router.put("/{task_id}", response_model=Task)
-async def update_existing_task(task_id: UUID, task_update: TaskUpdate, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    db_task = await update_task(db, task_id, task_update, user_id)
+@router.put("/{task_id}", response_model=Task, responses={202: {"model": TaskUpdateQueued}})
+async def update_existing_task(
+    task_id: UUID,
+    task_update: TaskUpdate,
+    request: Request,
+    user_id: UUID = Depends(current_user_id),
+    repo: Repository = Depends(get_repository),
+):
+    """With `Prefer: respond-async` (and WRITE_BEHIND_ENABLED) the update is
+    queued and merged with the user's other pending updates: 202, no task body,
+    and an unknown task id is only logged."""
+    if wants_queued_update(request):
+        write_behind.submit(user_id, task_id, task_update)
+        body = TaskUpdateQueued(id=task_id).model_dump(mode="json")
+        return JSONResponse(status_code=202, content=body, headers={"Preference-Applied": "respond-async"})
+    db_task = await repo.update_task(task_id, task_update, user_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
 
 @router.delete("/{task_id}")
-async def delete_existing_task(task_id: UUID, user_id: UUID = Query(...), db: AsyncSession = Depends(get_db)):
-    success = await delete_task(db, task_id, user_id)
+async def delete_existing_task(task_id: UUID, user_id: UUID = Depends(current_user_id), repo: Repository = Depends(get_repository)):
+    success = await repo.delete_task(task_id, user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"message": "Task deleted"}
\ No newline at end of file
@@ -1,40 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from schemas.schemas import User, UserCreate, UserUpdate
-from crud.crud import get_user, get_user_by_email, create_user, update_user, delete_user
-from db.session import get_db
+from sqlalchemy.exc import IntegrityError
+from schemas.schemas import User, UserCreate, UserUpdate, UserStats
+from core.security import PasswordHasherBusy
+from core.tokens import denylist
+from crud.crud import get_user
+from crud.export import EXPORT_FORMATS, stream_export
+from crud.repository import Repository
+from crud.stats import DEFAULT_STATS_DAYS, MAX_STATS_DAYS
+from api.auth import require_same_user
+from api.writes import settle_writes
+from db.session import get_repository, get_user_db, session_for
 from uuid import UUID
 
 router = APIRouter()
 
 
 @router.post("/", response_model=User)
-async def create_new_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    db_user = await get_user_by_email(db, user.email)
-    if db_user:
+async def create_new_user(user: UserCreate, repo: Repository = Depends(get_repository)):
+    try:
+        return await repo.create_user(user)
+    except IntegrityError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return await create_user(db, user)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, retry later", headers={"Retry-After": "1"})
 
 
-@router.get("/{user_id}", response_model=User)
-async def read_user(user_id: UUID, db: AsyncSession = Depends(get_db)):
-    db_user = await get_user(db, user_id)
+@router.get("/{user_id}", response_model=User, dependencies=[Depends(require_same_user)])
+async def read_user(user_id: UUID, repo: Repository = Depends(get_repository)):
+    db_user = await repo.get_user(user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
-@router.put("/{user_id}", response_model=User)
-async def update_existing_user(user_id: UUID, user_update: UserUpdate, db: AsyncSession = Depends(get_db)):
-    db_user = await update_user(db, user_id, user_update)
+@router.get("/{user_id}/export", dependencies=[Depends(require_same_user), Depends(settle_writes)])
+async def export_user_data(
+    user_id: UUID,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_user_db),
+):
+    if not await get_user(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    # Hand the connection back before streaming; the export opens its own session
+    await db.close()
+    filename = f"export-{user_id}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(session_for(user_id), user_id, format, compress=gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/{user_id}/stats", response_model=UserStats, dependencies=[Depends(require_same_user), Depends(settle_writes)])
+async def read_user_stats(
+    user_id: UUID,
+    days: int = Query(DEFAULT_STATS_DAYS, ge=1, le=MAX_STATS_DAYS),
+    tz: str = "UTC",
+    repo: Repository = Depends(get_repository),
+):
+    """Dashboard figures; `days` and `tz` shape the completion histogram."""
+    try:
+        return await repo.get_user_stats(user_id, days=days, tz=tz)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.put("/{user_id}", response_model=User, dependencies=[Depends(require_same_user)])
+async def update_existing_user(user_id: UUID, user_update: UserUpdate, repo: Repository = Depends(get_repository)):
+    try:
+        db_user = await repo.update_user(user_id, user_update)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, retry later", headers={"Retry-After": "1"})
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    if user_update.password is not None:
+        # Sessions opened with the old password end here
+        denylist.revoke_user(user_id)
     return db_user
 
 
-@router.delete("/{user_id}")
-async def delete_existing_user(user_id: UUID, db: AsyncSession = Depends(get_db)):
-    success = await delete_user(db, user_id)
+@router.delete("/{user_id}", dependencies=[Depends(require_same_user), Depends(settle_writes)])
+async def delete_existing_user(user_id: UUID, repo: Repository = Depends(get_repository)):
+    success = await repo.delete_user(user_id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
+    denylist.revoke_user(user_id)
     return {"message": "User deleted"}
\ No newline at end of file
@@ -0,0 +1,40 @@
+from uuid import UUID
+
+from fastapi import Depends, HTTPException
+from fastapi.requests import HTTPConnection
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from core.tokens import InvalidToken, verify_access_token
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def current_user_id(credentials: HTTPAuthorizationCredentials | None = Depends(_bearer)) -> UUID:
+    """User id from a valid access token; checked locally, without the database."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return verify_access_token(credentials.credentials).user_id
+    except InvalidToken as exc:
+        raise HTTPException(
+            status_code=401, detail=str(exc), headers={"WWW-Authenticate": 'Bearer error="invalid_token"'}
+        )
+
+
+def require_same_user(user_id: UUID, current: UUID = Depends(current_user_id)) -> UUID:
+    """For /users/{user_id} routes: the path must name the caller."""
+    if user_id != current:
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+    return user_id
+
+
+def stream_user_id(connection: HTTPConnection) -> UUID:
+    """Like current_user_id, for EventSource and WebSocket clients that cannot
+    set headers: the token may also come as the `access_token` query parameter.
+    Raises InvalidToken."""
+    scheme, _, token = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        token = connection.query_params.get("access_token", "")
+    if not token:
+        raise InvalidToken("Not authenticated")
+    return verify_access_token(token).user_id
@@ -0,0 +1,53 @@
+import hashlib
+import time
+from uuid import UUID
+
+from fastapi import Request, Response
+
+from core.config import settings
+from crud.repository import Repository
+
+CACHE_CONTROL = "private, no-cache"
+
+# Projects and categories carry overdue_count, which changes as due dates pass
+# without any write bumping the version; their ETags also roll over every
+# overdue_etag_seconds, so a revalidating client never keeps an old count longer
+CLOCK_DEPENDENT = {"project", "category"}
+
+
+def time_bucket(now: float | None = None) -> int:
+    return int((time.time() if now is None else now) // settings.overdue_etag_seconds)
+
+
+def make_etag(entity: str, version: int, params: tuple) -> str:
+    digest = hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+    return f'"{entity}-{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # "*" is left unmatched: the validator is checked before the row is loaded,
+    # so it could turn a missing item's 404 into a 304. A full response is
+    # always a valid answer to it.
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+async def not_modified(
+    request: Request, response: Response, repo: Repository, user_id: UUID, entity: str, *params
+) -> Response | None:
+    """Answer 304 if the client's ETag is current, otherwise tag `response`.
+
+    The version is read before the rows, so a write that lands in between can
+    only make the ETag older than the body, never newer: no stale 304s.
+    """
+    if entity in CLOCK_DEPENDENT:
+        params += (time_bucket(),)
+    etag = make_etag(entity, await repo.get_entity_version(user_id, entity), params)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
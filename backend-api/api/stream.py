@@ -0,0 +1,70 @@
+import asyncio
+from uuid import UUID
+
+from core.changes import hub
+from core.config import settings
+from crud.sync import follow_changes
+from schemas.schemas import SyncResponse
+
+CHANGES = "changes"
+HEARTBEAT = "heartbeat"
+# Final frame for a client that fell stream_send_buffer batches behind: it
+# should reconnect with the last token it received
+RESET = "reset"
+
+
+class ChangeStream:
+    """One client's live feed. A producer task follows the change log into a
+    bounded queue and the transport drains it with next_frame(); if the queue
+    fills up the producer stops instead of buffering more."""
+
+    def __init__(self, session_factory, user_id: UUID, since: str | None):
+        self._session_factory = session_factory
+        self._since = since
+        self._subscription = hub.subscribe(user_id)
+        self._queue: asyncio.Queue[SyncResponse | None] = asyncio.Queue(maxsize=settings.stream_send_buffer)
+        self._producer: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "ChangeStream":
+        self._producer = asyncio.create_task(self._produce())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # Synchronous part first: on client disconnect this runs inside an
+        # already-cancelled scope, where any await is interrupted again
+        hub.unsubscribe(self._subscription)
+        self._producer.cancel()
+        await asyncio.gather(self._producer, return_exceptions=True)
+
+    async def _produce(self) -> None:
+        try:
+            async for batch in follow_changes(self._session_factory, self._subscription, self._since, settings.stream_batch_limit):
+                try:
+                    self._queue.put_nowait(batch)
+                except asyncio.QueueFull:
+                    hub.record_overflow()
+                    return
+        finally:
+            # Wake a waiting reader; if the queue is full it finds out once drained
+            try:
+                self._queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    async def next_frame(self) -> tuple[str, SyncResponse | None]:
+        """(CHANGES, batch) or (HEARTBEAT, None) when idle; (RESET, None) is the
+        last frame. Errors from reading the change log are raised here."""
+        if self._queue.empty() and self._producer.done():
+            return await self._finish()
+        try:
+            batch = await asyncio.wait_for(self._queue.get(), settings.stream_heartbeat_seconds)
+        except TimeoutError:
+            return HEARTBEAT, None
+        if batch is None:
+            return await self._finish()
+        return CHANGES, batch
+
+    async def _finish(self) -> tuple[str, None]:
+        await asyncio.wait({self._producer})
+        self._producer.result()
+        return RESET, None
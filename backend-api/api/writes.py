@@ -0,0 +1,55 @@
+import logging
+from uuid import UUID
+
+from fastapi import Depends, Request
+
+from api.auth import current_user_id
+from core.config import settings
+from crud.repository import Repository
+from db.session import READ_METHODS, open_repository, recent_writers, write_behind
+
+logger = logging.getLogger(__name__)
+
+
+def wants_queued_update(request: Request) -> bool:
+    """PUT /tasks/{id} with `Prefer: respond-async` while write-behind is on."""
+    if not settings.write_behind_enabled or request.method != "PUT":
+        return False
+    preferences = (part.split(";")[0].strip().lower() for part in request.headers.get("prefer", "").split(","))
+    return "respond-async" in preferences
+
+
+async def settle_writes(request: Request, user_id: UUID = Depends(current_user_id)) -> None:
+    """Commit the caller's queued task updates before anything else they do,
+    so reads see them and later writes apply on top of them.
+
+    Requests that may write, and reads that just committed queued updates,
+    keep the user's reads on the primary for replica_sticky_seconds; counted
+    again from the end of the request, as the write may take a while.
+
+    A failed flush fails only requests that write. The buffer keeps the
+    updates and retries them with backoff, and reads go ahead without them
+    instead of all answering 500 until the queue drains.
+    """
+    writes = request.method not in READ_METHODS
+    if writes:
+        recent_writers.add(user_id)
+    if not wants_queued_update(request):
+        try:
+            if await write_behind.flush(user_id):
+                recent_writers.add(user_id)
+        except Exception:
+            if writes:
+                raise
+            logger.warning("serving a read for user %s without their queued updates", user_id, exc_info=True)
+    yield
+    if writes:
+        recent_writers.add(user_id)
+
+
+async def get_read_repository(user_id: UUID = Depends(current_user_id)) -> Repository:
+    """Repository for handlers that only SELECT the caller's rows: served by a
+    read replica when there is a healthy one and the caller hasn't written
+    recently (see db.session.ReplicaSet)."""
+    async with open_repository(reader=user_id) as repo:
+        yield repo
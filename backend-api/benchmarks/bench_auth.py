@@ -0,0 +1,47 @@
+"""Per-request cost of bearer token validation.
+
+    python -m benchmarks.bench_auth [--iterations 100000]
+
+"cold" is the first sight of a token (signature check + claim decoding);
+"cached" is every later request with the same token.
+"""
+import argparse
+import sys
+import os
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import tokens
+from core.tokens import ACCESS, issue_token, verify_access_token
+
+
+def measure(iterations: int) -> dict:
+    user_id = uuid.uuid4()
+    fresh = [issue_token(user_id, ACCESS)[0] for _ in range(iterations)]
+    started = time.perf_counter()
+    for token in fresh:
+        tokens._decode(token, ACCESS)
+    cold = time.perf_counter() - started
+
+    token = fresh[0]
+    verify_access_token(token)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        verify_access_token(token)
+    cached = time.perf_counter() - started
+    return {"cold_us": cold / iterations * 1e6, "cached_us": cached / iterations * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+    result = measure(args.iterations)
+    print(f"verify cold:   {result['cold_us']:.2f} us/token")
+    print(f"verify cached: {result['cached_us']:.2f} us/token")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare the two list-read serialization paths.
+
+    python -m benchmarks.bench_serialization [--sizes 1000 10000 100000]
+
+Runs against an in-memory SQLite database so it needs no server; the numbers
+isolate row hydration + serialization, not Postgres I/O.
+"""
+import argparse
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pydantic import TypeAdapter
+from sqlalchemy import Column, MetaData, Table, create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from crud.crud import TASK_COLUMNS, _rows_to_json
+from models import User, Task
+from schemas.schemas import Task as TaskSchema
+
+TASK_LIST = TypeAdapter(list[TaskSchema])
+
+
+def create_schema(engine) -> None:
+    """SQLite stand-ins for users/tasks: the same columns minus Postgres-only generated ones."""
+    metadata = MetaData()
+    for table in (User.__table__, Task.__table__):
+        columns = [Column(c.name, c.type, primary_key=c.primary_key) for c in table.columns if c.computed is None]
+        Table(table.name, metadata, *columns)
+    metadata.create_all(engine)
+
+
+def seed(engine, user_id: uuid.UUID, count: int) -> None:
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.execute(insert(User), [{"id": user_id, "email": "bench@example.com", "password_hash": "x"}])
+        session.execute(
+            insert(Task),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": user_id,
+                    "title": f"task {i}",
+                    "description": "benchmark row" if i % 2 else None,
+                    "is_completed": i % 3 == 0,
+                    "due_date": now + timedelta(days=i % 30),
+                    "priority": i % 5,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i in range(count)
+            ],
+        )
+        session.commit()
+
+
+def orm_path(engine, user_id: uuid.UUID) -> bytes:
+    with Session(engine) as session:
+        rows = session.execute(select(Task).where(Task.user_id == user_id)).scalars().all()
+        return TASK_LIST.dump_json([TaskSchema.model_validate(row) for row in rows])
+
+
+def core_path(engine, user_id: uuid.UUID) -> bytes:
+    with engine.connect() as conn:
+        rows = conn.execute(select(*TASK_COLUMNS).where(Task.user_id == user_id)).all()
+        return _rows_to_json(rows)
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'orm+pydantic':>14} {'core+dump_json':>16} {'speedup':>8}")
+    for size in args.sizes:
+        engine = create_engine("sqlite://")
+        create_schema(engine)
+        user_id = uuid.uuid4()
+        seed(engine, user_id, size)
+        repeat = max(1, args.repeat if size < 100_000 else args.repeat // 2)
+        orm = best_of(lambda: orm_path(engine, user_id), repeat)
+        core = best_of(lambda: core_path(engine, user_id), repeat)
+        print(f"{size:>8} {orm * 1000:>12.1f}ms {core * 1000:>14.1f}ms {orm / core:>7.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
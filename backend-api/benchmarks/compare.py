@@ -0,0 +1,62 @@
+"""Compare two runner reports and flag regressions.
+
+    python -m benchmarks.compare base.json new.json [--threshold 10]
+
+Exits 1 when any endpoint's p95 grew by more than --threshold percent or it
+issues more statements per request than before.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "db_statements_per_request")
+
+
+def _change(base: float, new: float) -> float | None:
+    return None if not base else (new - base) * 100 / base
+
+
+def compare(base: dict, new: dict, threshold: float) -> tuple[list[str], list[str]]:
+    """Return (report lines, regressions)."""
+    lines, regressions = [], []
+    for endpoint in sorted(set(base["endpoints"]) | set(new["endpoints"])):
+        before, after = base["endpoints"].get(endpoint), new["endpoints"].get(endpoint)
+        if before is None or after is None:
+            lines.append(f"{endpoint}: only in {'new' if before is None else 'base'}")
+            continue
+        cells = []
+        for metric in METRICS:
+            if metric in before and metric in after:
+                change = _change(before[metric], after[metric])
+                cells.append(f"{metric} {before[metric]} -> {after[metric]}" + ("" if change is None else f" ({change:+.1f}%)"))
+        lines.append(f"{endpoint}: " + ", ".join(cells))
+
+        p95 = _change(before["p95_ms"], after["p95_ms"])
+        if p95 is not None and p95 > threshold:
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']} -> {after['p95_ms']} ms ({p95:+.1f}%)")
+        statements = (before.get("db_statements_per_request"), after.get("db_statements_per_request"))
+        if None not in statements and statements[1] > statements[0]:
+            regressions.append(f"{endpoint}: {statements[0]} -> {statements[1]} statements per request")
+    return lines, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 growth in percent")
+    args = parser.parse_args()
+    with open(args.base) as fh:
+        base = json.load(fh)
+    with open(args.new) as fh:
+        new = json.load(fh)
+
+    lines, regressions = compare(base, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print("\nregressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
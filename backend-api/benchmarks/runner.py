@@ -0,0 +1,242 @@
+"""Drive the app with a scripted request mix and report latency and query counts.
+
+    python -m benchmarks.runner --mix list-heavy --duration 30 --concurrency 16 \\
+        --manifest bench-manifest.json --output list-heavy.json
+
+--target asgi (default) runs the app in-process through httpx's ASGI transport;
+--target uvicorn starts it as a server on a free port; any http(s) URL is used
+as-is. Without --manifest the database is seeded first (see benchmarks.seed).
+--storage memory runs the in-process app on the in-memory storage backend,
+seeded with the same rows: no database, and a baseline for ORM/driver overhead.
+Per-endpoint statement counts come from the app's own /metrics, scraped
+before and after the run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks import scenarios
+from benchmarks.seed import seed, seed_memory
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SAMPLE = re.compile(r'^(http_request_db_(?:statements|seconds)_(?:sum|count))\{method="([^"]*)",route="([^"]*)"\} (\S+)$')
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 for an empty one)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def parse_metrics(text: str) -> dict[tuple[str, str], dict[str, float]]:
+    """(method, route) -> per-request DB sample sums/counts from /metrics text."""
+    parsed: dict[tuple[str, str], dict[str, float]] = defaultdict(dict)
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            name, method, route, value = match.groups()
+            parsed[(method, route)][name] = float(value)
+    return parsed
+
+
+def db_usage(before: dict, after: dict) -> dict[tuple[str, str], dict[str, float]]:
+    """Statements and DB milliseconds per request for everything hit during the run."""
+    usage = {}
+    for key, end in after.items():
+        start = before.get(key, {})
+        delta = {name: value - start.get(name, 0.0) for name, value in end.items()}
+        requests = delta.get("http_request_db_statements_count", 0)
+        if requests > 0:
+            usage[key] = {
+                "db_statements_per_request": round(delta.get("http_request_db_statements_sum", 0) / requests, 2),
+                "db_ms_per_request": round(delta.get("http_request_db_seconds_sum", 0) * 1000 / requests, 3),
+            }
+    return usage
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    milliseconds = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(milliseconds, 50), 2),
+        "p95_ms": round(percentile(milliseconds, 95), 2),
+        "p99_ms": round(percentile(milliseconds, 99), 2),
+        "mean_ms": round(sum(milliseconds) / len(milliseconds), 2) if milliseconds else 0.0,
+    }
+
+
+async def run_mix(client: httpx.AsyncClient, manifest: dict, mix: str, duration: float, concurrency: int, rng_seed: int) -> tuple[dict, float]:
+    entries = [u for u in manifest["users"] if u["task_ids"]]
+    if not entries:
+        raise SystemExit("manifest has no users with tasks")
+    users = [scenarios.UserState(u["id"], u["category_ids"], u["project_ids"], u["task_ids"]) for u in entries]
+    # Logins hash passwords, so they happen before the clock starts
+    for user, entry in zip(users, entries):
+        await scenarios.login(client, user, entry["email"], manifest["password"])
+    latencies: dict[tuple[str, str], list[float]] = defaultdict(list)
+    errors: dict[tuple[str, str], int] = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int) -> None:
+        rng = random.Random(rng_seed * 1000 + n)
+        while time.perf_counter() < deadline:
+            operation = scenarios.pick(rng, mix)
+            started = time.perf_counter()
+            try:
+                response, key = await operation(client, rng, rng.choice(users))
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                key, failed = ("ERR", operation.__name__), True
+            latencies[key].append(time.perf_counter() - started)
+            if failed:
+                errors[key] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return {key: (values, errors[key]) for key, values in latencies.items()}, time.perf_counter() - started
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as probe:
+        while True:
+            try:
+                if (await probe.get("/version")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.perf_counter() > deadline:
+                raise SystemExit(f"server at {base_url} did not become ready")
+            await asyncio.sleep(0.2)
+
+
+async def benchmark(args, manifest: dict | None) -> dict:
+    server = None
+    stack = AsyncExitStack()
+    if args.target == "asgi":
+        # db.session reads DATABASE_URL / STORAGE_BACKEND at import time
+        os.environ["STORAGE_BACKEND"] = args.storage
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        sys.path.insert(0, ROOT)
+        from main import app
+
+        if args.storage == "memory":
+            from db.session import memory_repository
+
+            manifest = seed_memory(memory_repository, args.users, 5, 5, args.tasks, args.seed)
+
+        # The ASGI transport doesn't send lifespan events; run startup/shutdown here
+        await stack.enter_async_context(app.router.lifespan_context(app))
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+    else:
+        transport = None
+        base_url = args.target
+        if args.target == "uvicorn":
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+                cwd=ROOT,
+                env={**os.environ, "DATABASE_URL": args.database_url},
+            )
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        if transport is None:
+            await _wait_ready(base_url)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30.0) as client:
+            if args.warmup:
+                await run_mix(client, manifest, args.mix, args.warmup, args.concurrency, args.seed + 1)
+            before = parse_metrics((await client.get("/metrics")).text)
+            results, elapsed = await run_mix(client, manifest, args.mix, args.duration, args.concurrency, args.seed)
+            # With several uvicorn workers each scrape sees one worker only
+            usage = db_usage(before, parse_metrics((await client.get("/metrics")).text))
+    finally:
+        await stack.aclose()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    endpoints = {}
+    for (method, route), (values, errors) in sorted(results.items()):
+        endpoints[f"{method} {route}"] = {**summarize(values, errors, elapsed), **usage.get((method, route), {})}
+    return {
+        "meta": {
+            "mix": args.mix,
+            "target": args.target,
+            "storage": args.storage,
+            "duration_s": round(elapsed, 2),
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "volumes": manifest.get("volumes"),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "totals": summarize([v for values, _ in results.values() for v in values], sum(e for _, e in results.values()), elapsed),
+        "endpoints": endpoints,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", choices=sorted(scenarios.MIXES), default="list-heavy")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds, excluded from the report")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--target", default="asgi", help="asgi, uvicorn or a base URL")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (--target uvicorn)")
+    parser.add_argument("--storage", choices=("sql", "memory"), default="sql", help="memory needs --target asgi")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="defaults to $DATABASE_URL")
+    parser.add_argument("--manifest", help="from benchmarks.seed; seeds --users/--tasks first when omitted")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=1000, help="per user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    if args.storage == "memory" and args.target != "asgi":
+        parser.error("--storage memory runs in-process only (--target asgi)")
+    if args.storage == "sql" and not args.database_url and (args.target in ("asgi", "uvicorn") or not args.manifest):
+        parser.error("--database-url or DATABASE_URL is required")
+
+    if args.storage == "memory":
+        manifest = None  # seeded in-process once the app is imported
+    elif args.manifest:
+        with open(args.manifest) as fh:
+            manifest = json.load(fh)
+    else:
+        manifest = asyncio.run(seed(args.database_url, args.users, 5, 5, args.tasks, args.seed))
+
+    report = json.dumps(asyncio.run(benchmark(args, manifest)), indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
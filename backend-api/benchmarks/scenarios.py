@@ -0,0 +1,140 @@
+"""Scripted request mixes for the load runner.
+
+Each operation picks a seeded user and issues one request; it returns the
+(method, route template) it hit so results group the same way /metrics does.
+"""
+import random
+from dataclasses import dataclass, field
+
+API = "/api/v1"
+SEARCH_TERMS = ("report", "budget review", "deploy", "flight hotel", "taxes", "migrate sprint", "dentist")
+
+
+@dataclass
+class UserState:
+    id: str
+    category_ids: list[str]
+    project_ids: list[str]
+    task_ids: list[str]
+    # Tasks created during the run, deleted again by the write mix
+    created: list[str] = field(default_factory=list)
+    sync_token: str | None = None
+    # Authorization header from login()
+    headers: dict = field(default_factory=dict)
+
+
+async def login(client, user: UserState, email: str, password: str) -> None:
+    response = await client.post(f"{API}/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _task_body(rng: random.Random, user: UserState) -> dict:
+    return {
+        "title": f"bench {rng.choice(SEARCH_TERMS)} {rng.randrange(10**6)}",
+        "priority": rng.randint(0, 3),
+        "category_id": rng.choice(user.category_ids) if user.category_ids and rng.random() < 0.7 else None,
+        "project_id": rng.choice(user.project_ids) if user.project_ids and rng.random() < 0.5 else None,
+    }
+
+
+async def list_tasks(client, rng, user):
+    params = {"limit": rng.choice((20, 50, 100))}
+    if rng.random() < 0.5:
+        params["is_completed"] = "false"
+    if rng.random() < 0.3:
+        params["sort"] = rng.choice(("-priority", "due_date", "-updated_at"))
+    response = await client.get(f"{API}/tasks/", params=params, headers=user.headers)
+    cursor = response.headers.get("X-Next-Cursor")
+    if cursor and rng.random() < 0.3:
+        response = await client.get(f"{API}/tasks/", params={**params, "cursor": cursor}, headers=user.headers)
+    return response, ("GET", f"{API}/tasks/")
+
+
+async def get_task(client, rng, user):
+    task_id = rng.choice(user.task_ids)
+    return await client.get(f"{API}/tasks/{task_id}", headers=user.headers), ("GET", f"{API}/tasks/{{task_id}}")
+
+
+async def list_categories(client, rng, user):
+    return await client.get(f"{API}/categories/", headers=user.headers), ("GET", f"{API}/categories/")
+
+
+async def list_projects(client, rng, user):
+    return await client.get(f"{API}/projects/", headers=user.headers), ("GET", f"{API}/projects/")
+
+
+async def user_stats(client, rng, user):
+    return await client.get(f"{API}/users/{user.id}/stats", headers=user.headers), ("GET", f"{API}/users/{{user_id}}/stats")
+
+
+async def search_tasks(client, rng, user):
+    params = {"q": rng.choice(SEARCH_TERMS)}
+    return await client.get(f"{API}/tasks/search", params=params, headers=user.headers), ("GET", f"{API}/tasks/search")
+
+
+async def create_task(client, rng, user):
+    response = await client.post(f"{API}/tasks/", headers=user.headers, json=_task_body(rng, user))
+    if response.status_code == 200:
+        user.created.append(response.json()["id"])
+    return response, ("POST", f"{API}/tasks/")
+
+
+async def update_task(client, rng, user):
+    task_id = rng.choice(user.task_ids)
+    body = {"is_completed": rng.random() < 0.5, "priority": rng.randint(0, 3)}
+    return await client.put(f"{API}/tasks/{task_id}", headers=user.headers, json=body), ("PUT", f"{API}/tasks/{{task_id}}")
+
+
+async def delete_task(client, rng, user):
+    if not user.created:
+        return await create_task(client, rng, user)
+    task_id = user.created.pop(rng.randrange(len(user.created)))
+    return await client.delete(f"{API}/tasks/{task_id}", headers=user.headers), ("DELETE", f"{API}/tasks/{{task_id}}")
+
+
+async def batch_create(client, rng, user):
+    body = {"items": [_task_body(rng, user) for _ in range(rng.randint(5, 50))]}
+    response = await client.post(f"{API}/tasks/batch", headers=user.headers, json=body)
+    if response.status_code == 200:
+        user.created.extend(item["id"] for item in response.json()["results"] if item["id"])
+    return response, ("POST", f"{API}/tasks/batch")
+
+
+async def batch_update(client, rng, user):
+    ids = rng.sample(user.task_ids, min(len(user.task_ids), rng.randint(5, 50)))
+    body = {"items": [{"id": task_id, "priority": rng.randint(0, 3)} for task_id in ids]}
+    return await client.put(f"{API}/tasks/batch", headers=user.headers, json=body), ("PUT", f"{API}/tasks/batch")
+
+
+async def sync_pull(client, rng, user):
+    params = {}
+    if user.sync_token:
+        params["since"] = user.sync_token
+    response = await client.get(f"{API}/sync/", params=params, headers=user.headers)
+    if response.status_code == 200:
+        user.sync_token = response.json()["token"]
+    elif response.status_code == 410:
+        user.sync_token = None
+    return response, ("GET", f"{API}/sync/")
+
+
+# mix name -> (operation, weight)
+MIXES = {
+    "list-heavy": [
+        (list_tasks, 40), (get_task, 20), (list_categories, 10), (list_projects, 10),
+        (user_stats, 10), (search_tasks, 10),
+    ],
+    "write-heavy": [
+        (create_task, 25), (update_task, 30), (delete_task, 10), (batch_create, 5),
+        (batch_update, 10), (list_tasks, 20),
+    ],
+    "sync": [
+        (sync_pull, 70), (update_task, 15), (create_task, 10), (delete_task, 5),
+    ],
+}
+
+
+def pick(rng: random.Random, mix: str):
+    operations, weights = zip(*MIXES[mix])
+    return rng.choices(operations, weights)[0]
@@ -0,0 +1,151 @@
+"""Seed a database with synthetic users, categories, projects and tasks.
+
+    python -m benchmarks.seed --database-url postgresql+asyncpg://... \\
+        --users 20 --categories 8 --projects 10 --tasks 5000 --manifest bench-manifest.json
+
+Volumes are per user. The same --seed produces the same rows, so runs are
+comparable. The schema must already be migrated (alembic upgrade head).
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.security import pwd_context
+from models import User, Category, Project, Task
+
+PASSWORD = "benchmark-password"
+INSERT_BATCH = 5000
+# Task ids kept per user in the manifest for item reads and updates
+SAMPLE_TASK_IDS = 200
+
+WORDS = (
+    "report invoice groceries dentist deploy review budget backup meeting draft call plan "
+    "refactor garden taxes renew launch migrate sprint payroll laundry flight hotel email"
+).split()
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+async def _insert(conn, model, rows: list[dict]) -> None:
+    for start in range(0, len(rows), INSERT_BATCH):
+        await conn.execute(insert(model), rows[start:start + INSERT_BATCH])
+
+
+def generate(users: int, categories: int, projects: int, tasks: int, rng_seed: int = 42):
+    """Yield (user, categories, projects, tasks, manifest entry) per user, as table rows."""
+    rng = random.Random(rng_seed)
+    run = f"{rng_seed}-{uuid.uuid4().hex[:8]}"
+    now = datetime.now(timezone.utc)
+    # One hash shared by every user: hashing is deliberately slow
+    password_hash = pwd_context.hash(PASSWORD)
+    for n in range(users):
+        user_row = {"id": _uuid(rng), "email": f"bench-{run}-{n}@example.com", "password_hash": password_hash, "created_at": now}
+        category_rows = [{"id": _uuid(rng), "user_id": user_row["id"], "name": f"{rng.choice(WORDS)} {i}"} for i in range(categories)]
+        project_rows = [
+            {
+                "id": _uuid(rng),
+                "user_id": user_row["id"],
+                "name": f"{_text(rng, 2)} {i}",
+                "create_day": now - timedelta(days=rng.randint(0, 365)),
+                "due_date": now + timedelta(days=rng.randint(-30, 180)) if rng.random() < 0.7 else None,
+            }
+            for i in range(projects)
+        ]
+        task_rows = []
+        for _ in range(tasks):
+            created = now - timedelta(minutes=rng.randint(0, 525_600))
+            task_rows.append({
+                "id": _uuid(rng),
+                "user_id": user_row["id"],
+                "category_id": rng.choice(category_rows)["id"] if category_rows and rng.random() < 0.8 else None,
+                "project_id": rng.choice(project_rows)["id"] if project_rows and rng.random() < 0.6 else None,
+                "title": _text(rng, rng.randint(2, 6)),
+                "description": _text(rng, rng.randint(5, 30)) if rng.random() < 0.5 else None,
+                "is_completed": rng.random() < 0.4,
+                "due_date": created + timedelta(days=rng.randint(-10, 60)) if rng.random() < 0.6 else None,
+                "priority": rng.randint(0, 3),
+                "created_at": created,
+                "updated_at": created,
+            })
+        entry = {
+            "id": str(user_row["id"]),
+            "email": user_row["email"],
+            "category_ids": [str(row["id"]) for row in category_rows],
+            "project_ids": [str(row["id"]) for row in project_rows],
+            "task_ids": [str(row["id"]) for row in rng.sample(task_rows, min(SAMPLE_TASK_IDS, len(task_rows)))],
+        }
+        yield user_row, category_rows, project_rows, task_rows, entry
+
+
+def _manifest(users: int, categories: int, projects: int, tasks: int, rng_seed: int) -> dict:
+    return {
+        "seed": rng_seed,
+        "volumes": {"users": users, "categories": categories, "projects": projects, "tasks": tasks},
+        "password": PASSWORD,
+        "users": [],
+    }
+
+
+async def seed(database_url: str, users: int, categories: int, projects: int, tasks: int, rng_seed: int = 42) -> dict:
+    """Insert the rows and return a manifest describing them for the runner."""
+    manifest = _manifest(users, categories, projects, tasks, rng_seed)
+    engine = create_async_engine(database_url)
+    try:
+        for user_row, category_rows, project_rows, task_rows, entry in generate(users, categories, projects, tasks, rng_seed):
+            async with engine.begin() as conn:  # one transaction per user
+                await _insert(conn, User, [user_row])
+                await _insert(conn, Category, category_rows)
+                await _insert(conn, Project, project_rows)
+                await _insert(conn, Task, task_rows)
+            manifest["users"].append(entry)
+    finally:
+        await engine.dispose()
+    return manifest
+
+
+def seed_memory(repository, users: int, categories: int, projects: int, tasks: int, rng_seed: int = 42) -> dict:
+    """Load the same rows into a MemoryRepository (STORAGE_BACKEND=memory)."""
+    manifest = _manifest(users, categories, projects, tasks, rng_seed)
+    for user_row, category_rows, project_rows, task_rows, entry in generate(users, categories, projects, tasks, rng_seed):
+        repository.load(User(**user_row), category_rows, project_rows, task_rows)
+        manifest["users"].append(entry)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="defaults to $DATABASE_URL")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=5, help="per user")
+    parser.add_argument("--projects", type=int, default=5, help="per user")
+    parser.add_argument("--tasks", type=int, default=1000, help="per user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default="bench-manifest.json")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    manifest = asyncio.run(seed(args.database_url, args.users, args.categories, args.projects, args.tasks, args.seed))
+    with open(args.manifest, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    print(f"seeded {args.users} users x {args.tasks} tasks; manifest written to {args.manifest}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Bulk-load tasks for one user from an NDJSON or CSV file.
+
+    python -m cli.import_tasks <user_id> tasks.ndjson [--format csv] [--batch-size 5000]
+
+Pass `-` to read stdin. Progress goes to stderr, the final report (JSON) to stdout.
+"""
+import argparse
+import asyncio
+import sys
+import os
+from uuid import UUID
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crud.crud import get_user
+from crud.importer import IMPORT_FORMATS, READERS, import_tasks
+from db.session import all_engines, session_for
+
+CHUNK_SIZE = 1 << 20
+
+
+async def read_chunks(path: str):
+    stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while chunk := await asyncio.to_thread(stream.read, CHUNK_SIZE):
+            yield chunk
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+
+def progress(report) -> None:
+    print(
+        f"\r{report.rows_read} read, {report.rows_imported} imported, {report.rows_skipped} skipped, "
+        f"{report.rows_failed} failed ({report.rows_per_second:.0f} rows/s)",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+async def run(user_id: UUID, path: str, fmt: str, batch_size: int | None) -> int:
+    try:
+        async with session_for(user_id)() as db:
+            if not await get_user(db, user_id):
+                print(f"user {user_id} not found", file=sys.stderr)
+                return 1
+            report = await import_tasks(db, user_id, READERS[fmt](read_chunks(path)), batch_size=batch_size, on_progress=progress)
+    finally:
+        for engine in all_engines():
+            await engine.dispose()
+    print(file=sys.stderr)
+    print(report.model_dump_json(indent=2))
+    return 0 if not report.rows_failed else 2
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("user_id", type=UUID)
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="defaults to the file extension, else ndjson")
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    sys.exit(asyncio.run(run(args.user_id, args.path, fmt, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Move users between shards (SHARD_URLS) bucket by bucket.
+
+    python -m cli.rebalance_shards status
+    python -m cli.rebalance_shards move --bucket 17 [--bucket 18 ...] --to 2
+    python -m cli.rebalance_shards purge
+
+A move goes:
+  1. Add the buckets to SHARD_FROZEN_BUCKETS and restart the API: their
+     writes answer 503 while reads keep working.
+  2. `move` copies each user in the buckets from the shard SHARD_BUCKET_MAP
+     routes them to now onto shard --to, one transaction per user.
+  3. Point the buckets at the new shard in SHARD_BUCKET_MAP, take them out of
+     SHARD_FROZEN_BUCKETS and restart.
+  4. `purge` deletes users from every shard the map no longer routes them to,
+     once their copy is in place.
+
+Copied users' delta sync tokens stop working and their clients resync once.
+Reports go to stdout as JSON.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import os
+from uuid import UUID
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import delete, insert, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from crud.cache import invalidate
+from crud.sync import RESYNC_ENTITY
+from models.models import ArchivedTask, Category, ChangeLog, EntityVersion, Project, RevokedToken, Task, User
+from db.session import shard_bucket, shards
+
+# Parents before children
+COPIED_MODELS = [
+    (User, User.id), (Category, Category.user_id), (Project, Project.user_id), (Task, Task.user_id),
+    (ArchivedTask, ArchivedTask.user_id), (RevokedToken, RevokedToken.user_id),
+]
+
+# The copy went through the counter triggers for hot tasks only, on top of the
+# copied values; count both tables again
+RECOUNT = [
+    text("""
+        UPDATE projects p
+        SET task_count = c.total,
+            completed_count = c.done,
+            progress = CASE WHEN c.total > 0 THEN c.done * 100 / c.total ELSE 0 END
+        FROM (
+            SELECT pr.id, count(t.project_id) AS total, count(t.project_id) FILTER (WHERE t.is_completed) AS done
+            FROM projects pr LEFT JOIN (
+                SELECT project_id, is_completed FROM tasks WHERE user_id = :user_id AND deleted_at IS NULL
+                UNION ALL SELECT project_id, is_completed FROM tasks_archive WHERE user_id = :user_id
+            ) t ON t.project_id = pr.id
+            WHERE pr.user_id = :user_id
+            GROUP BY pr.id
+        ) c
+        WHERE p.user_id = :user_id AND p.id = c.id
+    """),
+    text("""
+        UPDATE categories ca
+        SET task_count = c.total, completed_count = c.done
+        FROM (
+            SELECT cat.id, count(t.category_id) AS total, count(t.category_id) FILTER (WHERE t.is_completed) AS done
+            FROM categories cat LEFT JOIN (
+                SELECT category_id, is_completed FROM tasks WHERE user_id = :user_id AND deleted_at IS NULL
+                UNION ALL SELECT category_id, is_completed FROM tasks_archive WHERE user_id = :user_id
+            ) t ON t.category_id = cat.id
+            WHERE cat.user_id = :user_id
+            GROUP BY cat.id
+        ) c
+        WHERE ca.user_id = :user_id AND ca.id = c.id
+    """),
+]
+
+# Tokens issued before this (unix seconds) are refused on the new shard. One
+# second of margin, since tokens carry whole seconds.
+RESYNC_AT = literal_column("extract(epoch FROM now())::bigint + 1")
+
+
+def _copied_columns(model) -> list:
+    return [column for column in model.__table__.columns if column.computed is None]
+
+
+async def _users_on(db: AsyncSession, buckets: set[int] | None = None) -> list[UUID]:
+    user_ids = (await db.execute(select(User.id))).scalars().all()
+    if buckets is None:
+        return list(user_ids)
+    return [user_id for user_id in user_ids if shard_bucket(user_id) in buckets]
+
+
+async def _delete_user_rows(db: AsyncSession, user_id: UUID) -> None:
+    # Children first; tasks.user_id has no ON DELETE CASCADE
+    for model in (ArchivedTask, Task, Category, Project, ChangeLog, EntityVersion, RevokedToken):
+        await db.execute(delete(model).where(model.user_id == user_id))
+    await db.execute(delete(User).where(User.id == user_id))
+
+
+async def copy_user(source: AsyncSession, target: AsyncSession, user_id: UUID) -> dict[str, int]:
+    """Copy one user's rows from `source` to `target` in one target transaction.
+
+    Replaces whatever an earlier, interrupted copy left on the target.
+    """
+    await source.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+    rows = {}
+    for model, owner in COPIED_MODELS:
+        result = await source.execute(select(*_copied_columns(model)).where(owner == user_id))
+        rows[model] = [row._asdict() for row in result]
+    versions = (await source.execute(select(EntityVersion).where(EntityVersion.user_id == user_id))).scalars().all()
+    await source.rollback()
+
+    await _delete_user_rows(target, user_id)
+    # Versions continue from the old shard's, so no ETag a client holds can
+    # match different data
+    for version in versions:
+        await target.execute(insert(EntityVersion).values(user_id=user_id, entity=version.entity, version=version.version))
+    for model, _ in COPIED_MODELS:
+        if rows[model]:
+            await target.execute(insert(model), rows[model])
+    for statement in RECOUNT:
+        await target.execute(statement, {"user_id": user_id})
+    stmt = pg_insert(EntityVersion).values(user_id=user_id, entity=RESYNC_ENTITY, version=RESYNC_AT)
+    await target.execute(stmt.on_conflict_do_update(index_elements=["user_id", "entity"], set_={"version": stmt.excluded.version}))
+    await target.commit()
+    return {model.__tablename__: len(rows[model]) for model, _ in COPIED_MODELS}
+
+
+async def status() -> dict:
+    report = {"shards": []}
+    for index, session in enumerate(shards.sessions):
+        async with session() as db:
+            user_ids = await _users_on(db)
+        misplaced = [user_id for user_id in user_ids if shards.shard_of(user_id) != index]
+        report["shards"].append({"shard": index, "users": len(user_ids), "misplaced": len(misplaced)})
+    return report
+
+
+async def move(buckets: set[int], to: int) -> dict:
+    unfrozen = buckets - shards.frozen_buckets
+    if unfrozen:
+        raise SystemExit(f"freeze buckets {sorted(unfrozen)} first (SHARD_FROZEN_BUCKETS), or writes made during the copy are lost")
+    report = {"moved": 0, "rows": {}}
+    for shard in sorted({shards.shard_of_bucket(bucket) for bucket in buckets} - {to}):
+        async with shards.sessions[shard]() as source:
+            user_ids = await _users_on(source, {bucket for bucket in buckets if shards.shard_of_bucket(bucket) == shard})
+            await source.rollback()
+            for user_id in user_ids:
+                async with shards.sessions[to]() as target:
+                    copied = await copy_user(source, target, user_id)
+                await invalidate(user_id, "tasks", "categories", "projects", "stats")
+                for table, count in copied.items():
+                    report["rows"][table] = report["rows"].get(table, 0) + count
+                report["moved"] += 1
+                print(f"\rcopied {report['moved']} users", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return report
+
+
+async def purge() -> dict:
+    report = {"purged": 0, "kept": 0}
+    for index, session in enumerate(shards.sessions):
+        async with session() as db:
+            misplaced = [user_id for user_id in await _users_on(db) if shards.shard_of(user_id) != index]
+            await db.rollback()
+            for user_id in misplaced:
+                async with shards.sessions[shards.shard_of(user_id)]() as home:
+                    copied = (await home.execute(select(User.id).where(User.id == user_id))).scalar_one_or_none()
+                if copied is None:
+                    # Never copied: deleting would lose the account
+                    print(f"user {user_id} on shard {index} has no copy on shard {shards.shard_of(user_id)}; kept", file=sys.stderr)
+                    report["kept"] += 1
+                    continue
+                await _delete_user_rows(db, user_id)
+                await db.commit()
+                await invalidate(user_id, "tasks", "categories", "projects", "stats")
+                report["purged"] += 1
+    return report
+
+
+async def run(args) -> dict:
+    try:
+        if args.command == "status":
+            return await status()
+        if args.command == "move":
+            if not 0 <= args.to < len(shards.sessions):
+                raise SystemExit(f"--to must name one of the {len(shards.sessions)} shards (0-based)")
+            return await move(set(args.bucket), args.to)
+        return await purge()
+    finally:
+        for engine in shards.engines:
+            await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="users per shard, and how many are on the wrong one")
+    move_parser = commands.add_parser("move", help="copy the users of some buckets to another shard")
+    move_parser.add_argument("--bucket", type=int, action="append", required=True, help=f"0..{settings.shard_buckets - 1}")
+    move_parser.add_argument("--to", type=int, required=True, help="target shard index")
+    commands.add_parser("purge", help="delete users from shards they no longer belong to")
+    args = parser.parse_args()
+    if shards is None:
+        raise SystemExit("SHARD_URLS is not set")
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Recount project and category task counters and fix any drift.
+
+    python -m cli.reconcile_counters [--batch-size 1000]
+
+The API runs the same job every COUNTER_RECONCILE_INTERVAL_SECONDS; use this
+after restoring a dump or editing tasks with triggers disabled.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crud.counters import reconcile_counters
+from db.session import all_engines, all_sessions
+
+
+async def run(batch_size: int) -> dict[str, int]:
+    fixed: dict[str, int] = {}
+    try:
+        for session in all_sessions():
+            async with session() as db:
+                for table, count in (await reconcile_counters(db, batch_size=batch_size)).items():
+                    fixed[table] = fixed.get(table, 0) + count
+    finally:
+        for engine in all_engines():
+            await engine.dispose()
+    return fixed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.batch_size))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_periodically(name: str, interval: float, job: Callable[[], Awaitable]) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("background job %s failed", name)
+
+
+def start_periodic(name: str, interval: float, job: Callable[[], Awaitable]) -> asyncio.Task | None:
+    """Run `job` every `interval` seconds until cancelled; interval <= 0 disables it."""
+    if interval <= 0:
+        return None
+    return asyncio.create_task(_run_periodically(name, interval, job), name=name)
+
+
+async def stop_all(tasks: list[asyncio.Task | None]) -> None:
+    running = [task for task in tasks if task is not None]
+    for task in running:
+        task.cancel()
+    await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from collections import defaultdict
+from uuid import UUID
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# The log_change trigger sends "<user_id>:<txid>" on this channel; Postgres
+# delivers it to every listening worker when the writing transaction commits.
+CHANNEL = "change_log"
+KEEPALIVE_SECONDS = 30.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+class Subscription:
+    """One open stream's wake-up signal. Notifications only say "look again";
+    the data itself is read from change_log, so bursts collapse into one read."""
+
+    def __init__(self, user_id: UUID):
+        self.user_id = user_id
+        # Highest committed txid announced for this user
+        self.notified_txid = 0
+        self._wake = asyncio.Event()
+
+    def notify(self, txid: int) -> None:
+        self.notified_txid = max(self.notified_txid, txid)
+        self._wake.set()
+
+    async def wait(self, timeout: float | None = None) -> bool:
+        """True if woken, False on timeout."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except TimeoutError:
+            return False
+        self._wake.clear()
+        return True
+
+
+class ChangeHub:
+    """Per-worker registry of open streams, fed by the LISTEN connection."""
+
+    def __init__(self):
+        self._subscriptions: dict[UUID, set[Subscription]] = defaultdict(set)
+        self.listening = False
+        self._stats = {"notifications": 0, "wakeups": 0, "malformed": 0, "reconnects": 0, "overflows": 0}
+
+    def subscribe(self, user_id: UUID) -> Subscription:
+        subscription = Subscription(user_id)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: UUID, txid: int) -> None:
+        self._stats["notifications"] += 1
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.notify(txid)
+            self._stats["wakeups"] += 1
+
+    def wake_all(self) -> None:
+        """After a listener reconnect: anything may have been missed."""
+        for subscribers in self._subscriptions.values():
+            for subscription in subscribers:
+                subscription.notify(0)
+
+    def record_overflow(self) -> None:
+        self._stats["overflows"] += 1
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            user_id, txid = payload.split(":")
+            self.publish(UUID(user_id), int(txid))
+        except ValueError:
+            self._stats["malformed"] += 1
+            logger.warning("ignoring malformed %s notification %r", channel, payload)
+
+    async def listen(self, dsn: str) -> None:
+        """Hold a dedicated LISTEN connection until cancelled, reconnecting with backoff.
+
+        Not taken from the engine pool: it is held for the process lifetime,
+        and LISTEN does not work through transaction-mode poolers, so `dsn`
+        must reach Postgres directly.
+        """
+        delay = 1.0
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("change listener cannot connect (%s); retrying in %.0fs", exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            try:
+                await connection.add_listener(CHANNEL, self._on_notification)
+                self.listening, delay = True, 1.0
+                self.wake_all()
+                # A silently dropped connection never terminates; probe it
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), KEEPALIVE_SECONDS)
+                    except TimeoutError:
+                        await connection.execute("SELECT 1", timeout=KEEPALIVE_SECONDS)
+                logger.warning("change listener connection closed")
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, TimeoutError) as exc:
+                logger.warning("change listener connection lost (%s)", exc)
+            finally:
+                self.listening = False
+                connection.terminate()
+            self._stats["reconnects"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "listening": int(self.listening),
+            "users": len(self._subscriptions),
+            "streams": sum(len(subscribers) for subscribers in self._subscriptions.values()),
+            **self._stats,
+        }
+
+
+hub = ChangeHub()
@@ -10,13 +10,172 @@ class Settings(BaseSettings):
     POSTGRES_DB: Optional[str] = None
     POSTGRES_HOST: str = "db"
     POSTGRES_PORT: str = "5432"
-    
+    # "production" applies the production engine profile below
+    APP_ENV: str = "development"
+
+    # "sql" (Postgres) or "memory": an in-process store for tests and
+    # benchmarks. Endpoints the chosen backend can't serve answer 501.
+    storage_backend: str = "sql"
+
+    # Sharding by user (db.session.ShardRouter). SHARD_URLS is a JSON list of
+    # database URLs; when set, each user's rows live on exactly one of them
+    # and DATABASE_URL is not used. A user id hashes to one of shard_buckets
+    # buckets, and buckets go to shards round-robin unless SHARD_BUCKET_MAP
+    # ({"bucket": shard index}) says otherwise. Writes for buckets listed in
+    # SHARD_FROZEN_BUCKETS answer 503 while cli.rebalance_shards moves them.
+    shard_urls: list[str] = []
+    shard_buckets: int = 1024
+    shard_bucket_map: dict[int, int] = {}
+    shard_frozen_buckets: list[int] = []
+
+    # Read replicas (db.session.ReplicaSet). REPLICA_URLS is a JSON list of
+    # streaming replicas of DATABASE_URL; with shards, SHARD_REPLICA_URLS
+    # lists them per shard ([["shard 0 replica", ...], ...]). GET handlers for
+    # tasks, projects and categories read from them round-robin, skipping any
+    # that fails or is more than replica_max_lag_seconds behind. A user's
+    # reads stay on the primary for replica_sticky_seconds after each of their
+    # writes; keep it above max lag + check interval so they always see their
+    # own writes. Per worker, like write-behind.
+    replica_urls: list[str] = []
+    shard_replica_urls: list[list[str]] = []
+    replica_max_lag_seconds: float = 2.0
+    replica_check_interval_seconds: float = 1.0
+    replica_sticky_seconds: float = 5.0
+
+    # Engine / connection pool
+    db_echo: bool = True
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: Optional[int] = None
+    db_prepared_statement_cache_size: int = 100
+    # Set when connecting through a transaction-mode pooler (PgBouncer etc.):
+    # disables asyncpg's prepared statement caches and the client-side pool.
+    db_server_side_pooler: bool = False
+
+    # Password hashing runs off the event loop in a bounded worker pool
+    password_hash_rounds: int = 29000
+    password_hash_executor: str = "process"  # "process" or "thread"
+    password_hash_workers: int = 2
+    password_hash_max_concurrency: int = 4
+    password_hash_max_queue: int = 256
+
+    # Delta sync: change_log rows (and tokens) older than this are discarded
+    sync_retention_days: int = 30
+    sync_prune_interval_seconds: int = 3600
+
+    # Live change stream (/sync/stream, /sync/ws), woken by LISTEN/NOTIFY.
+    # A connection holds at most stream_send_buffer undelivered batches of up
+    # to stream_batch_limit changes; a client that falls further behind is
+    # told to reconnect with its last token.
+    stream_heartbeat_seconds: float = 15.0
+    stream_send_buffer: int = 8
+    stream_batch_limit: int = 500
+    # Re-check delay when a commit is not yet visible past the sync horizon
+    stream_retry_seconds: float = 0.5
+    # LISTEN needs a direct Postgres connection; set this when DATABASE_URL
+    # points at a transaction-mode pooler
+    stream_listen_url: Optional[str] = None
+
+    # Per-user read cache: "memory" (per worker), "redis" (shared) or "none".
+    # The memory backend only sees invalidations from its own worker, so run a
+    # single worker or use redis when serving from several.
+    cache_backend: str = "memory"
+    cache_ttl_seconds: float = 30.0
+    cache_max_entries: int = 10000
+    cache_redis_url: Optional[str] = None
+    # Concurrent identical misses share one load (per worker)
+    cache_single_flight: bool = True
+
+    # Dashboard stats are cached briefly even though writes invalidate them,
+    # because overdue counts change with the clock
+    stats_cache_ttl_seconds: float = 15.0
+    # Project and category ETags change at least this often, for the same reason
+    overdue_etag_seconds: int = 60
+
+    # Write-behind for PUT /tasks/{id} sent with "Prefer: respond-async": the
+    # update is acknowledged with 202, merged per task and written in one
+    # batch per user after write_behind_flush_ms or write_behind_max_ops
+    # updates. Per worker, so read-your-writes needs a single worker or
+    # sticky routing by user.
+    write_behind_enabled: bool = False
+    write_behind_flush_ms: float = 20.0
+    write_behind_max_ops: int = 200
+    write_behind_max_retries: int = 3
+
+    # Recount project/category task counters; 0 disables the background job
+    counter_reconcile_interval_seconds: int = 86400
+
+    # Tasks completed more than archive_after_days ago move to tasks_archive,
+    # archive_batch_size per transaction with a pause in between; 0 disables
+    # the background job. Stats and counters read both tables, so this only
+    # decides what stays in the hot table.
+    archive_after_days: int = 400
+    archive_batch_size: int = 1000
+    archive_batch_pause_seconds: float = 0.1
+    archive_interval_seconds: int = 3600
+
+    # Deletes of users, categories, projects and tasks only set deleted_at;
+    # crud.purge removes the rows every purge_interval_seconds (0 disables),
+    # purge_batch_size rows per transaction with a pause in between. A deleted
+    # category or project with more than purge_batch_size tasks is detached
+    # from them then; smaller ones are detached as they are deleted.
+    purge_interval_seconds: int = 60
+    purge_batch_size: int = 1000
+    purge_batch_pause_seconds: float = 0.1
+
+    # Per-user export: rows fetched per server-side cursor round trip
+    export_batch_size: int = 1000
+
+    # Bulk task import (admin endpoint and cli.import_tasks)
+    import_batch_size: int = 5000
+    import_max_errors: int = 1000
+    # Admin endpoints are disabled unless a token is configured
+    admin_api_token: Optional[str] = None
+
+    # Bearer tokens (core.tokens). AUTH_SIGNING_KEYS is JSON, {"kid": "secret"};
+    # every key verifies, AUTH_ACTIVE_KEY_ID (default: the first) signs.
+    auth_signing_keys: dict[str, str] = {}
+    auth_active_key_id: Optional[str] = None
+    access_token_ttl_seconds: int = 900
+    refresh_token_ttl_seconds: int = 30 * 86400
+    # Revoked access tokens are kept in process until they expire; past this
+    # many a warning is logged. Refresh-token revocations live in the
+    # database, and rows for expired ones are pruned every
+    # revoked_token_prune_interval_seconds (0 disables).
+    auth_denylist_max_entries: int = 10000
+    revoked_token_prune_interval_seconds: int = 3600
+    auth_principal_cache_size: int = 10000
+
+    # Request instrumentation (/metrics). Requests slower than slow_request_ms
+    # are logged with their SQL; requests issuing more than
+    # db_query_warn_threshold statements are logged as possible N+1s. 0 disables.
+    slow_request_ms: float = 0
+    db_query_warn_threshold: int = 25
+
     class Config:
         env_file = "../.env"
 
 
 settings = Settings()
 
+# Defaults applied per APP_ENV unless the variable is set explicitly
+PROFILES = {
+    "production": {
+        "db_echo": False,
+        "db_pool_size": 20,
+        "db_max_overflow": 10,
+        "db_pool_timeout": 5.0,
+        "db_statement_timeout_ms": 15000,
+        "db_query_warn_threshold": 0,
+    },
+}
+for field, value in PROFILES.get(settings.APP_ENV, {}).items():
+    if field not in settings.model_fields_set:
+        setattr(settings, field, value)
+
 # If `DATABASE_URL` is not provided, build it from POSTGRES_* environment vars
 if not settings.database_url:
     user = settings.POSTGRES_USER or os.getenv("POSTGRES_USER")
@@ -0,0 +1,207 @@
+import bisect
+import logging
+import time
+from collections import Counter as Tally
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Minimal Prometheus text-format registry (no client library dependency).
+# Everything runs on the event loop thread, so plain dicts are enough.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help, labels, buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time spent in database statements per request.", ("method", "route"))
+REQUEST_STATEMENTS = Histogram(
+    "http_request_db_statements", "Database statements issued per request.", ("method", "route"), buckets=COUNT_BUCKETS
+)
+DB_STATEMENTS = Counter("db_statements_total", "Database statements executed, by verb.", ("verb",))
+DB_STATEMENT_SECONDS = Histogram("db_statement_duration_seconds", "Database statement latency.", ("verb",))
+DB_POOL_WAIT_SECONDS = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection.")
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("method", "route"))
+COALESCED_READS = Counter("cache_coalesced_reads_total", "Cache misses served by joining an identical in-flight load.", ("namespace",))
+QUERY_WARNINGS = Counter("http_query_warnings_total", "Requests over DB_QUERY_WARN_THRESHOLD statements.", ("method", "route"))
+
+METRICS = [
+    REQUESTS, REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_STATEMENTS,
+    DB_STATEMENTS, DB_STATEMENT_SECONDS, DB_POOL_WAIT_SECONDS, SLOW_REQUESTS, QUERY_WARNINGS, COALESCED_READS,
+]
+
+# name prefix -> (stats function, keys exported as counters); the rest are gauges
+_stats_sources: dict[str, tuple[Callable[[], dict], set[str]]] = {}
+
+
+def register_stats(prefix: str, stats: Callable[[], dict], counters: Iterable[str] = ()) -> None:
+    """Export the numeric values of a stats dict (as shown on /health) on /metrics."""
+    _stats_sources[prefix] = (stats, set(counters))
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    for prefix, (stats, counters) in _stats_sources.items():
+        for key, value in stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{prefix}_{key}"
+            if key in counters:
+                name = name if name.endswith("_total") else f"{name}_total"
+            lines.append(f"# TYPE {name} {'counter' if key in counters else 'gauge'}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    # SQL text -> executions; only kept when the slow log or N+1 warning is on
+    sql: Tally = field(default_factory=Tally)
+
+
+_request: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    DB_STATEMENTS.inc(verb)
+    DB_STATEMENT_SECONDS.observe(elapsed, verb)
+    stats = _request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        if _collect_sql():
+            stats.sql[statement] += 1
+
+
+def _collect_sql() -> bool:
+    return settings.slow_request_ms > 0 or settings.db_query_warn_threshold > 0
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement and attribute it to the current request, if any."""
+    target = getattr(engine, "sync_engine", engine)
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: latency, DB time and statement count per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request.reset(token)
+            # Route templates, not raw paths, keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_SECONDS.observe(elapsed, method, route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route)
+            REQUEST_STATEMENTS.observe(stats.statements, method, route)
+            _report(method, route, scope.get("path", ""), elapsed, stats)
+
+
+def _report(method: str, route: str, path: str, elapsed: float, stats: RequestStats) -> None:
+    threshold = settings.db_query_warn_threshold
+    if threshold > 0 and stats.statements > threshold:
+        QUERY_WARNINGS.inc(method, route)
+        statement, repeats = stats.sql.most_common(1)[0] if stats.sql else ("", 0)
+        logger.warning(
+            "%s %s issued %d statements (threshold %d), possible N+1; most repeated (%dx): %s",
+            method, path, stats.statements, threshold, repeats, statement,
+        )
+    if settings.slow_request_ms > 0 and elapsed * 1000 >= settings.slow_request_ms:
+        SLOW_REQUESTS.inc(method, route)
+        statements = "\n".join(f"  [{count}x] {sql}" for sql, count in stats.sql.most_common(20))
+        logger.warning(
+            "slow request %s %s: %.1f ms, %d statements, %.1f ms in DB\n%s",
+            method, path, elapsed * 1000, stats.statements, stats.db_seconds * 1000, statements,
+        )
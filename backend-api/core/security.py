@@ -0,0 +1,120 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+from core.config import settings
+
+
+# Password hashing context
+# use pbkdf2_sha256 to avoid bcrypt's 72-byte limit and external backends.
+# min/max rounds are pinned to the configured value so a changed setting marks
+# existing hashes as needing an update on the next successful verify.
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.password_hash_rounds,
+    pbkdf2_sha256__min_rounds=settings.password_hash_rounds,
+    pbkdf2_sha256__max_rounds=settings.password_hash_rounds,
+)
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+
+# Executed in the worker pool, so they must be importable top-level functions
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+_executor: Executor | None = None
+_semaphore: asyncio.Semaphore | None = None
+_stats = {
+    "in_flight": 0,
+    "queued": 0,
+    "max_queued": 0,
+    "completed": 0,
+    "rejected": 0,
+    "queue_wait_seconds_total": 0.0,
+    "hash_seconds_total": 0.0,
+}
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.password_hash_executor == "thread":
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+            )
+        else:
+            # spawn: forking a process that already runs an event loop and
+            # driver threads is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _executor
+
+
+async def _run(fn, *args):
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.password_hash_max_concurrency)
+    if _semaphore.locked() and _stats["queued"] >= settings.password_hash_max_queue:
+        _stats["rejected"] += 1
+        raise PasswordHasherBusy("Password hashing queue is full")
+
+    queued_at = time.perf_counter()
+    _stats["queued"] += 1
+    _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+    try:
+        await _semaphore.acquire()
+    finally:
+        _stats["queued"] -= 1
+    started_at = time.perf_counter()
+    _stats["queue_wait_seconds_total"] += started_at - queued_at
+    _stats["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _stats["in_flight"] -= 1
+        _stats["completed"] += 1
+        _stats["hash_seconds_total"] += time.perf_counter() - started_at
+        _semaphore.release()
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """Check `password` against `hashed`.
+
+    Returns (matches, new_hash); new_hash is set when the stored hash was made
+    with different rounds than configured and should be written back.
+    """
+    return await _run(_verify_and_update, password, hashed)
+
+
+def hasher_stats() -> dict:
+    return {
+        "executor": settings.password_hash_executor,
+        "workers": settings.password_hash_workers,
+        "max_concurrency": settings.password_hash_max_concurrency,
+        **{key: round(value, 6) if isinstance(value, float) else value for key, value in _stats.items()},
+    }
+
+
+def shutdown_hasher() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,191 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from uuid import UUID
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Signed bearer tokens: compact JWS with HS256, built on hmac so there is no
+# JWT dependency. Validation is local (no database): check the signature with
+# the key named by the header's kid, then expiry, then the denylist. Several
+# keys may verify at once; only AUTH_ACTIVE_KEY_ID signs, so rotating means
+# adding a key, making it active, and dropping the old one after the longest
+# token lifetime has passed.
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: UUID
+    token_id: str
+    issued_at: int
+    expires_at: int
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _load_keys() -> tuple[dict[str, bytes], str]:
+    keys = {kid: secret.encode() for kid, secret in settings.auth_signing_keys.items()}
+    if not keys:
+        # Fine for one dev process; tokens die with it and other workers reject them
+        logger.warning("AUTH_SIGNING_KEYS is not set; using a random per-process signing key")
+        keys = {"ephemeral": secrets.token_bytes(32)}
+    active = settings.auth_active_key_id or next(iter(keys))
+    if active not in keys:
+        raise RuntimeError(f"AUTH_ACTIVE_KEY_ID {active!r} is not in AUTH_SIGNING_KEYS")
+    return keys, active
+
+
+_keys, _active_kid = _load_keys()
+
+
+def _sign(kid: str, signing_input: bytes) -> bytes:
+    return hmac.new(_keys[kid], signing_input, hashlib.sha256).digest()
+
+
+def issue_token(user_id: UUID, kind: str, ttl: int | None = None) -> tuple[str, int]:
+    """Return (token, expires_in seconds)."""
+    if ttl is None:
+        ttl = settings.access_token_ttl_seconds if kind == ACCESS else settings.refresh_token_ttl_seconds
+    now = int(time.time())
+    header = {"alg": "HS256", "typ": "JWT", "kid": _active_kid}
+    claims = {"sub": str(user_id), "typ": kind, "iat": now, "exp": now + ttl, "jti": uuid.uuid4().hex}
+    signing_input = ".".join(_b64encode(json.dumps(part, separators=(",", ":")).encode()) for part in (header, claims))
+    signature = _sign(_active_kid, signing_input.encode())
+    return f"{signing_input}.{_b64encode(signature)}", ttl
+
+
+def _decode(token: str, kind: str) -> Principal:
+    try:
+        encoded_header, encoded_claims, encoded_signature = token.split(".")
+        header = json.loads(_b64decode(encoded_header))
+        kid = header.get("kid")
+        if header.get("alg") != "HS256" or kid not in _keys:
+            raise InvalidToken("Unknown signing key")
+        expected = _sign(kid, f"{encoded_header}.{encoded_claims}".encode())
+        if not hmac.compare_digest(expected, _b64decode(encoded_signature)):
+            raise InvalidToken("Bad signature")
+        claims = json.loads(_b64decode(encoded_claims))
+        principal = Principal(UUID(claims["sub"]), claims["jti"], int(claims["iat"]), int(claims["exp"]))
+        token_kind = claims["typ"]
+    except InvalidToken:
+        raise
+    except (ValueError, KeyError, TypeError, AttributeError, binascii.Error) as exc:
+        raise InvalidToken("Malformed token") from exc
+    if token_kind != kind:
+        raise InvalidToken(f"Expected an {kind} token")
+    return principal
+
+
+class Denylist:
+    """Revoked access tokens and per-user revocation times, each kept only
+    until the tokens they cover would have expired anyway.
+
+    In-process: with several workers a revocation only reaches the worker that
+    handled it, so keep access tokens short-lived. Refresh tokens are checked
+    against the database instead (crud.tokens).
+    """
+
+    def __init__(self, max_entries: int):
+        # Past this, revocations are still kept (dropping one early would make
+        # its token valid again) but a warning is logged
+        self.max_entries = max_entries
+        self._tokens: OrderedDict[str, int] = OrderedDict()  # jti -> exp, in revocation order
+        self._users: dict[UUID, tuple[int, int]] = {}  # user -> (revoked_at, forget_at)
+
+    def revoke(self, principal: Principal) -> None:
+        self._tokens[principal.token_id] = principal.expires_at
+        self._tokens.move_to_end(principal.token_id)
+        self._prune()
+        if len(self._tokens) > self.max_entries:
+            logger.warning("%d revoked access tokens have not expired yet (AUTH_DENYLIST_MAX_ENTRIES=%d)", len(self._tokens), self.max_entries)
+
+    def revoke_user(self, user_id: UUID) -> None:
+        """Reject every token issued to the user up to now (password change etc.)."""
+        now = int(time.time())
+        self._users[user_id] = (now, now + settings.access_token_ttl_seconds)
+
+    def is_revoked(self, principal: Principal) -> bool:
+        if principal.token_id in self._tokens:
+            return True
+        revoked = self._users.get(principal.user_id)
+        return revoked is not None and principal.issued_at < revoked[0]
+
+    def _prune(self) -> None:
+        # Every entry expires within one access-token lifetime of being added,
+        # so dropping expired entries from the front keeps the list bounded
+        now = int(time.time())
+        while self._tokens and next(iter(self._tokens.values())) < now:
+            self._tokens.popitem(last=False)
+        for user_id in [user_id for user_id, (_, forget_at) in self._users.items() if forget_at < now]:
+            del self._users[user_id]
+
+    def __len__(self) -> int:
+        return len(self._tokens) + len(self._users)
+
+
+denylist = Denylist(settings.auth_denylist_max_entries)
+
+# Access token -> Principal for tokens already verified once, so repeat
+# requests skip the signature check and JSON decoding entirely
+_principals: OrderedDict[str, Principal] = OrderedDict()
+_stats = {"verified": 0, "cache_hits": 0, "rejected": 0}
+
+
+def verify_access_token(token: str) -> Principal:
+    principal = _principals.get(token)
+    if principal is None:
+        try:
+            principal = _decode(token, ACCESS)
+        except InvalidToken:
+            _stats["rejected"] += 1
+            raise
+        _stats["verified"] += 1
+        _principals[token] = principal
+        if len(_principals) > settings.auth_principal_cache_size:
+            _principals.popitem(last=False)
+    else:
+        _stats["cache_hits"] += 1
+    if principal.expires_at <= time.time():
+        _principals.pop(token, None)
+        _stats["rejected"] += 1
+        raise InvalidToken("Token expired")
+    if denylist.is_revoked(principal):
+        _stats["rejected"] += 1
+        raise InvalidToken("Token revoked")
+    return principal
+
+
+def verify_refresh_token(token: str) -> Principal:
+    """Signature and expiry only: whether the token was used or revoked is
+    for the database to say (Repository.spend_refresh_token)."""
+    principal = _decode(token, REFRESH)
+    if principal.expires_at <= time.time():
+        raise InvalidToken("Token expired")
+    return principal
+
+
+def auth_stats() -> dict:
+    return {**_stats, "principal_cache_entries": len(_principals), "denylist_entries": len(denylist), "active_key_id": _active_kid}
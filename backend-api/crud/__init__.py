@@ -5,11 +5,13 @@ from .crud import (
     update_user,
     delete_user,
     get_categories,
+    get_categories_json,
     get_category,
     create_category,
     update_category,
     delete_category,
     get_tasks,
+    get_tasks_json,
     get_task,
     create_task,
     update_task,
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from .cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = (
+    "id, user_id, category_id, project_id, title, description, is_completed, "
+    "due_date, priority, updated_at, created_at, completed_at"
+)
+
+# Deleted tasks stay behind for crud.purge
+OLDEST_CANDIDATE = text(
+    "SELECT min(completed_at) FROM tasks WHERE is_completed AND completed_at < :cutoff AND deleted_at IS NULL"
+)
+
+# Partitions are created by whichever worker gets there first
+PARTITION_LOCK = text("SELECT pg_advisory_xact_lock(hashtext('tasks_archive'))")
+
+# Lets the move past the task_counters() delete trigger, since projects and
+# categories keep counting archived tasks. log_change() also leaves the move
+# out of change_log, so sync clients don't hear it as a delete (see Alembic).
+ARCHIVING = text("SELECT set_config('app.archiving', 'on', true)")
+
+# Oldest first, skipping tasks someone is writing right now. Delete and insert
+# are one statement, so a task is never in both tables or in neither.
+MOVE_BATCH = text(f"""
+    WITH picked AS (
+        SELECT id FROM tasks
+        WHERE is_completed AND completed_at < :cutoff AND deleted_at IS NULL
+        ORDER BY completed_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ), moved AS (
+        DELETE FROM tasks t USING picked p WHERE t.id = p.id
+        RETURNING t.*
+    ), archived AS (
+        INSERT INTO tasks_archive ({ARCHIVE_COLUMNS})
+        SELECT {ARCHIVE_COLUMNS} FROM moved
+        RETURNING user_id
+    )
+    SELECT count(*) AS moved, array_agg(DISTINCT user_id) AS users FROM archived
+""")
+
+
+# Writes go to the hot table, so an archived task being updated or deleted is
+# moved back first. Quiet like the archive move (the task was counted all
+# along and sync clients never saw it leave); the flag is switched off again so
+# the write that follows is logged and counted as usual.
+RESTORE = text(f"""
+    WITH restored AS (
+        DELETE FROM tasks_archive WHERE user_id = :user_id AND id = ANY(:ids)
+        RETURNING {ARCHIVE_COLUMNS}
+    )
+    INSERT INTO tasks ({ARCHIVE_COLUMNS})
+    SELECT {ARCHIVE_COLUMNS} FROM restored
+    RETURNING id
+""")
+NOT_ARCHIVING = text("SELECT set_config('app.archiving', 'off', true)")
+
+
+async def restore_archived(db: AsyncSession, user_id: UUID, task_ids: Iterable[UUID]) -> set[UUID]:
+    """Move the user's archived tasks among `task_ids` back into tasks, in the
+    caller's transaction; returns the ids that were moved."""
+    await db.execute(ARCHIVING)
+    restored = set((await db.execute(RESTORE, {"user_id": user_id, "ids": list(task_ids)})).scalars().all())
+    await db.execute(NOT_ARCHIVING)
+    return restored
+
+
+def _month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def partition_ddl(month: datetime) -> str:
+    """CREATE statement for the tasks_archive partition holding `month` (UTC)."""
+    return (
+        f"CREATE TABLE IF NOT EXISTS tasks_archive_y{month.year:04d}m{month.month:02d} "
+        f"PARTITION OF tasks_archive FOR VALUES "
+        f"FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+    )
+
+
+async def ensure_partitions(db: AsyncSession, cutoff: datetime) -> int:
+    """Create the monthly partitions the next move needs; returns how many months are covered."""
+    oldest = (await db.execute(OLDEST_CANDIDATE, {"cutoff": cutoff})).scalar_one_or_none()
+    if oldest is None:
+        await db.rollback()
+        return 0
+    await db.execute(PARTITION_LOCK)
+    month, months = _month_start(oldest), 0
+    while month <= cutoff:
+        await db.execute(text(partition_ddl(month)))
+        month, months = _next_month(month), months + 1
+    await db.commit()
+    return months
+
+
+async def archive_completed_tasks(db: AsyncSession, older_than_days: int, batch_size: int = 1000) -> int:
+    """Move tasks completed more than `older_than_days` ago into tasks_archive.
+
+    One short transaction per batch, with archive_batch_pause_seconds between
+    batches, so the job never holds many row locks or saturates the disk.
+    Returns the number of tasks moved.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    if not await ensure_partitions(db, cutoff):
+        return 0
+    total = 0
+    while True:
+        await db.execute(ARCHIVING)
+        row = (await db.execute(MOVE_BATCH, {"cutoff": cutoff, "limit": batch_size})).one()
+        await db.commit()
+        for user_id in row.users or ():
+            await invalidate(user_id, "tasks", "stats")
+        total += row.moved
+        if row.moved < batch_size:
+            break
+        await asyncio.sleep(settings.archive_batch_pause_seconds)
+    if total:
+        logger.info("archived %d tasks completed before %s", total, cutoff.isoformat())
+    return total
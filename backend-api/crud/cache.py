@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+from uuid import UUID
+
+from pydantic import TypeAdapter
+
+from core.config import settings
+from core.metrics import COALESCED_READS
+
+logger = logging.getLogger(__name__)
+
+# Reads are cached under "<namespace>:<user_id>:<version>:<params>". Writes bump
+# the per-user namespace version instead of deleting keys, so every entry from
+# before the write becomes unreachable at once and simply ages out.
+
+_MISSING = object()
+
+
+class MemoryCache:
+    """In-process LRU with per-entry TTL. Invalidation is local to the worker."""
+
+    def __init__(self, max_entries: int, stats: dict):
+        self.max_entries = max_entries
+        self.stats = stats
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._versions: OrderedDict[str, int] = OrderedDict()
+
+    async def get(self, key: str, adapter: TypeAdapter) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.stats["expirations"] += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, adapter: TypeAdapter, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def version(self, key: str) -> int:
+        version = self._versions.get(key)
+        if version is None:
+            # Start from the clock, not 0: a namespace whose version was evicted
+            # must never reuse the numbers of entries that may still be cached.
+            version = self._versions[key] = time.time_ns()
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+        self._versions.move_to_end(key)
+        return version
+
+    async def bump(self, key: str) -> None:
+        self._versions[key] = max(self._versions.get(key, 0) + 1, time.time_ns())
+        self._versions.move_to_end(key)
+
+
+class RedisCache:
+    """Shared cache for multi-worker deployments; speaks the Redis protocol."""
+
+    def __init__(self, url: str, stats: dict):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the `redis` package") from exc
+        self._client = redis.from_url(url)
+        self.stats = stats
+
+    async def get(self, key: str, adapter: TypeAdapter) -> Any:
+        raw = await self._client.get(key)
+        return _MISSING if raw is None else adapter.validate_json(raw)
+
+    async def set(self, key: str, value: Any, adapter: TypeAdapter, ttl: float) -> None:
+        await self._client.set(key, adapter.dump_json(value), px=int(ttl * 1000))
+
+    async def version(self, key: str) -> int:
+        version = await self._client.get(key)
+        if version is None:
+            await self._client.set(key, time.time_ns(), nx=True)
+            version = await self._client.get(key)
+        return int(version)
+
+    async def bump(self, key: str) -> None:
+        if await self._client.incr(key) == 1:
+            await self._client.set(key, time.time_ns())
+
+
+class NullCache:
+    async def get(self, key: str, adapter: TypeAdapter) -> Any:
+        return _MISSING
+
+    async def set(self, key: str, value: Any, adapter: TypeAdapter, ttl: float) -> None:
+        pass
+
+    async def version(self, key: str) -> int:
+        return 0
+
+    async def bump(self, key: str) -> None:
+        pass
+
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "errors": 0, "loads": 0, "coalesced": 0}
+
+# Single flight: (namespace, user_id) -> key -> the load in progress. Misses
+# for a key already loading await that load instead of querying again.
+# invalidate() detaches a scope's flights, so a read that starts after a write
+# never joins a load that may predate it (the version in the key covers this
+# too, except with the "none" backend, whose version never changes).
+_inflight: dict[tuple[str, UUID], dict[str, asyncio.Future]] = {}
+
+
+def _build_backend():
+    if settings.cache_backend == "redis":
+        return RedisCache(settings.cache_redis_url, _stats)
+    if settings.cache_backend == "memory":
+        return MemoryCache(settings.cache_max_entries, _stats)
+    return NullCache()
+
+
+backend = _build_backend()
+
+
+# Set while a request reads through a replica (db.session.open_repository).
+# What a lagging replica returns is served but never stored: the key carries
+# the version after the latest write, so a stale row stored under it would be
+# served by every worker sharing the cache until the next write.
+_replica_reads: ContextVar[bool] = ContextVar("cache_replica_reads", default=False)
+
+
+@contextmanager
+def reading_replica():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _params_key(params: tuple) -> str:
+    return hashlib.blake2b(repr(params).encode(), digest_size=12).hexdigest()
+
+
+async def cached(
+    namespace: str,
+    user_id: UUID,
+    params: tuple,
+    loader: Callable[[], Awaitable[Any]],
+    adapter: TypeAdapter,
+    ttl: float | None = None,
+) -> Any:
+    """Return the cached value for (namespace, user_id, params) or load and store it.
+
+    Backend failures are counted and treated as a miss; the database stays the
+    source of truth.
+    """
+    try:
+        version = await backend.version(f"v:{namespace}:{user_id}")
+        key = f"{namespace}:{user_id}:{version}:{_params_key(params)}"
+        value = await backend.get(key, adapter)
+    except Exception:
+        logger.warning("cache read failed", exc_info=True)
+        _stats["errors"] += 1
+        return await loader()
+    if value is not _MISSING:
+        _stats["hits"] += 1
+        return value
+    _stats["misses"] += 1
+    value, loaded = await _load_once(namespace, user_id, key, loader)
+    if not loaded or _replica_reads.get():
+        return value
+    try:
+        await backend.set(key, value, adapter, settings.cache_ttl_seconds if ttl is None else ttl)
+    except Exception:
+        logger.warning("cache write failed", exc_info=True)
+        _stats["errors"] += 1
+    return value
+
+
+async def _load_once(namespace: str, user_id: UUID, key: str, loader: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+    """Run `loader`, or wait for an identical load in flight. Returns the value
+    and whether this call loaded it (and so should store it)."""
+    if not settings.cache_single_flight:
+        _stats["loads"] += 1
+        return await loader(), True
+    scope = (namespace, user_id)
+    flights = _inflight.setdefault(scope, {})
+    flight = flights.get(key)
+    if flight is not None:
+        _stats["coalesced"] += 1
+        COALESCED_READS.inc(namespace)
+        try:
+            # shield: a joiner going away must not cancel the shared load
+            return await asyncio.shield(flight), False
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise
+            # The leading request was cancelled mid-load; load for ourselves
+            _stats["loads"] += 1
+            return await loader(), True
+
+    _stats["loads"] += 1
+    flight = flights[key] = asyncio.get_running_loop().create_future()
+    try:
+        value = await loader()
+    except BaseException as exc:
+        if isinstance(exc, asyncio.CancelledError):
+            flight.cancel()
+        else:
+            flight.set_exception(exc)
+            flight.exception()  # retrieved here, so an unjoined failure isn't logged twice
+        raise
+    else:
+        flight.set_result(value)
+    finally:
+        # Only drop our own entry: invalidate() may have replaced the scope
+        if _inflight.get(scope, {}).get(key) is flight:
+            del _inflight[scope][key]
+            if not _inflight[scope]:
+                del _inflight[scope]
+    return value, True
+
+
+async def invalidate(user_id: UUID, *namespaces: str) -> None:
+    """Drop every cached read of `namespaces` for the user. Call after commit."""
+    for namespace in namespaces:
+        _inflight.pop((namespace, user_id), None)
+        try:
+            await backend.bump(f"v:{namespace}:{user_id}")
+            _stats["invalidations"] += 1
+        except Exception:
+            logger.warning("cache invalidation failed", exc_info=True)
+            _stats["errors"] += 1
+
+
+def cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    stats = {"backend": settings.cache_backend, **_stats}
+    stats["hit_ratio"] = round(_stats["hits"] / lookups, 4) if lookups else 0.0
+    # Share of misses answered by joining an identical in-flight load
+    stats["coalesce_ratio"] = round(_stats["coalesced"] / _stats["misses"], 4) if _stats["misses"] else 0.0
+    stats["inflight"] = sum(len(flights) for flights in _inflight.values())
+    if isinstance(backend, MemoryCache):
+        stats["entries"] = len(backend._entries)
+    return stats
@@ -0,0 +1,85 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+# Parents are locked before their tasks are counted: a writer whose trigger has
+# already adjusted a parent holds that row until commit, so the count (taken in
+# a later statement, hence a later snapshot) includes its tasks; a writer that
+# has not reached its trigger yet adds its delta on top of the fixed value.
+# Archived tasks (crud.archive) still count towards their parents; soft-deleted
+# ones (crud.purge) don't.
+RECONCILE = {
+    "projects": text("""
+        WITH locked AS (
+            SELECT id FROM projects WHERE id > :after ORDER BY id LIMIT :limit FOR UPDATE
+        ), actual AS (
+            SELECT l.id, count(t.project_id) AS total, count(t.project_id) FILTER (WHERE t.is_completed) AS done
+            FROM locked l LEFT JOIN (
+                SELECT project_id, is_completed FROM tasks WHERE deleted_at IS NULL
+                UNION ALL SELECT project_id, is_completed FROM tasks_archive
+            ) t ON t.project_id = l.id
+            GROUP BY l.id
+        ), fixed AS (
+            UPDATE projects p
+            SET task_count = a.total,
+                completed_count = a.done,
+                progress = CASE WHEN a.total > 0 THEN a.done * 100 / a.total ELSE 0 END
+            FROM actual a
+            WHERE p.id = a.id
+              AND (p.task_count, p.completed_count, p.progress)
+                  IS DISTINCT FROM (a.total, a.done, CASE WHEN a.total > 0 THEN a.done * 100 / a.total ELSE 0 END)
+            RETURNING p.user_id
+        )
+        SELECT (SELECT max(id::text) FROM locked) AS last_id, (SELECT array_agg(user_id) FROM fixed) AS users
+    """),
+    "categories": text("""
+        WITH locked AS (
+            SELECT id FROM categories WHERE id > :after ORDER BY id LIMIT :limit FOR UPDATE
+        ), actual AS (
+            SELECT l.id, count(t.category_id) AS total, count(t.category_id) FILTER (WHERE t.is_completed) AS done
+            FROM locked l LEFT JOIN (
+                SELECT category_id, is_completed FROM tasks WHERE deleted_at IS NULL
+                UNION ALL SELECT category_id, is_completed FROM tasks_archive
+            ) t ON t.category_id = l.id
+            GROUP BY l.id
+        ), fixed AS (
+            UPDATE categories c
+            SET task_count = a.total, completed_count = a.done
+            FROM actual a
+            WHERE c.id = a.id AND (c.task_count, c.completed_count) IS DISTINCT FROM (a.total, a.done)
+            RETURNING c.user_id
+        )
+        SELECT (SELECT max(id::text) FROM locked) AS last_id, (SELECT array_agg(user_id) FROM fixed) AS users
+    """),
+}
+FIRST_ID = "00000000-0000-0000-0000-000000000000"
+
+
+async def reconcile_counters(db: AsyncSession, batch_size: int = 1000) -> dict[str, int]:
+    """Recount tasks per project/category and fix drifted counters.
+
+    The task_counters() trigger keeps the counters exact; this only repairs rows
+    changed behind its back (manual SQL, trigger disabled during a restore).
+    Works through each table in id order, one short transaction per batch.
+    """
+    fixed = {}
+    for table, stmt in RECONCILE.items():
+        fixed[table] = 0
+        after = FIRST_ID
+        while True:
+            row = (await db.execute(stmt, {"after": after, "limit": batch_size})).one()
+            await db.commit()
+            for user_id in set(row.users or ()):
+                await invalidate(user_id, table)
+            fixed[table] += len(row.users or ())
+            if row.last_id is None:
+                break
+            after = row.last_id
+    if any(fixed.values()):
+        logger.warning("reconciled drifted task counters: %s", fixed)
+    return fixed
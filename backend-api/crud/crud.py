@@ -1,141 +1,683 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from models.models import User, Category, Task, Project
+from sqlalchemy import select, insert, update, values, column, cast, literal, any_, func, or_, type_coerce, union_all, Float
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from models.models import User, Category, Task, ArchivedTask, Project, SEARCH_CONFIG
 from schemas.schemas import UserCreate, UserUpdate, CategoryCreate, CategoryUpdate, TaskCreate, TaskUpdate, ProjectCreate, ProjectUpdate
+from schemas.schemas import TaskBatchUpdateItem, TaskBatchItemResult, TaskBatchResult
+from schemas.schemas import Task as TaskSchema, Category as CategorySchema, Project as ProjectSchema
+from pydantic import TypeAdapter
+from typing import Any
 from uuid import UUID
-from passlib.context import CryptContext
+from datetime import datetime
+from core.config import settings
+from core.security import hash_password
+from .pagination import DEFAULT_PAGE_SIZE, keyset_paginate, page_results
+from .archive import restore_archived
+from .cache import cached, invalidate
+from .purge import detach_all
+from .tokens import REVOKED_NOW
 
 
-# User CRUD
+# List reads have two paths: get_* returns schema objects built from ORM rows,
+# get_*_json selects the response-schema columns as Core rows and serializes
+# them straight to JSON bytes (no ORM hydration, no Pydantic validation).
+ROWS_JSON = TypeAdapter(list[dict[str, Any]])
+JSON_PAGE = TypeAdapter(tuple[bytes, str | None])
+
+
+def _schema_columns(model, schema) -> list:
+    # Same columns in the same order as the schema, so both paths emit identical
+    # JSON; labelled so computed attributes (column_property) keep their names
+    return [getattr(model, name).label(name) for name in schema.model_fields]
+
 
-# Password hashing context
-# use pbkdf2_sha256 to avoid bcrypt's 72-byte limit and external backends
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+def _rows_to_json(rows) -> bytes:
+    return ROWS_JSON.dump_json([row._asdict() for row in rows])
+
+
+# User CRUD
 async def get_user(db: AsyncSession, user_id: UUID) -> User | None:
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(select(User).where(User.id == user_id, User.deleted_at.is_(None)))
     return result.scalar_one_or_none()
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
-    result = await db.execute(select(User).where(User.email == email))
+    result = await db.execute(select(User).where(User.email == email, User.deleted_at.is_(None)))
     return result.scalar_one_or_none()
 
 
-async def create_user(db: AsyncSession, user: UserCreate) -> User:
-    hashed = pwd_context.hash(user.password)
-    db_user = User(email=user.email, password_hash=hashed)
-    db.add(db_user)
-    await db.commit()
-    await db.refresh(db_user)
+# Writes are a single INSERT/UPDATE ... RETURNING followed by the commit, so
+# callers get the stored row back without a refresh or re-SELECT round trip.
+# A duplicate email surfaces as IntegrityError from the unique constraint.
+async def create_user(db: AsyncSession, user: UserCreate, user_id: UUID | None = None) -> User:
+    hashed = await hash_password(user.password)
+    # Sharded storage picks the id first: it decides which database the user lives in
+    ids = {"id": user_id} if user_id is not None else {}
+    stmt = insert(User).values(**ids, email=user.email, password_hash=hashed).returning(User)
+    try:
+        db_user = (await db.execute(stmt)).scalar_one()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
     return db_user
 
 
 async def update_user(db: AsyncSession, user_id: UUID, user_update: UserUpdate) -> User | None:
     update_data = user_update.model_dump(exclude_unset=True)
     if "password" in update_data:
-        update_data["password_hash"] = pwd_context.hash(update_data.pop("password"))
-    await db.execute(update(User).where(User.id == user_id).values(**update_data))
+        update_data["password_hash"] = await hash_password(update_data.pop("password"))
+        # Refresh tokens issued under the old password stop working
+        update_data["tokens_revoked_at"] = REVOKED_NOW
+    if not update_data:
+        return await get_user(db, user_id)
+    stmt = update(User).where(User.id == user_id, User.deleted_at.is_(None)).values(**update_data).returning(User)
+    try:
+        db_user = (await db.execute(stmt)).scalar_one_or_none()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    return db_user
+
+
+async def set_password_hash(db: AsyncSession, user_id: UUID, password_hash: str) -> bool:
+    """Store a rehashed password (login upgrades hashes made with old settings).
+
+    False if the user is gone or deleted meanwhile; their row is left alone.
+    """
+    stmt = update(User).where(User.id == user_id, User.deleted_at.is_(None)).values(password_hash=password_hash)
+    result = await db.execute(stmt)
     await db.commit()
-    return await get_user(db, user_id)
+    return result.rowcount > 0
 
 
+# Deletes only set deleted_at, so they return at once however much hangs off
+# the row; reads skip deleted rows from then on, and crud.purge removes them
+# and their dependents in the background.
 async def delete_user(db: AsyncSession, user_id: UUID) -> bool:
-    result = await db.execute(delete(User).where(User.id == user_id))
+    result = await db.execute(update(User).where(User.id == user_id, User.deleted_at.is_(None)).values(deleted_at=func.now()))
     await db.commit()
+    await invalidate(user_id, "tasks", "categories", "projects", "stats")
     return result.rowcount > 0
 
 
-# Category CRUD
-async def get_categories(db: AsyncSession, user_id: UUID) -> list[Category]:
-    result = await db.execute(select(Category).where(Category.user_id == user_id))
-    return result.scalars().all()
+def _with_overdue_count(row):
+    # (entity, overdue_count) from UPDATE ... RETURNING, which carries the
+    # count's subquery next to the columns instead of a refresh afterwards
+    if row is None:
+        return None
+    entity, overdue_count = row
+    set_committed_value(entity, "overdue_count", overdue_count)
+    return entity
 
 
-async def get_category(db: AsyncSession, category_id: UUID, user_id: UUID) -> Category | None:
-    result = await db.execute(select(Category).where(Category.id == category_id, Category.user_id == user_id))
-    return result.scalar_one_or_none()
+# Category CRUD
+CATEGORY_SORTS = {"name": Category.name}
+CATEGORY_PAGE = TypeAdapter(tuple[list[CategorySchema], str | None])
+CATEGORY_ITEM = TypeAdapter(CategorySchema | None)
+CATEGORY_COLUMNS = _schema_columns(Category, CategorySchema)
+
+
+async def get_categories(
+    db: AsyncSession,
+    user_id: UUID,
+    *,
+    sort: str = "name",
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[list[CategorySchema], str | None]:
+    async def load():
+        stmt = select(Category).where(Category.user_id == user_id, Category.deleted_at.is_(None))
+        stmt = keyset_paginate(stmt, Category.id, CATEGORY_SORTS, sort, cursor, limit)
+        result = await db.execute(stmt)
+        rows, next_cursor = page_results(result.scalars().all(), sort, limit)
+        return [CategorySchema.model_validate(row) for row in rows], next_cursor
+
+    return await cached("categories", user_id, ("list", sort, cursor, limit), load, CATEGORY_PAGE)
+
+
+async def get_categories_json(
+    db: AsyncSession,
+    user_id: UUID,
+    *,
+    sort: str = "name",
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[bytes, str | None]:
+    async def load():
+        stmt = select(*CATEGORY_COLUMNS).where(Category.user_id == user_id, Category.deleted_at.is_(None))
+        stmt = keyset_paginate(stmt, Category.id, CATEGORY_SORTS, sort, cursor, limit)
+        rows, next_cursor = page_results((await db.execute(stmt)).all(), sort, limit)
+        return _rows_to_json(rows), next_cursor
+
+    return await cached("categories", user_id, ("json", sort, cursor, limit), load, JSON_PAGE)
+
+
+async def get_category(db: AsyncSession, category_id: UUID, user_id: UUID) -> CategorySchema | None:
+    async def load():
+        result = await db.execute(
+            select(Category).where(Category.id == category_id, Category.user_id == user_id, Category.deleted_at.is_(None))
+        )
+        row = result.scalar_one_or_none()
+        return CategorySchema.model_validate(row) if row else None
+
+    return await cached("categories", user_id, ("item", category_id), load, CATEGORY_ITEM)
 
 
 async def create_category(db: AsyncSession, category: CategoryCreate, user_id: UUID) -> Category:
-    db_category = Category(name=category.name, user_id=user_id)
-    db.add(db_category)
+    stmt = insert(Category).values(name=category.name, user_id=user_id).returning(Category)
+    db_category = (await db.execute(stmt)).scalar_one()
+    # RETURNING can't carry the computed count; a new category has no tasks
+    set_committed_value(db_category, "overdue_count", 0)
     await db.commit()
-    await db.refresh(db_category)
+    await invalidate(user_id, "categories")
     return db_category
 
 
 async def update_category(db: AsyncSession, category_id: UUID, category_update: CategoryUpdate, user_id: UUID) -> Category | None:
     update_data = category_update.model_dump(exclude_unset=True)
-    await db.execute(update(Category).where(Category.id == category_id, Category.user_id == user_id).values(**update_data))
+    if not update_data:
+        return await get_category(db, category_id, user_id)
+    stmt = (
+        update(Category)
+        .where(Category.id == category_id, Category.user_id == user_id, Category.deleted_at.is_(None))
+        .values(**update_data)
+        .returning(Category, Category.overdue_count)
+    )
+    db_category = _with_overdue_count((await db.execute(stmt)).one_or_none())
     await db.commit()
-    return await get_category(db, category_id, user_id)
+    # Category names appear in the stats breakdown
+    await invalidate(user_id, "categories", "stats")
+    return db_category
 
 
 async def delete_category(db: AsyncSession, category_id: UUID, user_id: UUID) -> bool:
-    result = await db.execute(delete(Category).where(Category.id == category_id, Category.user_id == user_id))
+    stmt = (
+        update(Category)
+        .where(Category.id == category_id, Category.user_id == user_id, Category.deleted_at.is_(None))
+        .values(deleted_at=func.now())
+        .returning(Category.task_count)
+    )
+    task_count = (await db.execute(stmt)).scalar_one_or_none()
+    # Up to a purge batch of tasks are detached right away; the purge clears
+    # the category_id of larger categories later, in batches
+    if task_count is not None and task_count <= settings.purge_batch_size:
+        await detach_all(db, "categories", category_id, user_id)
     await db.commit()
-    return result.rowcount > 0
+    # Task listings filtered by the category change too
+    await invalidate(user_id, "categories", "stats", "tasks")
+    return task_count is not None
 
 
 # Task CRUD
-async def get_tasks(db: AsyncSession, user_id: UUID) -> list[Task]:
-    result = await db.execute(select(Task).where(Task.user_id == user_id))
-    return result.scalars().all()
-
-
-async def get_task(db: AsyncSession, task_id: UUID, user_id: UUID) -> Task | None:
-    result = await db.execute(select(Task).where(Task.id == task_id, Task.user_id == user_id))
-    return result.scalar_one_or_none()
+# Task writes also move the counters shown on projects and categories, and the stats
+TASK_WRITE_NAMESPACES = ("tasks", "projects", "categories", "stats")
+TASK_SORTS = {
+    "due_date": Task.due_date,
+    "priority": Task.priority,
+    "created_at": Task.created_at,
+    "updated_at": Task.updated_at,
+}
+TASK_PAGE = TypeAdapter(tuple[list[TaskSchema], str | None])
+TASK_ITEM = TypeAdapter(TaskSchema | None)
+TASK_COLUMNS = _schema_columns(Task, TaskSchema)
+
+
+ARCHIVED_TASK_COLUMNS = _schema_columns(ArchivedTask, TaskSchema)
+
+
+def _with_archive(user_id: UUID):
+    # The user's hot and archived tasks as one relation. Filters and the keyset
+    # predicate on the outer query are pushed into both branches, and each
+    # branch reads its own (user_id, sort_key, id) index in order.
+    return union_all(
+        select(*TASK_COLUMNS).where(Task.user_id == user_id, Task.deleted_at.is_(None)),
+        select(*ARCHIVED_TASK_COLUMNS).where(ArchivedTask.user_id == user_id),
+    ).subquery("tasks")
+
+
+def _task_sorts(tasks) -> dict:
+    return {name: tasks.c[name] for name in TASK_SORTS}
+
+
+def _is_live(model, parent_id: UUID):
+    # Uncorrelated, so Postgres checks it once per query
+    return select(model.id).where(model.id == parent_id, model.deleted_at.is_(None)).exists()
+
+
+def _filter_tasks(stmt, t, is_completed, category_id, project_id, due_after, due_before, priority):
+    # `t` is the Task model or the columns of _with_archive()
+    if is_completed is not None:
+        stmt = stmt.where(t.is_completed == is_completed)
+    # A deleted parent matches nothing, even before the purge detaches its tasks
+    if category_id is not None:
+        stmt = stmt.where(t.category_id == category_id, _is_live(Category, category_id))
+    if project_id is not None:
+        stmt = stmt.where(t.project_id == project_id, _is_live(Project, project_id))
+    if due_after is not None:
+        stmt = stmt.where(t.due_date >= due_after)
+    if due_before is not None:
+        stmt = stmt.where(t.due_date < due_before)
+    if priority is not None:
+        stmt = stmt.where(t.priority == priority)
+    return stmt
+
+
+async def get_tasks(
+    db: AsyncSession,
+    user_id: UUID,
+    *,
+    is_completed: bool | None = None,
+    category_id: UUID | None = None,
+    project_id: UUID | None = None,
+    due_after: datetime | None = None,
+    due_before: datetime | None = None,
+    priority: int | None = None,
+    sort: str = "created_at",
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    include_archived: bool = False,
+) -> tuple[list[TaskSchema], str | None]:
+    async def load():
+        if include_archived:
+            tasks = _with_archive(user_id)
+            stmt = _filter_tasks(select(tasks), tasks.c, is_completed, category_id, project_id, due_after, due_before, priority)
+            stmt = keyset_paginate(stmt, tasks.c.id, _task_sorts(tasks), sort, cursor, limit)
+            rows = (await db.execute(stmt)).all()
+        else:
+            stmt = select(Task).where(Task.user_id == user_id, Task.deleted_at.is_(None))
+            stmt = _filter_tasks(stmt, Task, is_completed, category_id, project_id, due_after, due_before, priority)
+            stmt = keyset_paginate(stmt, Task.id, TASK_SORTS, sort, cursor, limit)
+            rows = (await db.execute(stmt)).scalars().all()
+        rows, next_cursor = page_results(rows, sort, limit)
+        return [TaskSchema.model_validate(row) for row in rows], next_cursor
+
+    params = ("list", is_completed, category_id, project_id, due_after, due_before, priority, sort, cursor, limit, include_archived)
+    return await cached("tasks", user_id, params, load, TASK_PAGE)
+
+
+async def get_tasks_json(
+    db: AsyncSession,
+    user_id: UUID,
+    *,
+    is_completed: bool | None = None,
+    category_id: UUID | None = None,
+    project_id: UUID | None = None,
+    due_after: datetime | None = None,
+    due_before: datetime | None = None,
+    priority: int | None = None,
+    sort: str = "created_at",
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    include_archived: bool = False,
+) -> tuple[bytes, str | None]:
+    async def load():
+        if include_archived:
+            tasks = _with_archive(user_id)
+            stmt = _filter_tasks(select(tasks), tasks.c, is_completed, category_id, project_id, due_after, due_before, priority)
+            stmt = keyset_paginate(stmt, tasks.c.id, _task_sorts(tasks), sort, cursor, limit)
+        else:
+            stmt = select(*TASK_COLUMNS).where(Task.user_id == user_id, Task.deleted_at.is_(None))
+            stmt = _filter_tasks(stmt, Task, is_completed, category_id, project_id, due_after, due_before, priority)
+            stmt = keyset_paginate(stmt, Task.id, TASK_SORTS, sort, cursor, limit)
+        rows, next_cursor = page_results((await db.execute(stmt)).all(), sort, limit)
+        return _rows_to_json(rows), next_cursor
+
+    params = ("json", is_completed, category_id, project_id, due_after, due_before, priority, sort, cursor, limit, include_archived)
+    return await cached("tasks", user_id, params, load, JSON_PAGE)
+
+
+async def search_tasks_json(
+    db: AsyncSession,
+    user_id: UUID,
+    q: str,
+    *,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[bytes, str | None]:
+    """Full-text matches on title/description, plus typo-tolerant word matches
+    on the title (pg_trgm), best first.
+
+    Both predicates are served by GIN indexes that lead with user_id.
+    """
+    query = func.websearch_to_tsquery(literal(SEARCH_CONFIG).cast(REGCONFIG), q)
+    rank = type_coerce(func.ts_rank_cd(Task.search_vector, query) + func.word_similarity(q, Task.title), Float).label("rank")
+
+    async def load():
+        stmt = select(*TASK_COLUMNS, rank).where(
+            Task.user_id == user_id,
+            Task.deleted_at.is_(None),
+            or_(Task.search_vector.bool_op("@@")(query), literal(q).bool_op("<%")(Task.title)),
+        )
+        stmt = keyset_paginate(stmt, Task.id, {"rank": rank}, "-rank", cursor, limit)
+        rows, next_cursor = page_results((await db.execute(stmt)).all(), "-rank", limit)
+        return _rows_to_json(rows), next_cursor
+
+    return await cached("tasks", user_id, ("search", q, cursor, limit), load, JSON_PAGE)
+
+
+async def get_task(db: AsyncSession, task_id: UUID, user_id: UUID, include_archived: bool = False) -> TaskSchema | None:
+    async def load():
+        result = await db.execute(select(Task).where(Task.id == task_id, Task.user_id == user_id, Task.deleted_at.is_(None)))
+        row = result.scalar_one_or_none()
+        if row is None and include_archived:
+            result = await db.execute(
+                select(*ARCHIVED_TASK_COLUMNS).where(ArchivedTask.id == task_id, ArchivedTask.user_id == user_id)
+            )
+            row = result.one_or_none()
+        return TaskSchema.model_validate(row) if row else None
+
+    return await cached("tasks", user_id, ("item", task_id, include_archived), load, TASK_ITEM)
 
 
 async def create_task(db: AsyncSession, task: TaskCreate, user_id: UUID) -> Task:
-    db_task = Task(**task.model_dump(), user_id=user_id)
-    db.add(db_task)
+    stmt = insert(Task).values(**task.model_dump(), user_id=user_id).returning(Task)
+    db_task = (await db.execute(stmt)).scalar_one()
     await db.commit()
-    await db.refresh(db_task)
+    await invalidate(user_id, *TASK_WRITE_NAMESPACES)
     return db_task
 
 
 async def update_task(db: AsyncSession, task_id: UUID, task_update: TaskUpdate, user_id: UUID) -> Task | None:
     update_data = task_update.model_dump(exclude_unset=True)
-    await db.execute(update(Task).where(Task.id == task_id, Task.user_id == user_id).values(**update_data))
+    if not update_data:
+        return await get_task(db, task_id, user_id, include_archived=True)
+    stmt = (
+        update(Task)
+        .where(Task.id == task_id, Task.user_id == user_id, Task.deleted_at.is_(None))
+        .values(**update_data)
+        .returning(Task)
+    )
+    db_task = (await db.execute(stmt)).scalar_one_or_none()
+    if db_task is None and await restore_archived(db, user_id, [task_id]):
+        db_task = (await db.execute(stmt)).scalar_one_or_none()
     await db.commit()
-    return await get_task(db, task_id, user_id)
+    await invalidate(user_id, *TASK_WRITE_NAMESPACES)
+    return db_task
 
 
 async def delete_task(db: AsyncSession, task_id: UUID, user_id: UUID) -> bool:
-    result = await db.execute(delete(Task).where(Task.id == task_id, Task.user_id == user_id))
+    stmt = (
+        update(Task)
+        .where(Task.id == task_id, Task.user_id == user_id, Task.deleted_at.is_(None))
+        .values(deleted_at=func.now())
+    )
+    result = await db.execute(stmt)
+    if not result.rowcount and await restore_archived(db, user_id, [task_id]):
+        result = await db.execute(stmt)
     await db.commit()
+    await invalidate(user_id, *TASK_WRITE_NAMESPACES)
     return result.rowcount > 0
 
 
-# Project CRUD
-async def get_projects(db: AsyncSession, user_id: UUID) -> list[Project]:
-    result = await db.execute(select(Project).where(Project.user_id == user_id))
+# Task batch operations
+# Every batch runs in one transaction. With atomic=True a single failing item
+# rolls the whole batch back; otherwise the items that succeeded are committed.
+# When the one-statement path hits a bad reference, the items are replayed one
+# by one under savepoints, so the result names the items that failed; an
+# atomic batch then rolls the replay back and reports the others as rolled_back.
+# Archived tasks are moved back into tasks before they are written, as with
+# single-task writes.
+BATCH_INTEGRITY_ERROR = "Referenced category or project does not exist"
+
+
+def _rolled_back(results: list[TaskBatchItemResult]) -> TaskBatchResult:
+    for item in results:
+        if item.status == "ok":
+            item.status, item.task = "rolled_back", None
+    return TaskBatchResult(committed=False, results=results)
+
+
+async def create_tasks(db: AsyncSession, tasks: list[TaskCreate], user_id: UUID, atomic: bool = True) -> TaskBatchResult:
+    rows = [{**task.model_dump(), "user_id": user_id} for task in tasks]
+    try:
+        # One multi-row INSERT ... VALUES (...), (...) RETURNING
+        result = await db.execute(insert(Task).returning(Task, sort_by_parameter_order=True), rows)
+        created = result.scalars().all()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        batch = await _create_tasks_one_by_one(db, rows)
+        if atomic:
+            await db.rollback()
+            return _rolled_back(batch.results)
+        await db.commit()
+        await invalidate(user_id, *TASK_WRITE_NAMESPACES)
+        return batch
+    await invalidate(user_id, *TASK_WRITE_NAMESPACES)
+    return TaskBatchResult(
+        committed=True,
+        results=[TaskBatchItemResult(index=i, id=task.id, status="ok", task=task) for i, task in enumerate(created)],
+    )
+
+
+async def _create_tasks_one_by_one(db: AsyncSession, rows: list[dict]) -> TaskBatchResult:
+    results = []
+    for index, row in enumerate(rows):
+        try:
+            async with db.begin_nested():
+                task = (await db.execute(insert(Task).values(**row).returning(Task))).scalar_one()
+            results.append(TaskBatchItemResult(index=index, id=task.id, status="ok", task=task))
+        except IntegrityError:
+            results.append(TaskBatchItemResult(index=index, status="error", error=BATCH_INTEGRITY_ERROR))
+    return TaskBatchResult(committed=True, results=results)
+
+
+async def _update_task_group(db: AsyncSession, user_id: UUID, fields: tuple[str, ...], group: list[tuple]) -> list[Task]:
+    tasks = await _update_hot_task_group(db, user_id, fields, group)
+    missing = {task_id for _, task_id, _ in group} - {task.id for task in tasks}
+    if missing:
+        restored = await restore_archived(db, user_id, missing)
+        if restored:
+            tasks += await _update_hot_task_group(db, user_id, fields, [entry for entry in group if entry[1] in restored])
+    return tasks
+
+
+async def _update_hot_task_group(db: AsyncSession, user_id: UUID, fields: tuple[str, ...], group: list[tuple]) -> list[Task]:
+    ids = [task_id for _, task_id, _ in group]
+    if not fields:
+        result = await db.execute(select(Task).where(Task.user_id == user_id, Task.id.in_(ids), Task.deleted_at.is_(None)))
+        return result.scalars().all()
+    columns = Task.__table__.c
+    rows = values(
+        column("id", columns.id.type),
+        *[column(name, columns[name].type) for name in fields],
+        name="batch",
+    ).data([(task_id, *[data[name] for name in fields]) for _, task_id, data in group])
+    stmt = (
+        update(Task)
+        .where(Task.id == rows.c.id, Task.user_id == user_id, Task.deleted_at.is_(None))
+        # cast: a VALUES column holding only NULLs would otherwise be typed as text
+        .values({name: cast(rows.c[name], columns[name].type) for name in fields})
+        .returning(Task)
+    )
+    result = await db.execute(stmt, execution_options={"synchronize_session": False})
     return result.scalars().all()
 
 
-async def get_project(db: AsyncSession, project_id: UUID, user_id: UUID) -> Project | None:
-    result = await db.execute(select(Project).where(Project.id == project_id, Project.user_id == user_id))
-    return result.scalar_one_or_none()
+async def update_tasks(db: AsyncSession, items: list[TaskBatchUpdateItem], user_id: UUID, atomic: bool = True) -> TaskBatchResult:
+    # Items setting the same fields share one UPDATE ... FROM (VALUES ...) RETURNING
+    groups: dict[tuple[str, ...], list[tuple]] = {}
+    for index, item in enumerate(items):
+        data = item.model_dump(exclude_unset=True, exclude={"id"})
+        groups.setdefault(tuple(sorted(data)), []).append((index, item.id, data))
+
+    updated: dict[UUID, Task] = {}
+    try:
+        for fields, group in groups.items():
+            for task in await _update_task_group(db, user_id, fields, group):
+                updated[task.id] = task
+    except IntegrityError:
+        await db.rollback()
+        batch = await _update_tasks_one_by_one(db, groups, user_id, len(items))
+        if atomic:
+            await db.rollback()
+            return _rolled_back(batch.results)
+        await db.commit()
+        await invalidate(user_id, *TASK_WRITE_NAMESPACES)
+        return batch
+
+    results = [
+        TaskBatchItemResult(index=i, id=item.id, status="ok", task=updated[item.id])
+        if item.id in updated
+        else TaskBatchItemResult(index=i, id=item.id, status="not_found")
+        for i, item in enumerate(items)
+    ]
+    if atomic and len(updated) < len(items):
+        await db.rollback()
+        return _rolled_back(results)
+    await db.commit()
+    await invalidate(user_id, *TASK_WRITE_NAMESPACES)
+    return TaskBatchResult(committed=True, results=results)
+
+
+async def _update_tasks_one_by_one(db: AsyncSession, groups: dict, user_id: UUID, count: int) -> TaskBatchResult:
+    results: list[TaskBatchItemResult | None] = [None] * count
+    for fields, group in groups.items():
+        for index, task_id, data in group:
+            try:
+                async with db.begin_nested():
+                    tasks = await _update_task_group(db, user_id, fields, [(index, task_id, data)])
+                if tasks:
+                    results[index] = TaskBatchItemResult(index=index, id=task_id, status="ok", task=tasks[0])
+                else:
+                    results[index] = TaskBatchItemResult(index=index, id=task_id, status="not_found")
+            except IntegrityError:
+                results[index] = TaskBatchItemResult(index=index, id=task_id, status="error", error=BATCH_INTEGRITY_ERROR)
+    return TaskBatchResult(committed=True, results=results)
+
+
+async def _soft_delete_tasks(db: AsyncSession, user_id: UUID, task_ids) -> set[UUID]:
+    stmt = (
+        update(Task)
+        .where(
+            Task.user_id == user_id,
+            Task.id == any_(literal(list(task_ids), ARRAY(Task.__table__.c.id.type))),
+            Task.deleted_at.is_(None),
+        )
+        .values(deleted_at=func.now())
+        .returning(Task.id)
+    )
+    result = await db.execute(stmt, execution_options={"synchronize_session": False})
+    return set(result.scalars().all())
+
+
+async def delete_tasks(db: AsyncSession, task_ids: list[UUID], user_id: UUID, atomic: bool = True) -> TaskBatchResult:
+    deleted = await _soft_delete_tasks(db, user_id, task_ids)
+    missing = set(task_ids) - deleted
+    if missing:
+        restored = await restore_archived(db, user_id, missing)
+        if restored:
+            deleted |= await _soft_delete_tasks(db, user_id, restored)
+    results = [
+        TaskBatchItemResult(index=i, id=task_id, status="ok" if task_id in deleted else "not_found")
+        for i, task_id in enumerate(task_ids)
+    ]
+    if atomic and len(deleted) < len(task_ids):
+        await db.rollback()
+        return _rolled_back(results)
+    await db.commit()
+    await invalidate(user_id, *TASK_WRITE_NAMESPACES)
+    return TaskBatchResult(committed=True, results=results)
+
+
+# Project CRUD
+PROJECT_SORTS = {
+    "create_day": Project.create_day,
+    "due_date": Project.due_date,
+    "name": Project.name,
+}
+PROJECT_PAGE = TypeAdapter(tuple[list[ProjectSchema], str | None])
+PROJECT_ITEM = TypeAdapter(ProjectSchema | None)
+PROJECT_COLUMNS = _schema_columns(Project, ProjectSchema)
+
+
+async def get_projects(
+    db: AsyncSession,
+    user_id: UUID,
+    *,
+    sort: str = "create_day",
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[list[ProjectSchema], str | None]:
+    async def load():
+        stmt = select(Project).where(Project.user_id == user_id, Project.deleted_at.is_(None))
+        stmt = keyset_paginate(stmt, Project.id, PROJECT_SORTS, sort, cursor, limit)
+        result = await db.execute(stmt)
+        rows, next_cursor = page_results(result.scalars().all(), sort, limit)
+        return [ProjectSchema.model_validate(row) for row in rows], next_cursor
+
+    return await cached("projects", user_id, ("list", sort, cursor, limit), load, PROJECT_PAGE)
+
+
+async def get_projects_json(
+    db: AsyncSession,
+    user_id: UUID,
+    *,
+    sort: str = "create_day",
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[bytes, str | None]:
+    async def load():
+        stmt = select(*PROJECT_COLUMNS).where(Project.user_id == user_id, Project.deleted_at.is_(None))
+        stmt = keyset_paginate(stmt, Project.id, PROJECT_SORTS, sort, cursor, limit)
+        rows, next_cursor = page_results((await db.execute(stmt)).all(), sort, limit)
+        return _rows_to_json(rows), next_cursor
+
+    return await cached("projects", user_id, ("json", sort, cursor, limit), load, JSON_PAGE)
+
+
+async def get_project(db: AsyncSession, project_id: UUID, user_id: UUID) -> ProjectSchema | None:
+    async def load():
+        result = await db.execute(
+            select(Project).where(Project.id == project_id, Project.user_id == user_id, Project.deleted_at.is_(None))
+        )
+        row = result.scalar_one_or_none()
+        return ProjectSchema.model_validate(row) if row else None
+
+    return await cached("projects", user_id, ("item", project_id), load, PROJECT_ITEM)
 
 
 async def create_project(db: AsyncSession, project: ProjectCreate, user_id: UUID) -> Project:
-    db_project = Project(**project.model_dump(), user_id=user_id)
-    db.add(db_project)
+    stmt = insert(Project).values(**project.model_dump(), user_id=user_id).returning(Project)
+    db_project = (await db.execute(stmt)).scalar_one()
+    # RETURNING can't carry the computed count; a new project has no tasks
+    set_committed_value(db_project, "overdue_count", 0)
     await db.commit()
-    await db.refresh(db_project)
+    await invalidate(user_id, "projects")
     return db_project
 
 
 async def update_project(db: AsyncSession, project_id: UUID, project_update: ProjectUpdate, user_id: UUID) -> Project | None:
     update_data = project_update.model_dump(exclude_unset=True)
-    await db.execute(update(Project).where(Project.id == project_id, Project.user_id == user_id).values(**update_data))
+    if not update_data:
+        return await get_project(db, project_id, user_id)
+    stmt = (
+        update(Project)
+        .where(Project.id == project_id, Project.user_id == user_id, Project.deleted_at.is_(None))
+        .values(**update_data)
+        .returning(Project, Project.overdue_count)
+    )
+    db_project = _with_overdue_count((await db.execute(stmt)).one_or_none())
     await db.commit()
-    return await get_project(db, project_id, user_id)
+    await invalidate(user_id, "projects")
+    return db_project
 
 
 async def delete_project(db: AsyncSession, project_id: UUID, user_id: UUID) -> bool:
-    result = await db.execute(delete(Project).where(Project.id == project_id, Project.user_id == user_id))
+    stmt = (
+        update(Project)
+        .where(Project.id == project_id, Project.user_id == user_id, Project.deleted_at.is_(None))
+        .values(deleted_at=func.now())
+        .returning(Project.task_count)
+    )
+    task_count = (await db.execute(stmt)).scalar_one_or_none()
+    # As for categories
+    if task_count is not None and task_count <= settings.purge_batch_size:
+        await detach_all(db, "projects", project_id, user_id)
     await db.commit()
-    return result.rowcount > 0
\ No newline at end of file
+    await invalidate(user_id, "projects", "tasks")
+    return task_count is not None
\ No newline at end of file
@@ -0,0 +1,46 @@
+from datetime import timedelta
+from uuid import UUID
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import UserEmail
+
+# Email directory for sharded storage, on the first shard (models.UserEmail).
+# Claims and releases commit on their own: the directory is usually another
+# database than the user's rows, so there is no transaction to share.
+
+# A younger claim may belong to a signup still inserting its user row, so it
+# is never taken over even if its user can't be found
+CLAIM_GRACE = timedelta(minutes=1)
+
+
+async def get_email_owner(db: AsyncSession, email: str) -> UUID | None:
+    result = await db.execute(select(UserEmail.user_id).where(UserEmail.email == email))
+    return result.scalar_one_or_none()
+
+
+async def claim_email(db: AsyncSession, email: str, user_id: UUID, replacing: UUID | None = None) -> bool:
+    """Reserve `email` for `user_id`; False if another user holds it.
+
+    With `replacing`, take the email over from that owner, whom the caller
+    found gone (a deleted user whose release failed, or a signup that never
+    finished). The WHERE makes that safe against a concurrent claim.
+    """
+    if replacing is None:
+        stmt = insert(UserEmail).values(email=email, user_id=user_id).on_conflict_do_nothing()
+    else:
+        stmt = (
+            update(UserEmail)
+            .where(UserEmail.email == email, UserEmail.user_id == replacing, UserEmail.claimed_at < func.now() - CLAIM_GRACE)
+            .values(user_id=user_id, claimed_at=func.now())
+        )
+    claimed = (await db.execute(stmt.returning(UserEmail.user_id))).scalar_one_or_none() is not None
+    await db.commit()
+    return claimed
+
+
+async def release_email(db: AsyncSession, email: str, user_id: UUID) -> None:
+    await db.execute(delete(UserEmail).where(UserEmail.email == email, UserEmail.user_id == user_id))
+    await db.commit()
@@ -0,0 +1,255 @@
+import csv
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable
+from uuid import UUID
+
+import asyncpg
+from pydantic import ValidationError
+from sqlalchemy import select, insert, or_, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models.models import Category, Project
+from schemas.schemas import TaskImportRow, ImportReport, ImportRowError
+from .cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# Column order of the COPY records
+IMPORT_COLUMNS = [
+    "id", "user_id", "category_id", "project_id", "title", "description",
+    "is_completed", "due_date", "priority", "updated_at", "created_at", "completed_at",
+]
+STAGING_TABLE = "task_import_staging"
+# Dropped at commit, so every batch gets a fresh table on whatever connection
+# it runs; this also works behind a transaction-mode pooler
+CREATE_STAGING = text(f"CREATE TEMP TABLE {STAGING_TABLE} (LIKE tasks INCLUDING DEFAULTS) ON COMMIT DROP")
+MERGE_STAGING = text(
+    f"INSERT INTO tasks ({', '.join(IMPORT_COLUMNS)}) "
+    f"SELECT {', '.join(IMPORT_COLUMNS)} FROM {STAGING_TABLE} "
+    "ON CONFLICT (id, user_id) DO NOTHING"
+)
+
+# A parsed input record, or the reason it could not be parsed
+Record = tuple[int, dict[str, Any] | str]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            decoded = line.decode("utf-8", errors="replace").rstrip("\r")
+            if first:
+                decoded, first = decoded.lstrip("\ufeff"), False
+            yield decoded
+    if pending:
+        yield pending.decode("utf-8", errors="replace").rstrip("\r").lstrip("\ufeff" if first else "")
+
+
+async def read_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError as exc:
+            yield line_no, f"invalid JSON: {exc}"
+            continue
+        yield line_no, value if isinstance(value, dict) else "expected a JSON object"
+
+
+async def read_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """CSV with a header row. Empty cells are treated as missing."""
+    header = None
+    record, start, line_no = "", 0, 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not record:
+            start = line_no
+        record = f"{record}\n{line}" if record else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            continue
+        fields = next(csv.reader([record]), [])
+        record = ""
+        if not any(fields):
+            continue
+        if header is None:
+            header = [name.strip() for name in fields]
+        elif len(fields) != len(header):
+            yield start, f"expected {len(header)} fields, got {len(fields)}"
+        else:
+            yield start, {name: value for name, value in zip(header, fields) if value != ""}
+    if record:
+        yield start, "unterminated quoted field"
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+def _fail(report: ImportReport, line: int, error: str) -> None:
+    report.rows_failed += 1
+    if len(report.errors) < settings.import_max_errors:
+        report.errors.append(ImportRowError(line=line, error=error))
+    else:
+        report.errors_truncated = True
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in exc.errors())
+
+
+async def _resolve(db: AsyncSession, model, user_id: UUID, names: set[str], ids: set[UUID]) -> tuple[dict[str, UUID], set[UUID]]:
+    """One lookup for the batch's categories/projects; unknown names are created."""
+    if not names and not ids:
+        return {}, set()
+    result = await db.execute(
+        select(model.id, model.name).where(
+            model.user_id == user_id, model.deleted_at.is_(None), or_(model.name.in_(names), model.id.in_(ids))
+        )
+    )
+    by_name, known_ids = {}, set()
+    for row in result.all():
+        by_name.setdefault(row.name, row.id)
+        known_ids.add(row.id)
+    missing = sorted(names - by_name.keys())
+    if missing:
+        result = await db.execute(
+            insert(model).values([{"user_id": user_id, "name": name} for name in missing]).returning(model.id, model.name)
+        )
+        for row in result.all():
+            by_name[row.name] = row.id
+            known_ids.add(row.id)
+    return by_name, known_ids
+
+
+async def _load(db: AsyncSession, records: list[tuple]) -> int:
+    """COPY the batch into a staging table and merge it into tasks; returns rows inserted."""
+    conn = await db.connection()
+    if conn.dialect.driver != "asyncpg":
+        raise RuntimeError("bulk import requires the asyncpg driver")
+    raw = await conn.get_raw_connection()
+    await db.execute(CREATE_STAGING)
+    await raw.driver_connection.copy_records_to_table(STAGING_TABLE, records=records, columns=IMPORT_COLUMNS)
+    result = await db.execute(MERGE_STAGING)
+    return result.rowcount
+
+
+async def _import_batch(db: AsyncSession, user_id: UUID, batch: list[Record], report: ImportReport) -> None:
+    rows = []
+    for line, record in batch:
+        report.rows_read += 1
+        if isinstance(record, str):
+            _fail(report, line, record)
+            continue
+        try:
+            rows.append((line, TaskImportRow.model_validate(record)))
+        except ValidationError as exc:
+            _fail(report, line, _describe(exc))
+    if not rows:
+        return
+
+    pending = [line for line, _ in rows]
+    try:
+        categories, category_ids = await _resolve(
+            db, Category, user_id,
+            {row.category for _, row in rows if row.category and not row.category_id},
+            {row.category_id for _, row in rows if row.category_id},
+        )
+        projects, project_ids = await _resolve(
+            db, Project, user_id,
+            {row.project for _, row in rows if row.project and not row.project_id},
+            {row.project_id for _, row in rows if row.project_id},
+        )
+        now = datetime.now(timezone.utc)
+        records, lines = [], []
+        for line, row in rows:
+            if row.category_id and row.category_id not in category_ids:
+                _fail(report, line, f"unknown category_id {row.category_id}")
+                continue
+            if row.project_id and row.project_id not in project_ids:
+                _fail(report, line, f"unknown project_id {row.project_id}")
+                continue
+            records.append((
+                row.id or uuid.uuid4(),
+                user_id,
+                row.category_id or categories.get(row.category),
+                row.project_id or projects.get(row.project),
+                row.title,
+                row.description,
+                row.is_completed,
+                row.due_date,
+                row.priority,
+                now,
+                now,
+                row.completed_at if row.is_completed else None,
+            ))
+            lines.append(line)
+        pending = lines
+        inserted = await _load(db, records) if records else 0
+        await db.commit()
+    except (DBAPIError, asyncpg.PostgresError, asyncpg.DataError) as exc:
+        await db.rollback()
+        error = f"batch rejected: {getattr(exc, 'orig', exc)}"
+        for line in pending:
+            _fail(report, line, error)
+        return
+    report.rows_imported += inserted
+    report.rows_skipped += len(records) - inserted
+
+
+async def import_tasks(
+    db: AsyncSession,
+    user_id: UUID,
+    records: AsyncIterator[Record],
+    *,
+    batch_size: int | None = None,
+    on_progress: Callable[[ImportReport], None] | None = None,
+) -> ImportReport:
+    """Validate and load tasks batch by batch; each batch commits on its own.
+
+    A batch the database rejects is reported row by row and skipped; earlier
+    batches stay committed, so an interrupted import can be re-run with the
+    same row ids.
+    """
+    batch_size = batch_size or settings.import_batch_size
+    report = ImportReport()
+    started = time.perf_counter()
+
+    def tick() -> None:
+        report.seconds = round(time.perf_counter() - started, 3)
+        report.rows_per_second = round(report.rows_read / report.seconds, 1) if report.seconds else 0.0
+        if on_progress:
+            on_progress(report)
+
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            await _import_batch(db, user_id, batch, report)
+            batch = []
+            tick()
+    if batch:
+        await _import_batch(db, user_id, batch, report)
+    tick()
+
+    if report.rows_imported:
+        # Name resolution may have created categories and projects too
+        await invalidate(user_id, "tasks", "categories", "projects", "stats")
+    logger.info(
+        "imported %d/%d tasks for %s in %.1fs (%.0f rows/s, %d failed)",
+        report.rows_imported, report.rows_read, user_id, report.seconds, report.rows_per_second, report.rows_failed,
+    )
+    return report
@@ -0,0 +1,543 @@
+import bisect
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Callable, Iterator
+from uuid import UUID
+
+from sqlalchemy.exc import IntegrityError
+
+from core.security import hash_password
+from models.models import User
+from schemas.schemas import TaskBatchItemResult, TaskBatchResult, UserStats, PriorityStats, CategoryStats, DailyCompletions
+from schemas.schemas import Task as TaskSchema, Category as CategorySchema, Project as ProjectSchema
+from .crud import ROWS_JSON, CATEGORY_SORTS, PROJECT_SORTS, TASK_SORTS, BATCH_INTEGRITY_ERROR, _rolled_back
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, parse_sort
+from .repository import Repository
+from .stats import DEFAULT_STATS_DAYS, _zone
+from .sync import DEFAULT_SYNC_LIMIT
+
+# In-process storage for tests and benchmarks: per-user dicts of rows plus a
+# sorted (key, id) index per sortable column, so list reads page the way the
+# (user_id, key, id) btrees do in Postgres. Nothing is persisted or shared
+# between workers. Every operation completes without awaiting, so each one is
+# atomic on the event loop without locks.
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _integrity_error() -> IntegrityError:
+    return IntegrityError("memory storage", None, Exception(BATCH_INTEGRITY_ERROR))
+
+
+class SortedIndex:
+    """(key, id) entries in Postgres ASC order, NULL keys last.
+
+    Walking it backwards gives DESC with NULLs first, the same order the SQL
+    path reads from one btree in either direction.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._entries: list[tuple] = []
+
+    @staticmethod
+    def _entry(key, row_id: UUID) -> tuple:
+        # The flag keeps None from ever being compared with a real key
+        return (key is None, 0 if key is None else key, row_id)
+
+    def add(self, row: dict) -> None:
+        bisect.insort(self._entries, self._entry(row[self.field], row["id"]))
+
+    def remove(self, row: dict) -> None:
+        del self._entries[bisect.bisect_left(self._entries, self._entry(row[self.field], row["id"]))]
+
+    def scan(self, descending: bool, after: tuple | None = None) -> Iterator[UUID]:
+        """Row ids in sort order, starting strictly after the cursor's (key, id)."""
+        entries = self._entries
+        if descending:
+            start = bisect.bisect_left(entries, self._entry(*after)) if after else len(entries)
+            for position in range(start - 1, -1, -1):
+                yield entries[position][2]
+        else:
+            start = bisect.bisect_right(entries, self._entry(*after)) if after else 0
+            for position in range(start, len(entries)):
+                yield entries[position][2]
+
+
+class Table:
+    """One user's rows of one entity, indexed on every sortable column."""
+
+    def __init__(self, sorts: dict):
+        self.sorts = sorts
+        self.rows: dict[UUID, dict] = {}
+        self.indexes = {name: SortedIndex(name) for name in sorts}
+
+    def insert(self, row: dict) -> dict:
+        self.rows[row["id"]] = row
+        for index in self.indexes.values():
+            index.add(row)
+        return row
+
+    def update(self, row: dict, changes: dict) -> dict:
+        moved = [index for name, index in self.indexes.items() if name in changes and changes[name] != row[name]]
+        for index in moved:
+            index.remove(row)
+        row.update(changes)
+        for index in moved:
+            index.add(row)
+        return row
+
+    def delete(self, row_id: UUID) -> dict | None:
+        row = self.rows.pop(row_id, None)
+        if row is not None:
+            for index in self.indexes.values():
+                index.remove(row)
+        return row
+
+    def page(self, sort: str, cursor: str | None, limit: int, where: Callable[[dict], bool] | None = None) -> tuple[list[dict], str | None]:
+        column, descending = parse_sort(sort, self.sorts)
+        after = decode_cursor(cursor, sort, column) if cursor else None
+        field = sort.lstrip("-")
+        rows = []
+        for row_id in self.indexes[field].scan(descending, after):
+            row = self.rows[row_id]
+            if where is None or where(row):
+                rows.append(row)
+                if len(rows) > limit:
+                    break
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(sort, rows[-1][field], rows[-1]["id"])
+
+
+class UserData:
+    def __init__(self):
+        self.categories = Table(CATEGORY_SORTS)
+        self.projects = Table(PROJECT_SORTS)
+        self.tasks = Table(TASK_SORTS)
+        # category/project id -> ids of its tasks, for the counters
+        self.members: dict[UUID, set[UUID]] = defaultdict(set)
+        # entity -> write counter, as in entity_versions
+        self.versions: dict[str, int] = defaultdict(int)
+
+    def bump(self, *entities: str) -> None:
+        for entity in entities:
+            self.versions[entity] += 1
+
+
+TASK_FIELDS = tuple(TaskSchema.model_fields)
+
+
+class MemoryRepository(Repository):
+    """Indexed in-memory storage with the same semantics as the SQL backend.
+
+    Counters, completed_at and ON DELETE SET NULL are emulated in Python;
+    full-text search and delta sync are Postgres features and are not offered.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self.users: dict[UUID, User] = {}
+        self.emails: dict[str, UUID] = {}
+        self.data: dict[UUID, UserData] = defaultdict(UserData)
+        # (user id, jti) -> expiry, as in revoked_tokens
+        self.revoked_tokens: dict[tuple[UUID, str], int] = {}
+
+    # Users: unattached ORM objects, the same type the SQL backend returns
+    async def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    async def get_user_by_email(self, email):
+        user_id = self.emails.get(email)
+        return None if user_id is None else self.users[user_id]
+
+    async def create_user(self, user):
+        hashed = await hash_password(user.password)
+        if user.email in self.emails:
+            raise IntegrityError("memory storage", None, Exception("duplicate email"))
+        db_user = User(id=uuid.uuid4(), email=user.email, password_hash=hashed, created_at=_now())
+        self.users[db_user.id] = db_user
+        self.emails[db_user.email] = db_user.id
+        return db_user
+
+    async def update_user(self, user_id, user_update):
+        update_data = user_update.model_dump(exclude_unset=True)
+        if "password" in update_data:
+            update_data["password_hash"] = await hash_password(update_data.pop("password"))
+            update_data["tokens_revoked_at"] = _now().replace(microsecond=0)
+        db_user = self.users.get(user_id)
+        if db_user is None:
+            return None
+        email = update_data.get("email", db_user.email)
+        if email != db_user.email:
+            if email in self.emails:
+                raise IntegrityError("memory storage", None, Exception("duplicate email"))
+            del self.emails[db_user.email]
+            self.emails[email] = user_id
+        for field, value in update_data.items():
+            setattr(db_user, field, value)
+        return db_user
+
+    async def set_password_hash(self, user_id, password_hash):
+        if user_id not in self.users:
+            return False
+        self.users[user_id].password_hash = password_hash
+        return True
+
+    async def spend_refresh_token(self, principal):
+        db_user = self.users.get(principal.user_id)
+        key = (principal.user_id, principal.token_id)
+        if db_user is None or key in self.revoked_tokens:
+            return False
+        if db_user.tokens_revoked_at is not None and principal.issued_at < db_user.tokens_revoked_at.timestamp():
+            return False
+        now = _now().timestamp()
+        for expired in [token for token, expires_at in self.revoked_tokens.items() if expires_at < now]:
+            del self.revoked_tokens[expired]
+        self.revoked_tokens[key] = principal.expires_at
+        return True
+
+    async def delete_user(self, user_id):
+        db_user = self.users.pop(user_id, None)
+        if db_user is None:
+            return False
+        del self.emails[db_user.email]
+        self.data.pop(user_id, None)
+        return True
+
+    # Categories and projects: counters are stored, overdue is counted on read
+    def _with_counts(self, data: UserData, row: dict, fields: dict, **extra) -> dict:
+        now = _now()
+        tasks = data.tasks.rows
+        overdue = sum(
+            1 for task_id in data.members.get(row["id"], ())
+            if not tasks[task_id]["is_completed"] and tasks[task_id]["due_date"] is not None and tasks[task_id]["due_date"] < now
+        )
+        values = {**row, **extra, "overdue_count": overdue}
+        # Schema field order, so the JSON matches the SQL path byte for byte
+        return {field: values[field] for field in fields}
+
+    def _category(self, data: UserData, row: dict) -> dict:
+        return self._with_counts(data, row, CategorySchema.model_fields)
+
+    def _project(self, data: UserData, row: dict) -> dict:
+        total, done = row["task_count"], row["completed_count"]
+        return self._with_counts(data, row, ProjectSchema.model_fields, progress=done * 100 // total if total else 0)
+
+    async def get_categories_json(self, user_id, *, sort="name", cursor=None, limit=DEFAULT_PAGE_SIZE):
+        data = self.data[user_id]
+        rows, next_cursor = data.categories.page(sort, cursor, limit)
+        return ROWS_JSON.dump_json([self._category(data, row) for row in rows]), next_cursor
+
+    async def get_category(self, category_id, user_id):
+        data = self.data[user_id]
+        row = data.categories.rows.get(category_id)
+        return CategorySchema.model_validate(self._category(data, row)) if row else None
+
+    async def create_category(self, category, user_id):
+        data = self.data[user_id]
+        row = data.categories.insert({"id": uuid.uuid4(), "user_id": user_id, "name": category.name, "task_count": 0, "completed_count": 0})
+        data.bump("category")
+        return CategorySchema.model_validate(self._category(data, row))
+
+    async def update_category(self, category_id, category_update, user_id):
+        data = self.data[user_id]
+        row = data.categories.rows.get(category_id)
+        if row is None:
+            return None
+        update_data = category_update.model_dump(exclude_unset=True)
+        if update_data:
+            data.categories.update(row, update_data)
+            data.bump("category")
+        return CategorySchema.model_validate(self._category(data, row))
+
+    async def delete_category(self, category_id, user_id):
+        data = self.data[user_id]
+        if data.categories.delete(category_id) is None:
+            return False
+        self._detach(data, "category_id", category_id)
+        data.bump("category", "task")
+        return True
+
+    async def get_projects_json(self, user_id, *, sort="create_day", cursor=None, limit=DEFAULT_PAGE_SIZE):
+        data = self.data[user_id]
+        rows, next_cursor = data.projects.page(sort, cursor, limit)
+        return ROWS_JSON.dump_json([self._project(data, row) for row in rows]), next_cursor
+
+    async def get_project(self, project_id, user_id):
+        data = self.data[user_id]
+        row = data.projects.rows.get(project_id)
+        return ProjectSchema.model_validate(self._project(data, row)) if row else None
+
+    async def create_project(self, project, user_id):
+        data = self.data[user_id]
+        row = data.projects.insert({
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "name": project.name,
+            "create_day": _now(),
+            "due_date": project.due_date,
+            "task_count": 0,
+            "completed_count": 0,
+        })
+        data.bump("project")
+        return ProjectSchema.model_validate(self._project(data, row))
+
+    async def update_project(self, project_id, project_update, user_id):
+        data = self.data[user_id]
+        row = data.projects.rows.get(project_id)
+        if row is None:
+            return None
+        update_data = project_update.model_dump(exclude_unset=True)
+        if update_data:
+            data.projects.update(row, update_data)
+            data.bump("project")
+        return ProjectSchema.model_validate(self._project(data, row))
+
+    async def delete_project(self, project_id, user_id):
+        data = self.data[user_id]
+        if data.projects.delete(project_id) is None:
+            return False
+        self._detach(data, "project_id", project_id)
+        data.bump("project", "task")
+        return True
+
+    def _detach(self, data: UserData, field: str, parent_id: UUID) -> None:
+        # ON DELETE SET NULL
+        for task_id in data.members.pop(parent_id, ()):
+            data.tasks.update(data.tasks.rows[task_id], {field: None})
+
+    # Tasks
+    def _count(self, data: UserData, task: dict, sign: int) -> None:
+        """Apply a task's contribution to its parents' counters (task_counters())."""
+        for field, table in (("category_id", data.categories), ("project_id", data.projects)):
+            parent = table.rows.get(task[field])
+            if parent is None:
+                continue
+            parent["task_count"] += sign
+            parent["completed_count"] += sign if task["is_completed"] else 0
+            members = data.members[parent["id"]]
+            members.add(task["id"]) if sign > 0 else members.discard(task["id"])
+
+    def _check_references(self, data: UserData, values: dict) -> bool:
+        return all(
+            values.get(field) is None or values[field] in table.rows
+            for field, table in (("category_id", data.categories), ("project_id", data.projects))
+        )
+
+    def _insert_task(self, data: UserData, user_id: UUID, values: dict) -> dict:
+        now = _now()
+        row = {
+            "title": values["title"],
+            "description": values.get("description"),
+            "is_completed": values.get("is_completed", False),
+            "due_date": values.get("due_date"),
+            "priority": values.get("priority", 0),
+            "id": values.get("id") or uuid.uuid4(),
+            "user_id": user_id,
+            "category_id": values.get("category_id"),
+            "project_id": values.get("project_id"),
+            "updated_at": values.get("updated_at", now),
+            "created_at": values.get("created_at", now),
+            # set_completed_at(): inserts keep an explicit value
+            "completed_at": (values.get("completed_at") or now) if values.get("is_completed") else None,
+        }
+        data.tasks.insert({field: row[field] for field in TASK_FIELDS})
+        self._count(data, row, 1)
+        return data.tasks.rows[row["id"]]
+
+    def _update_task(self, data: UserData, row: dict, changes: dict) -> dict:
+        changes = {**changes, "updated_at": _now()}
+        if "is_completed" in changes:
+            if not changes["is_completed"]:
+                changes["completed_at"] = None
+            elif not row["is_completed"]:
+                changes["completed_at"] = changes["updated_at"]
+        self._count(data, row, -1)
+        data.tasks.update(row, changes)
+        self._count(data, row, 1)
+        return row
+
+    def _delete_task(self, data: UserData, task_id: UUID) -> bool:
+        row = data.tasks.delete(task_id)
+        if row is None:
+            return False
+        self._count(data, row, -1)
+        return True
+
+    async def get_tasks_json(
+        self, user_id, *, is_completed=None, category_id=None, project_id=None, due_after=None, due_before=None,
+        priority=None, sort="created_at", cursor=None, limit=DEFAULT_PAGE_SIZE, include_archived=False,
+    ):
+        # Nothing is ever archived here, so include_archived changes nothing
+        filters = [
+            (field, test) for field, value, test in (
+                ("is_completed", is_completed, lambda v, x=is_completed: v == x),
+                ("category_id", category_id, lambda v, x=category_id: v == x),
+                ("project_id", project_id, lambda v, x=project_id: v == x),
+                ("due_date", due_after, lambda v, x=due_after: v is not None and v >= x),
+                ("due_date", due_before, lambda v, x=due_before: v is not None and v < x),
+                ("priority", priority, lambda v, x=priority: v == x),
+            )
+            if value is not None
+        ]
+        where = (lambda row: all(test(row[field]) for field, test in filters)) if filters else None
+        rows, next_cursor = self.data[user_id].tasks.page(sort, cursor, limit, where)
+        return ROWS_JSON.dump_json(rows), next_cursor
+
+    async def search_tasks_json(self, user_id, q, *, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        raise self._unsupported("search_tasks_json")
+
+    async def get_task(self, task_id, user_id, include_archived=False):
+        row = self.data[user_id].tasks.rows.get(task_id)
+        return TaskSchema.model_validate(row) if row else None
+
+    async def create_task(self, task, user_id):
+        data = self.data[user_id]
+        values = task.model_dump()
+        if not self._check_references(data, values):
+            raise _integrity_error()
+        row = self._insert_task(data, user_id, values)
+        data.bump("task", "category", "project")
+        return TaskSchema.model_validate(row)
+
+    async def update_task(self, task_id, task_update, user_id):
+        data = self.data[user_id]
+        row = data.tasks.rows.get(task_id)
+        if row is None:
+            return None
+        update_data = task_update.model_dump(exclude_unset=True)
+        if not update_data:
+            return TaskSchema.model_validate(row)
+        if not self._check_references(data, update_data):
+            raise _integrity_error()
+        self._update_task(data, row, update_data)
+        data.bump("task", "category", "project")
+        return TaskSchema.model_validate(row)
+
+    async def delete_task(self, task_id, user_id):
+        data = self.data[user_id]
+        if not self._delete_task(data, task_id):
+            return False
+        data.bump("task", "category", "project")
+        return True
+
+    # Batches follow crud.py: atomic batches apply all items or none
+    async def create_tasks(self, tasks, user_id, atomic=True):
+        data = self.data[user_id]
+        rows = [task.model_dump() for task in tasks]
+        valid = [self._check_references(data, row) for row in rows]
+        if atomic and not all(valid):
+            return _rolled_back([
+                TaskBatchItemResult(index=i, status="ok" if ok else "error", error=None if ok else BATCH_INTEGRITY_ERROR)
+                for i, ok in enumerate(valid)
+            ])
+        results = []
+        for index, (row, ok) in enumerate(zip(rows, valid)):
+            if ok:
+                task = TaskSchema.model_validate(self._insert_task(data, user_id, row))
+                results.append(TaskBatchItemResult(index=index, id=task.id, status="ok", task=task))
+            else:
+                results.append(TaskBatchItemResult(index=index, status="error", error=BATCH_INTEGRITY_ERROR))
+        data.bump("task", "category", "project")
+        return TaskBatchResult(committed=True, results=results)
+
+    async def update_tasks(self, items, user_id, atomic=True):
+        data = self.data[user_id]
+        changes = [item.model_dump(exclude_unset=True, exclude={"id"}) for item in items]
+        valid = [self._check_references(data, change) for change in changes]
+        # Every item is checked before any is applied, so a rollback never has to undo writes
+        results = [
+            TaskBatchItemResult(index=i, id=item.id, status="not_found") if item.id not in data.tasks.rows
+            else TaskBatchItemResult(index=i, id=item.id, status="ok") if ok
+            else TaskBatchItemResult(index=i, id=item.id, status="error", error=BATCH_INTEGRITY_ERROR)
+            for i, (item, ok) in enumerate(zip(items, valid))
+        ]
+        if atomic and any(item.status != "ok" for item in results):
+            return _rolled_back(results)
+        for item, change in zip(results, changes):
+            if item.status == "ok":
+                row = data.tasks.rows[item.id]
+                item.task = TaskSchema.model_validate(self._update_task(data, row, change) if change else row)
+        data.bump("task", "category", "project")
+        return TaskBatchResult(committed=True, results=results)
+
+    async def delete_tasks(self, task_ids, user_id, atomic=True):
+        data = self.data[user_id]
+        found = [task_id in data.tasks.rows for task_id in task_ids]
+        results = [
+            TaskBatchItemResult(index=i, id=task_id, status="ok" if ok else "not_found")
+            for i, (task_id, ok) in enumerate(zip(task_ids, found))
+        ]
+        if atomic and not all(found):
+            return _rolled_back(results)
+        for task_id, ok in zip(task_ids, found):
+            if ok:
+                self._delete_task(data, task_id)
+        data.bump("task", "category", "project")
+        return TaskBatchResult(committed=True, results=results)
+
+    async def get_user_stats(self, user_id, *, days=DEFAULT_STATS_DAYS, tz="UTC"):
+        zone = _zone(tz)
+        today = datetime.now(zone).date()
+        first_day = today - timedelta(days=days - 1)
+        since = datetime.combine(first_day, time(), tzinfo=zone)
+        now = _now()
+        data = self.data[user_id]
+
+        totals = [0, 0, 0]
+        by_priority: dict[int, list[int]] = defaultdict(lambda: [0, 0, 0])
+        by_category: dict[UUID | None, list[int]] = defaultdict(lambda: [0, 0, 0])
+        per_day: dict[date, int] = defaultdict(int)
+        for task in data.tasks.rows.values():
+            counts = (1, int(task["is_completed"]), int(not task["is_completed"] and task["due_date"] is not None and task["due_date"] < now))
+            for bucket in (totals, by_priority[task["priority"]], by_category[task["category_id"]]):
+                for i, count in enumerate(counts):
+                    bucket[i] += count
+            if task["completed_at"] is not None and task["completed_at"] >= since:
+                per_day[task["completed_at"].astimezone(zone).date()] += 1
+
+        stats = UserStats(generated_at=now, total=totals[0], completed=totals[1], overdue=totals[2], open=totals[0] - totals[1])
+        stats.by_priority = [
+            PriorityStats(priority=priority, total=t, completed=c, overdue=o)
+            for priority, (t, c, o) in sorted(by_priority.items())
+        ]
+        categories = data.categories.rows
+        stats.by_category = sorted(
+            (
+                CategoryStats(category_id=category_id, name=categories[category_id]["name"] if category_id else None, total=t, completed=c, overdue=o)
+                for category_id, (t, c, o) in by_category.items()
+            ),
+            key=lambda item: (item.name is None, item.name or ""),
+        )
+        stats.completions = [
+            DailyCompletions(day=first_day + timedelta(days=offset), completed=per_day.get(first_day + timedelta(days=offset), 0))
+            for offset in range(days)
+        ]
+        return stats
+
+    async def get_changes(self, user_id, since, limit=DEFAULT_SYNC_LIMIT):
+        raise self._unsupported("get_changes")
+
+    async def get_entity_version(self, user_id, entity):
+        return self.data[user_id].versions[entity] if user_id in self.data else 0
+
+    def load(self, user: User, categories: list[dict], projects: list[dict], tasks: list[dict]) -> None:
+        """Bulk-load rows shaped like the tables' (benchmarks.seed); counters are derived."""
+        self.users[user.id] = user
+        self.emails[user.email] = user.id
+        data = self.data[user.id]
+        for row in categories:
+            data.categories.insert({"id": row["id"], "user_id": user.id, "name": row["name"], "task_count": 0, "completed_count": 0})
+        for row in projects:
+            data.projects.insert({
+                "id": row["id"], "user_id": user.id, "name": row["name"], "create_day": row["create_day"],
+                "due_date": row.get("due_date"), "task_count": 0, "completed_count": 0,
+            })
+        for row in tasks:
+            self._insert_task(data, user.id, row)
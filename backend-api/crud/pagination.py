@@ -0,0 +1,81 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import Select, and_, or_, tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+# Cursors are opaque to clients: base64url(JSON) holding the sort the page was
+# produced with, the sort key of the last row and its id.
+def encode_cursor(sort: str, key, row_id: UUID) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps({"s": sort, "k": key, "i": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, column) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort:
+            raise ValueError("Cursor was issued for a different sort order")
+        key = payload["k"]
+        if key is not None and column.type.python_type is datetime:
+            key = datetime.fromisoformat(key)
+        return key, UUID(payload["i"])
+    except (binascii.Error, json.JSONDecodeError, KeyError, TypeError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def parse_sort(sort: str, columns: dict) -> tuple:
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name not in columns:
+        raise ValueError(f"Unsupported sort '{name}', expected one of: {', '.join(columns)}")
+    return columns[name], descending
+
+
+def _after(column, id_column, key, last_id: UUID, descending: bool):
+    # Rows strictly after (key, last_id) in Postgres' default NULL placement:
+    # ASC puts NULLs last, DESC puts them first, so one index serves both.
+    if not getattr(column.expression, "nullable", True):
+        if descending:
+            return tuple_(column, id_column) < tuple_(key, last_id)
+        return tuple_(column, id_column) > tuple_(key, last_id)
+    if descending:
+        if key is None:
+            return or_(and_(column.is_(None), id_column < last_id), column.is_not(None))
+        return or_(column < key, and_(column == key, id_column < last_id))
+    if key is None:
+        return and_(column.is_(None), id_column > last_id)
+    return or_(column > key, and_(column == key, id_column > last_id), column.is_(None))
+
+
+def keyset_paginate(stmt: Select, id_column, columns: dict, sort: str, cursor: str | None, limit: int) -> Select:
+    """Apply ORDER BY (sort_key, id), the keyset predicate for `cursor` and LIMIT.
+
+    One extra row is fetched so `page_results` can tell whether a next page exists.
+    """
+    column, descending = parse_sort(sort, columns)
+    if cursor:
+        key, last_id = decode_cursor(cursor, sort, column)
+        stmt = stmt.where(_after(column, id_column, key, last_id, descending))
+    if descending:
+        stmt = stmt.order_by(column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(column.asc(), id_column.asc())
+    return stmt.limit(limit + 1)
+
+
+def page_results(rows: list, sort: str, limit: int) -> tuple[list, str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, getattr(last, sort.lstrip("-")), last.id)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from .cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+# Deletes only set deleted_at (crud.crud); this job removes the rows for good.
+# Every statement touches at most :limit rows and commits on its own, with
+# purge_batch_pause_seconds between batches, so a user with a million tasks
+# never means one huge transaction or a burst of I/O.
+
+# Keeps log_change() and task_counters() out of a deleted user's purge: nobody
+# is left to sync those rows, and their projects and categories go as well
+PURGING = text("SELECT set_config('app.purging', 'on', true)")
+
+DELETED_USERS = text("SELECT id FROM users WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT :limit")
+
+# Children before parents (tasks.user_id has no ON DELETE CASCADE). tableoid
+# because a ctid is only unique within one partition.
+USER_TABLES = ["tasks", "tasks_archive", "categories", "projects", "change_log", "entity_versions"]
+USER_ROWS = """
+    DELETE FROM {table} WHERE user_id = :user_id AND (tableoid, ctid) IN (
+        SELECT tableoid, ctid FROM {table} WHERE user_id = :user_id LIMIT :limit
+    )
+"""
+USER = text("DELETE FROM users WHERE id = :user_id AND deleted_at IS NOT NULL")
+
+# table -> the task column referring to it
+PARENTS = {"categories": "category_id", "projects": "project_id"}
+DELETED_PARENTS = "SELECT id, user_id FROM {table} WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT :limit"
+# Clears what ON DELETE SET NULL would clear, a batch at a time; log_change()
+# reports the tasks to sync clients as it does for any update
+DETACH = """
+    UPDATE {tasks} SET {column} = NULL WHERE user_id = :user_id AND (tableoid, ctid) IN (
+        SELECT tableoid, ctid FROM {tasks} WHERE user_id = :user_id AND {column} = :parent_id LIMIT :limit
+    )
+"""
+# All at once, for a parent small enough to detach in the transaction deleting it
+DETACH_ALL = "UPDATE {tasks} SET {column} = NULL WHERE user_id = :user_id AND {column} = :parent_id"
+# Anything that still refers to it (a task created in the meantime) is cleared by ON DELETE SET NULL
+PARENT = "DELETE FROM {table} WHERE id = :parent_id AND user_id = :user_id AND deleted_at IS NOT NULL"
+
+# Skips tasks someone is writing right now; the next run gets them
+DELETED_TASKS = text("""
+    WITH picked AS (
+        SELECT id, user_id FROM tasks
+        WHERE deleted_at IS NOT NULL
+        ORDER BY deleted_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM tasks t USING picked p WHERE t.id = p.id AND t.user_id = p.user_id
+""")
+
+
+async def _in_batches(db: AsyncSession, stmt, params: dict, purging: bool = False) -> int:
+    """Repeat `stmt` until a batch comes up short; returns the rows affected."""
+    total = 0
+    while True:
+        if purging:
+            await db.execute(PURGING)
+        count = (await db.execute(stmt, {**params, "limit": settings.purge_batch_size})).rowcount
+        await db.commit()
+        total += count
+        if count:
+            await asyncio.sleep(settings.purge_batch_pause_seconds)
+        if count < settings.purge_batch_size:
+            return total
+
+
+async def purge_user(db: AsyncSession, user_id: UUID) -> int:
+    """Remove a deleted user and everything they own; returns the rows removed."""
+    total = 0
+    for table in USER_TABLES:
+        total += await _in_batches(db, text(USER_ROWS.format(table=table)), {"user_id": user_id}, purging=True)
+    total += (await db.execute(USER, {"user_id": user_id})).rowcount
+    await db.commit()
+    return total
+
+
+async def detach_all(db: AsyncSession, table: str, parent_id: UUID, user_id: UUID) -> int:
+    """Clear every reference to a category or project being deleted, in the
+    caller's transaction; returns the tasks detached."""
+    detached = 0
+    for tasks in ("tasks", "tasks_archive"):
+        stmt = text(DETACH_ALL.format(tasks=tasks, column=PARENTS[table]))
+        detached += (await db.execute(stmt, {"user_id": user_id, "parent_id": parent_id})).rowcount
+    return detached
+
+
+async def purge_parent(db: AsyncSession, table: str, parent_id: UUID, user_id: UUID) -> int:
+    """Clear the references to a deleted category or project, then remove it;
+    returns the tasks detached."""
+    column, detached = PARENTS[table], 0
+    for tasks in ("tasks", "tasks_archive"):
+        stmt = text(DETACH.format(tasks=tasks, column=column))
+        count = await _in_batches(db, stmt, {"user_id": user_id, "parent_id": parent_id})
+        if count:
+            await invalidate(user_id, "tasks", "stats")
+        detached += count
+    await db.execute(text(PARENT.format(table=table)), {"parent_id": parent_id, "user_id": user_id})
+    await db.commit()
+    return detached
+
+
+async def purge_deleted(db: AsyncSession) -> dict[str, int]:
+    """Hard-delete soft-deleted users, categories, projects and tasks.
+
+    Users go first, taking their own categories, projects and tasks with
+    them; then categories and projects, once the tasks pointing at them are
+    detached; then tasks. Returns counts per kind.
+    """
+    purged = {"users": 0, "user_rows": 0, "categories": 0, "projects": 0, "detached_tasks": 0, "tasks": 0}
+    while user_ids := (await db.execute(DELETED_USERS, {"limit": settings.purge_batch_size})).scalars().all():
+        await db.rollback()
+        for user_id in user_ids:
+            purged["user_rows"] += await purge_user(db, user_id)
+            purged["users"] += 1
+    for table in PARENTS:
+        stmt = text(DELETED_PARENTS.format(table=table))
+        while parents := (await db.execute(stmt, {"limit": settings.purge_batch_size})).all():
+            await db.rollback()
+            for parent_id, user_id in parents:
+                purged["detached_tasks"] += await purge_parent(db, table, parent_id, user_id)
+                purged[table] += 1
+    purged["tasks"] = await _in_batches(db, DELETED_TASKS, {})
+    if any(purged.values()):
+        logger.info("purged deleted rows: %s", purged)
+    return purged
@@ -0,0 +1,478 @@
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.tokens import Principal
+from models.models import User
+from schemas.schemas import UserCreate, UserUpdate, CategoryCreate, CategoryUpdate, TaskCreate, TaskUpdate, ProjectCreate, ProjectUpdate
+from schemas.schemas import TaskBatchUpdateItem, TaskBatchResult, SyncResponse, UserStats
+from schemas.schemas import Task as TaskSchema, Category as CategorySchema, Project as ProjectSchema
+from . import crud, directory, stats, sync, tokens
+from .pagination import DEFAULT_PAGE_SIZE
+from .stats import DEFAULT_STATS_DAYS
+from .sync import DEFAULT_SYNC_LIMIT
+
+
+class UnsupportedOperation(HTTPException):
+    """An operation the configured storage backend doesn't offer (501)."""
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=501, detail=detail)
+
+
+class Repository(ABC):
+    """Storage operations the API is built on, one instance per request.
+
+    Every backend implements every method, so one it lacks fails when the
+    backend is instantiated. What a backend can't offer raises
+    UnsupportedOperation from its own method, which the API answers with 501.
+    """
+
+    backend = "abstract"
+
+    def _unsupported(self, operation: str) -> UnsupportedOperation:
+        return UnsupportedOperation(f"{operation} is not supported by the {self.backend} storage backend")
+
+    # Users
+    @abstractmethod
+    async def get_user(self, user_id: UUID) -> User | None:
+        ...
+
+    @abstractmethod
+    async def get_user_by_email(self, email: str) -> User | None:
+        ...
+
+    @abstractmethod
+    async def create_user(self, user: UserCreate) -> User:
+        ...
+
+    @abstractmethod
+    async def update_user(self, user_id: UUID, user_update: UserUpdate) -> User | None:
+        ...
+
+    @abstractmethod
+    async def set_password_hash(self, user_id: UUID, password_hash: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_user(self, user_id: UUID) -> bool:
+        ...
+
+    @abstractmethod
+    async def spend_refresh_token(self, principal: Principal) -> bool:
+        ...
+
+    # Categories
+    @abstractmethod
+    async def get_categories_json(self, user_id: UUID, *, sort: str = "name", cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE) -> tuple[bytes, str | None]:
+        ...
+
+    @abstractmethod
+    async def get_category(self, category_id: UUID, user_id: UUID) -> CategorySchema | None:
+        ...
+
+    @abstractmethod
+    async def create_category(self, category: CategoryCreate, user_id: UUID) -> CategorySchema:
+        ...
+
+    @abstractmethod
+    async def update_category(self, category_id: UUID, category_update: CategoryUpdate, user_id: UUID) -> CategorySchema | None:
+        ...
+
+    @abstractmethod
+    async def delete_category(self, category_id: UUID, user_id: UUID) -> bool:
+        ...
+
+    # Projects
+    @abstractmethod
+    async def get_projects_json(self, user_id: UUID, *, sort: str = "create_day", cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE) -> tuple[bytes, str | None]:
+        ...
+
+    @abstractmethod
+    async def get_project(self, project_id: UUID, user_id: UUID) -> ProjectSchema | None:
+        ...
+
+    @abstractmethod
+    async def create_project(self, project: ProjectCreate, user_id: UUID) -> ProjectSchema:
+        ...
+
+    @abstractmethod
+    async def update_project(self, project_id: UUID, project_update: ProjectUpdate, user_id: UUID) -> ProjectSchema | None:
+        ...
+
+    @abstractmethod
+    async def delete_project(self, project_id: UUID, user_id: UUID) -> bool:
+        ...
+
+    # Tasks
+    @abstractmethod
+    async def get_tasks_json(
+        self,
+        user_id: UUID,
+        *,
+        is_completed: bool | None = None,
+        category_id: UUID | None = None,
+        project_id: UUID | None = None,
+        due_after: datetime | None = None,
+        due_before: datetime | None = None,
+        priority: int | None = None,
+        sort: str = "created_at",
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        include_archived: bool = False,
+    ) -> tuple[bytes, str | None]:
+        ...
+
+    @abstractmethod
+    async def search_tasks_json(self, user_id: UUID, q: str, *, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE) -> tuple[bytes, str | None]:
+        ...
+
+    @abstractmethod
+    async def get_task(self, task_id: UUID, user_id: UUID, include_archived: bool = False) -> TaskSchema | None:
+        ...
+
+    @abstractmethod
+    async def create_task(self, task: TaskCreate, user_id: UUID) -> TaskSchema:
+        ...
+
+    @abstractmethod
+    async def update_task(self, task_id: UUID, task_update: TaskUpdate, user_id: UUID) -> TaskSchema | None:
+        ...
+
+    @abstractmethod
+    async def delete_task(self, task_id: UUID, user_id: UUID) -> bool:
+        ...
+
+    @abstractmethod
+    async def create_tasks(self, tasks: list[TaskCreate], user_id: UUID, atomic: bool = True) -> TaskBatchResult:
+        ...
+
+    @abstractmethod
+    async def update_tasks(self, items: list[TaskBatchUpdateItem], user_id: UUID, atomic: bool = True) -> TaskBatchResult:
+        ...
+
+    @abstractmethod
+    async def delete_tasks(self, task_ids: list[UUID], user_id: UUID, atomic: bool = True) -> TaskBatchResult:
+        ...
+
+    # Dashboard, delta sync and ETags
+    @abstractmethod
+    async def get_user_stats(self, user_id: UUID, *, days: int = DEFAULT_STATS_DAYS, tz: str = "UTC") -> UserStats:
+        ...
+
+    @abstractmethod
+    async def get_changes(self, user_id: UUID, since: str | None, limit: int = DEFAULT_SYNC_LIMIT) -> SyncResponse:
+        ...
+
+    @abstractmethod
+    async def get_entity_version(self, user_id: UUID, entity: str) -> int:
+        ...
+
+
+class SqlRepository(Repository):
+    """Postgres through SQLAlchemy: the crud functions bound to one session."""
+
+    backend = "sql"
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_user(self, user_id):
+        return await crud.get_user(self.db, user_id)
+
+    async def get_user_by_email(self, email):
+        return await crud.get_user_by_email(self.db, email)
+
+    async def create_user(self, user):
+        return await crud.create_user(self.db, user)
+
+    async def update_user(self, user_id, user_update):
+        return await crud.update_user(self.db, user_id, user_update)
+
+    async def set_password_hash(self, user_id, password_hash):
+        return await crud.set_password_hash(self.db, user_id, password_hash)
+
+    async def delete_user(self, user_id):
+        return await crud.delete_user(self.db, user_id)
+
+    async def spend_refresh_token(self, principal):
+        return await tokens.spend_refresh_token(self.db, principal)
+
+    async def get_categories_json(self, user_id, **options):
+        return await crud.get_categories_json(self.db, user_id, **options)
+
+    async def get_category(self, category_id, user_id):
+        return await crud.get_category(self.db, category_id, user_id)
+
+    async def create_category(self, category, user_id):
+        return await crud.create_category(self.db, category, user_id)
+
+    async def update_category(self, category_id, category_update, user_id):
+        return await crud.update_category(self.db, category_id, category_update, user_id)
+
+    async def delete_category(self, category_id, user_id):
+        return await crud.delete_category(self.db, category_id, user_id)
+
+    async def get_projects_json(self, user_id, **options):
+        return await crud.get_projects_json(self.db, user_id, **options)
+
+    async def get_project(self, project_id, user_id):
+        return await crud.get_project(self.db, project_id, user_id)
+
+    async def create_project(self, project, user_id):
+        return await crud.create_project(self.db, project, user_id)
+
+    async def update_project(self, project_id, project_update, user_id):
+        return await crud.update_project(self.db, project_id, project_update, user_id)
+
+    async def delete_project(self, project_id, user_id):
+        return await crud.delete_project(self.db, project_id, user_id)
+
+    async def get_tasks_json(self, user_id, **options):
+        return await crud.get_tasks_json(self.db, user_id, **options)
+
+    async def search_tasks_json(self, user_id, q, **options):
+        return await crud.search_tasks_json(self.db, user_id, q, **options)
+
+    async def get_task(self, task_id, user_id, include_archived=False):
+        return await crud.get_task(self.db, task_id, user_id, include_archived)
+
+    async def create_task(self, task, user_id):
+        return await crud.create_task(self.db, task, user_id)
+
+    async def update_task(self, task_id, task_update, user_id):
+        return await crud.update_task(self.db, task_id, task_update, user_id)
+
+    async def delete_task(self, task_id, user_id):
+        return await crud.delete_task(self.db, task_id, user_id)
+
+    async def create_tasks(self, tasks, user_id, atomic=True):
+        return await crud.create_tasks(self.db, tasks, user_id, atomic)
+
+    async def update_tasks(self, items, user_id, atomic=True):
+        return await crud.update_tasks(self.db, items, user_id, atomic)
+
+    async def delete_tasks(self, task_ids, user_id, atomic=True):
+        return await crud.delete_tasks(self.db, task_ids, user_id, atomic)
+
+    async def get_user_stats(self, user_id, **options):
+        return await stats.get_user_stats(self.db, user_id, **options)
+
+    async def get_changes(self, user_id, since, limit=DEFAULT_SYNC_LIMIT):
+        return await sync.get_changes(self.db, user_id, since, limit)
+
+    async def get_entity_version(self, user_id, entity):
+        return await sync.get_entity_version(self.db, user_id, entity)
+
+
+def _duplicate_email() -> IntegrityError:
+    return IntegrityError("sharded storage", None, Exception("duplicate key value violates unique constraint on email"))
+
+
+# Holds the email directory (crud.directory)
+EMAIL_DIRECTORY_SHARD = 0
+
+
+class ShardMoving(RuntimeError):
+    """The user's rows are being moved to another database; writes wait until
+    the move is finished (SHARD_FROZEN_BUCKETS)."""
+
+
+class ShardedRepository(Repository):
+    """SqlRepository per shard: each call goes to the database holding the
+    user's rows (see db.session.ShardRouter).
+
+    Sessions are opened on first use, so a request touches only its user's
+    shard. Emails are claimed in a directory on the first shard
+    (models.UserEmail) before the user row is written, so two signups racing
+    for one email on different shards can't both win. Users created before
+    the directory existed have no claim, so creates, email changes and
+    unclaimed lookups also ask every shard, all at once. With `read_only`,
+    for handlers that only read, each shard's session comes from one of its
+    replicas if it has a healthy one.
+    """
+
+    backend = "sql"
+
+    def __init__(self, router, read_only: bool = False):
+        self.router = router
+        self.read_only = read_only
+        self._repositories: dict[int, SqlRepository] = {}
+
+    def _on_shard(self, shard: int) -> SqlRepository:
+        repository = self._repositories.get(shard)
+        if repository is None:
+            sessions = self.router.read_sessions(shard) if self.read_only else self.router.sessions[shard]
+            repository = self._repositories[shard] = SqlRepository(sessions())
+        return repository
+
+    def sessions(self) -> list[AsyncSession]:
+        return [repository.db for repository in self._repositories.values()]
+
+    def _read(self, user_id: UUID) -> SqlRepository:
+        return self._on_shard(self.router.shard_of(user_id))
+
+    def _write(self, user_id: UUID) -> SqlRepository:
+        self.router.check_writable(user_id)
+        return self._read(user_id)
+
+    async def close(self) -> None:
+        for repository in self._repositories.values():
+            await repository.db.close()
+        self._repositories.clear()
+
+    @property
+    def _directory(self) -> AsyncSession:
+        return self._on_shard(EMAIL_DIRECTORY_SHARD).db
+
+    async def _users_by_email(self, email: str) -> list:
+        shards = range(len(self.router.sessions))
+        users = await asyncio.gather(*(self._on_shard(shard).get_user_by_email(email) for shard in shards))
+        return [user for user in users if user is not None]
+
+    async def _email_taken(self, email: str, user_id: UUID | None = None) -> bool:
+        return any(user.id != user_id for user in await self._users_by_email(email))
+
+    async def _claim_email(self, email: str, user_id: UUID) -> bool:
+        if await directory.claim_email(self._directory, email, user_id):
+            return True
+        owner = await directory.get_email_owner(self._directory, email)
+        if owner is None:
+            # Released in the meantime
+            return await directory.claim_email(self._directory, email, user_id)
+        if owner == user_id:
+            return True
+        if await self._read(owner).get_user(owner) is None:
+            return await directory.claim_email(self._directory, email, user_id, replacing=owner)
+        return False
+
+    async def get_user(self, user_id):
+        return await self._read(user_id).get_user(user_id)
+
+    async def get_user_by_email(self, email):
+        owner = await directory.get_email_owner(self._directory, email)
+        if owner is not None:
+            user = await self._read(owner).get_user_by_email(email)
+            if user is not None:
+                return user
+        users = await self._users_by_email(email)
+        return users[0] if users else None
+
+    async def create_user(self, user):
+        user_id = uuid4()
+        while self.router.is_frozen(user_id):
+            user_id = uuid4()
+        if not await self._claim_email(user.email, user_id):
+            raise _duplicate_email()
+        try:
+            if await self._email_taken(user.email):
+                raise _duplicate_email()
+            return await crud.create_user(self._read(user_id).db, user, user_id=user_id)
+        except Exception:
+            await directory.release_email(self._directory, user.email, user_id)
+            raise
+
+    async def update_user(self, user_id, user_update):
+        repository = self._write(user_id)
+        current = await repository.get_user(user_id) if user_update.email is not None else None
+        if current is None or current.email == user_update.email:
+            return await repository.update_user(user_id, user_update)
+        if not await self._claim_email(user_update.email, user_id):
+            raise _duplicate_email()
+        try:
+            if await self._email_taken(user_update.email, user_id):
+                raise _duplicate_email()
+            updated = await repository.update_user(user_id, user_update)
+        except Exception:
+            await directory.release_email(self._directory, user_update.email, user_id)
+            raise
+        # Deleted in the meantime: the new email stays free
+        released = current.email if updated is not None else user_update.email
+        await directory.release_email(self._directory, released, user_id)
+        return updated
+
+    async def set_password_hash(self, user_id, password_hash):
+        return await self._write(user_id).set_password_hash(user_id, password_hash)
+
+    async def delete_user(self, user_id):
+        repository = self._write(user_id)
+        user = await repository.get_user(user_id)
+        deleted = await repository.delete_user(user_id)
+        if deleted and user is not None:
+            # A deleted account's email can be registered again right away
+            await directory.release_email(self._directory, user.email, user_id)
+        return deleted
+
+    async def spend_refresh_token(self, principal):
+        return await self._write(principal.user_id).spend_refresh_token(principal)
+
+    async def get_categories_json(self, user_id, **options):
+        return await self._read(user_id).get_categories_json(user_id, **options)
+
+    async def get_category(self, category_id, user_id):
+        return await self._read(user_id).get_category(category_id, user_id)
+
+    async def create_category(self, category, user_id):
+        return await self._write(user_id).create_category(category, user_id)
+
+    async def update_category(self, category_id, category_update, user_id):
+        return await self._write(user_id).update_category(category_id, category_update, user_id)
+
+    async def delete_category(self, category_id, user_id):
+        return await self._write(user_id).delete_category(category_id, user_id)
+
+    async def get_projects_json(self, user_id, **options):
+        return await self._read(user_id).get_projects_json(user_id, **options)
+
+    async def get_project(self, project_id, user_id):
+        return await self._read(user_id).get_project(project_id, user_id)
+
+    async def create_project(self, project, user_id):
+        return await self._write(user_id).create_project(project, user_id)
+
+    async def update_project(self, project_id, project_update, user_id):
+        return await self._write(user_id).update_project(project_id, project_update, user_id)
+
+    async def delete_project(self, project_id, user_id):
+        return await self._write(user_id).delete_project(project_id, user_id)
+
+    async def get_tasks_json(self, user_id, **options):
+        return await self._read(user_id).get_tasks_json(user_id, **options)
+
+    async def search_tasks_json(self, user_id, q, **options):
+        return await self._read(user_id).search_tasks_json(user_id, q, **options)
+
+    async def get_task(self, task_id, user_id, include_archived=False):
+        return await self._read(user_id).get_task(task_id, user_id, include_archived)
+
+    async def create_task(self, task, user_id):
+        return await self._write(user_id).create_task(task, user_id)
+
+    async def update_task(self, task_id, task_update, user_id):
+        return await self._write(user_id).update_task(task_id, task_update, user_id)
+
+    async def delete_task(self, task_id, user_id):
+        return await self._write(user_id).delete_task(task_id, user_id)
+
+    async def create_tasks(self, tasks, user_id, atomic=True):
+        return await self._write(user_id).create_tasks(tasks, user_id, atomic)
+
+    async def update_tasks(self, items, user_id, atomic=True):
+        return await self._write(user_id).update_tasks(items, user_id, atomic)
+
+    async def delete_tasks(self, task_ids, user_id, atomic=True):
+        return await self._write(user_id).delete_tasks(task_ids, user_id, atomic)
+
+    async def get_user_stats(self, user_id, **options):
+        return await self._read(user_id).get_user_stats(user_id, **options)
+
+    async def get_changes(self, user_id, since, limit=DEFAULT_SYNC_LIMIT):
+        return await self._read(user_id).get_changes(user_id, since, limit)
+
+    async def get_entity_version(self, user_id, entity):
+        return await self._read(user_id).get_entity_version(user_id, entity)
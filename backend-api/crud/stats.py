@@ -0,0 +1,101 @@
+from datetime import date, datetime, time, timedelta, timezone
+from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pydantic import TypeAdapter
+from sqlalchemy import select, func, case, cast, and_, tuple_, union_all, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from models.models import Task, ArchivedTask, Category
+from schemas.schemas import UserStats, PriorityStats, CategoryStats, DailyCompletions
+from .cache import cached
+
+DEFAULT_STATS_DAYS = 30
+MAX_STATS_DAYS = 365
+
+USER_STATS = TypeAdapter(UserStats)
+
+
+def _zone(tz: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError) as exc:
+        raise ValueError(f"Unknown time zone: {tz}") from exc
+
+
+def _task_rows(model, user_id: UUID, since: datetime, tz: str, *live):
+    return (
+        select(
+            model.priority,
+            Category.id.label("category_id"),
+            Category.name.label("category_name"),
+            model.is_completed,
+            model.due_date,
+            case((model.completed_at >= since, cast(func.timezone(tz, model.completed_at), Date))).label("day"),
+        )
+        # Tasks of a deleted category count as uncategorized, as they will be
+        # once crud.purge clears their category_id
+        .outerjoin(Category, and_(Category.id == model.category_id, Category.deleted_at.is_(None)))
+        .where(model.user_id == user_id, *live)
+    )
+
+
+def _stats_query(user_id: UUID, since: datetime, tz: str):
+    """Every figure in one pass: GROUPING SETS yields the totals row, then one
+    row per priority, per category and per completion day. Archived tasks
+    count like the completed tasks they are."""
+    tasks = union_all(
+        _task_rows(Task, user_id, since, tz, Task.deleted_at.is_(None)),
+        _task_rows(ArchivedTask, user_id, since, tz),
+    ).subquery()
+    t = tasks.c
+    return select(
+        func.grouping(t.priority).label("by_priority"),
+        func.grouping(t.category_id).label("by_category"),
+        func.grouping(t.day).label("by_day"),
+        t.priority,
+        t.category_id,
+        t.category_name,
+        t.day,
+        func.count().label("total"),
+        func.count().filter(t.is_completed).label("completed"),
+        func.count().filter(and_(~t.is_completed, t.due_date < func.now())).label("overdue"),
+    ).group_by(
+        func.grouping_sets(tuple_(), t.priority, tuple_(t.category_id, t.category_name), t.day)
+    )
+
+
+async def get_user_stats(db: AsyncSession, user_id: UUID, *, days: int = DEFAULT_STATS_DAYS, tz: str = "UTC") -> UserStats:
+    zone = _zone(tz)
+    today = datetime.now(zone).date()
+    first_day = today - timedelta(days=days - 1)
+    since = datetime.combine(first_day, time(), tzinfo=zone)
+
+    async def load():
+        stats = UserStats(generated_at=datetime.now(timezone.utc))
+        per_day: dict[date, int] = {}
+        for row in (await db.execute(_stats_query(user_id, since, tz))).all():
+            if not row.by_priority:
+                stats.by_priority.append(PriorityStats(priority=row.priority, total=row.total, completed=row.completed, overdue=row.overdue))
+            elif not row.by_category:
+                stats.by_category.append(
+                    CategoryStats(category_id=row.category_id, name=row.category_name, total=row.total, completed=row.completed, overdue=row.overdue)
+                )
+            elif not row.by_day:
+                # The NULL day groups tasks not completed inside the window
+                if row.day is not None:
+                    per_day[row.day] = row.completed
+            else:
+                stats.total, stats.completed, stats.overdue = row.total, row.completed, row.overdue
+        stats.open = stats.total - stats.completed
+        stats.by_priority.sort(key=lambda item: (item.priority is None, item.priority or 0))
+        stats.by_category.sort(key=lambda item: (item.name is None, item.name or ""))
+        stats.completions = [
+            DailyCompletions(day=first_day + timedelta(days=offset), completed=per_day.get(first_day + timedelta(days=offset), 0))
+            for offset in range(days)
+        ]
+        return stats
+
+    # Overdue counts move with the clock, hence the short TTL on top of invalidation
+    return await cached("stats", user_id, (days, tz, today), load, USER_STATS, ttl=settings.stats_cache_ttl_seconds)
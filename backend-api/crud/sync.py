@@ -0,0 +1,155 @@
+import base64
+import binascii
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable
+from uuid import UUID
+
+from sqlalchemy import select, delete, literal_column, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.changes import Subscription
+from core.config import settings
+from models.models import ChangeLog, EntityVersion, Task, ArchivedTask, Project, Category
+from schemas.schemas import SyncResponse, SyncDeleted
+
+DEFAULT_SYNC_LIMIT = 1000
+MAX_SYNC_LIMIT = 5000
+
+# Oldest transaction id that may still commit. Every change_log row below it is
+# final, so positions under this horizon can be handed out without gaps.
+SNAPSHOT_HORIZON = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+# Position after every change of a transaction, used to step past a horizon
+END_OF_TX = 2**63 - 1
+
+# entity_versions row holding the unix time before which the user's tokens are
+# void. cli.rebalance_shards sets it on the database a user moves to, where
+# change_log positions from the old database mean nothing.
+RESYNC_ENTITY = "resync"
+
+# change_log entity -> (SyncResponse field, model)
+ENTITY_MODELS = {"task": ("tasks", Task), "project": ("projects", Project), "category": ("categories", Category)}
+# Archive moves are not logged (see crud.archive), so a row changed and then
+# archived between two syncs is only found in the archive
+ENTITY_ARCHIVES = {"task": ArchivedTask}
+
+
+class SyncTokenExpired(ValueError):
+    """The token predates the change_log retention window; a full resync is needed."""
+
+
+def encode_token(txid: int, change_id: int) -> str:
+    raw = f"{txid}.{change_id}.{int(time.time())}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str, not_before: int = 0) -> tuple[int, int]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        txid, change_id, issued_at = (int(part) for part in base64.urlsafe_b64decode(padded.encode()).decode().split("."))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid sync token") from exc
+    if issued_at < max(time.time() - settings.sync_retention_days * 86400, not_before):
+        raise SyncTokenExpired("Sync token expired, full resync required")
+    return txid, change_id
+
+
+async def get_changes(db: AsyncSession, user_id: UUID, since: str | None, limit: int = DEFAULT_SYNC_LIMIT) -> SyncResponse:
+    resync_at = (
+        select(EntityVersion.version)
+        .where(EntityVersion.user_id == user_id, EntityVersion.entity == RESYNC_ENTITY)
+        .scalar_subquery()
+    )
+    horizon, not_before = (await db.execute(select(SNAPSHOT_HORIZON, resync_at))).one()
+    if since is None:
+        return SyncResponse(token=encode_token(horizon - 1, END_OF_TX), full_resync=True)
+
+    position = decode_token(since, not_before or 0)
+    stmt = (
+        select(ChangeLog.txid, ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+        .where(
+            ChangeLog.user_id == user_id,
+            tuple_(ChangeLog.txid, ChangeLog.id) > tuple_(*position),
+            ChangeLog.txid < horizon,
+        )
+        .order_by(ChangeLog.txid, ChangeLog.id)
+        .limit(limit + 1)
+    )
+    rows = (await db.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        token = encode_token(rows[-1].txid, rows[-1].id)
+    else:
+        # Everything below the horizon has been delivered
+        token = encode_token(*max(position, (horizon - 1, END_OF_TX)))
+
+    # Collapse to the latest operation per entity
+    latest: dict[tuple[str, UUID], str] = {}
+    for row in rows:
+        latest[(row.entity, row.entity_id)] = row.op
+
+    changed, deleted = {}, {}
+    for entity, (field, model) in ENTITY_MODELS.items():
+        upserted = [entity_id for (kind, entity_id), op in latest.items() if kind == entity and op == "upsert"]
+        deleted[field] = [entity_id for (kind, entity_id), op in latest.items() if kind == entity and op == "delete"]
+        if upserted:
+            # A row missing here was deleted by a transaction past the horizon;
+            # its tombstone arrives with a later token.
+            result = await db.execute(
+                select(model).where(model.user_id == user_id, model.id.in_(upserted), model.deleted_at.is_(None))
+            )
+            changed[field] = list(result.scalars().all())
+            missing = set(upserted) - {row.id for row in changed[field]}
+            if missing and entity in ENTITY_ARCHIVES:
+                archive = ENTITY_ARCHIVES[entity]
+                result = await db.execute(select(archive).where(archive.user_id == user_id, archive.id.in_(missing)))
+                changed[field] += result.scalars().all()
+    return SyncResponse(token=token, has_more=has_more, deleted=SyncDeleted(**deleted), **changed)
+
+
+def has_changes(response: SyncResponse) -> bool:
+    deleted = response.deleted
+    return bool(response.tasks or response.projects or response.categories or deleted.tasks or deleted.projects or deleted.categories)
+
+
+async def follow_changes(
+    session_factory: Callable[[], AsyncSession], subscription: Subscription, since: str | None, limit: int
+) -> AsyncIterator[SyncResponse]:
+    """Yield get_changes batches from `since` on, then again whenever the user's
+    data changes. The first batch always goes out so the client has a token.
+
+    Each read takes a pooled session only for its duration; between reads the
+    stream holds no connection.
+    """
+    token, first = since, True
+    while True:
+        async with session_factory() as db:
+            batch = await get_changes(db, subscription.user_id, token, limit)
+        token = batch.token
+        if first or has_changes(batch):
+            yield batch
+        first = False
+        if batch.has_more:
+            continue
+        delivered_txid = decode_token(token)[0]
+        if subscription.notified_txid > delivered_txid:
+            # Committed, but an older open transaction still holds the horizon
+            await subscription.wait(settings.stream_retry_seconds)
+        else:
+            await subscription.wait()
+
+
+async def prune_change_log(db: AsyncSession) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.sync_retention_days)
+    result = await db.execute(delete(ChangeLog).where(ChangeLog.changed_at < cutoff))
+    await db.commit()
+    return result.rowcount
+
+
+async def get_entity_version(db: AsyncSession, user_id: UUID, entity: str) -> int:
+    """Write counter for one of the user's entity types; 0 before the first write."""
+    result = await db.execute(
+        select(EntityVersion.version).where(EntityVersion.user_id == user_id, EntityVersion.entity == entity)
+    )
+    return result.scalar_one_or_none() or 0
@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import select, delete, func, literal, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.tokens import Principal
+from models.models import RevokedToken, User
+
+# Refresh tokens are checked against the database, unlike access tokens
+# (core.tokens): refreshing is rare next to ordinary requests, and a refresh
+# token lives for weeks, far too long to rely on one worker's memory.
+
+# What users.tokens_revoked_at is set to. Tokens carry whole seconds, and one
+# issued in the same second as the revocation (a login right after a password
+# change) stays valid.
+REVOKED_NOW = func.date_trunc("second", func.now())
+
+
+def _timestamp(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+async def spend_refresh_token(db: AsyncSession, principal: Principal) -> bool:
+    """Record the refresh token as used; False if it was used or revoked before.
+
+    One INSERT ... SELECT: the row only goes in while the user exists, is not
+    deleted, and their tokens were not revoked after this one was issued; the
+    primary key lets exactly one of two concurrent refreshes with the same
+    token win. A deleted account's refresh tokens stop working at once, on
+    every worker, though its rows stay until crud.purge runs.
+    """
+    issued_at = _timestamp(principal.issued_at)
+    valid = select(
+        literal(principal.user_id), literal(principal.token_id), literal(_timestamp(principal.expires_at))
+    ).where(
+        User.id == principal.user_id,
+        User.deleted_at.is_(None),
+        or_(User.tokens_revoked_at.is_(None), User.tokens_revoked_at <= issued_at),
+    )
+    stmt = (
+        insert(RevokedToken)
+        .from_select(["user_id", "token_id", "expires_at"], valid)
+        .on_conflict_do_nothing()
+        .returning(RevokedToken.token_id)
+    )
+    spent = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    return spent is not None
+
+
+async def prune_revoked_tokens(db: AsyncSession) -> int:
+    """Drop revocations of tokens that have expired since; returns how many."""
+    result = await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < func.now()))
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from contextlib import AbstractAsyncContextManager
+from typing import Callable
+from uuid import UUID
+
+from core.config import settings
+from schemas.schemas import TaskBatchUpdateItem, TaskUpdate
+from .repository import Repository
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Coalesces queued task updates per user and writes them as one batch.
+
+    Updates for the same task merge field by field, later values winning.
+    A user's buffer is written once write_behind_flush_ms has passed since its
+    first queued update, or as soon as it holds write_behind_max_ops updates.
+    Anything else the user does calls flush() first, so reads see every
+    acknowledged update and later writes land after it. The buffer lives in
+    this worker only, so that guarantee holds for requests served by the
+    same worker.
+    """
+
+    def __init__(self, open_repository: Callable[[], AbstractAsyncContextManager[Repository]]):
+        self._open_repository = open_repository
+        self._pending: dict[UUID, dict[UUID, dict]] = {}
+        self._ops: dict[UUID, int] = {}
+        self._timers: dict[UUID, asyncio.TimerHandle] = {}
+        # user -> [lock, flushes using it]: serializes a user's flushes so
+        # batches commit in queue order
+        self._locks: dict[UUID, list] = {}
+        self._tasks: set[asyncio.Task] = set()
+        # Consecutive failed writes per user, for backoff and giving up
+        self._attempts: dict[UUID, int] = {}
+        self._closed = False
+        self._stats = {"queued": 0, "flushes": 0, "written": 0, "not_found": 0, "failed": 0, "errors": 0, "dropped": 0}
+
+    def submit(self, user_id: UUID, task_id: UUID, task_update: TaskUpdate) -> None:
+        if self._closed:
+            raise RuntimeError("Write-behind buffer is closed")
+        fields = task_update.model_dump(exclude_unset=True)
+        self._pending.setdefault(user_id, {}).setdefault(task_id, {}).update(fields)
+        self._ops[user_id] = self._ops.get(user_id, 0) + 1
+        self._stats["queued"] += 1
+        if self._ops[user_id] >= settings.write_behind_max_ops:
+            self._schedule(user_id, 0)
+        elif user_id not in self._timers:
+            self._schedule(user_id, settings.write_behind_flush_ms / 1000)
+
+    def _schedule(self, user_id: UUID, delay: float) -> None:
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[user_id] = asyncio.get_running_loop().call_later(delay, self._start_flush, user_id)
+
+    def _start_flush(self, user_id: UUID) -> None:
+        self._timers.pop(user_id, None)
+        task = asyncio.create_task(self._background_flush(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _background_flush(self, user_id: UUID) -> None:
+        try:
+            await self.flush(user_id)
+        except Exception:
+            # Re-queued by flush; the next read or timer tries again
+            logger.exception("write-behind flush for user %s failed", user_id)
+
+    async def flush(self, user_id: UUID) -> bool:
+        """Write the user's queued updates and wait until they are committed.
+        True if this call wrote any."""
+        if user_id not in self._pending and user_id not in self._locks:
+            return False
+        entry = self._locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                batch = self._pending.pop(user_id, None)
+                self._ops.pop(user_id, None)
+                timer = self._timers.pop(user_id, None)
+                if timer is not None:
+                    timer.cancel()
+                if batch:
+                    await self._write(user_id, batch)
+                return bool(batch)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user_id]
+
+    async def _write(self, user_id: UUID, batch: dict[UUID, dict]) -> None:
+        items = [TaskBatchUpdateItem(id=task_id, **fields) for task_id, fields in batch.items()]
+        try:
+            async with self._open_repository() as repo:
+                result = await repo.update_tasks(items, user_id, atomic=False)
+        except Exception:
+            self._stats["errors"] += 1
+            self._requeue(user_id, batch)
+            raise
+        self._attempts.pop(user_id, None)
+        self._stats["flushes"] += 1
+        for item in result.results:
+            if item.status == "ok":
+                self._stats["written"] += 1
+            else:
+                self._stats["not_found" if item.status == "not_found" else "failed"] += 1
+                logger.warning("write-behind update of task %s for user %s: %s", item.id, user_id, item.error or item.status)
+
+    def _requeue(self, user_id: UUID, batch: dict[UUID, dict]) -> None:
+        attempts = self._attempts[user_id] = self._attempts.get(user_id, 0) + 1
+        if attempts > settings.write_behind_max_retries:
+            self._attempts.pop(user_id)
+            self._stats["dropped"] += len(batch)
+            logger.error("write-behind dropped %d task updates for user %s after %d attempts", len(batch), user_id, attempts)
+            return
+        # Updates queued while the write was failing are newer and win
+        pending = self._pending.setdefault(user_id, {})
+        for task_id, fields in batch.items():
+            pending[task_id] = {**fields, **pending.get(task_id, {})}
+        if not self._closed:
+            self._schedule(user_id, min(settings.write_behind_flush_ms / 1000 * 2**attempts, 5.0))
+
+    async def close(self) -> None:
+        """Stop accepting updates and write everything still queued (shutdown)."""
+        self._closed = True
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for user_id in list(self._pending):
+            try:
+                await self.flush(user_id)
+            except Exception:
+                lost = len(self._pending.pop(user_id, {}))
+                logger.exception("write-behind lost %d task updates for user %s at shutdown", lost, user_id)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": int(settings.write_behind_enabled),
+            "pending_users": len(self._pending),
+            "pending_tasks": sum(len(tasks) for tasks in self._pending.values()),
+            **self._stats,
+        }
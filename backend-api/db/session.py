@@ -1,11 +1,409 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, nullcontext
+
+from fastapi import Request
+from sqlalchemy import exc, make_url, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from core.config import settings
+from core.metrics import DB_POOL_WAIT_SECONDS, instrument_engine
+from crud.cache import reading_replica
+from crud.memory import MemoryRepository
+from crud.repository import Repository, ShardedRepository, ShardMoving, SqlRepository, UnsupportedOperation
+from crud.writebehind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+# Requests that can't write: they leave the user's replica reads alone
+READ_METHODS = {"GET", "HEAD"}
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection.
+
+    Only checkouts that found no idle connection and no free overflow slot
+    count as waits; the others are served (or connected) straight away.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _must_wait(self) -> bool:
+        return self._pool.empty() and -1 < self._max_overflow <= self._overflow
+
+    def _do_get(self):
+        if not self._must_wait():
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            DB_POOL_WAIT_SECONDS.observe(waited)
+
+
+def build_engine(url: str):
+    connect_args = {}
+    if settings.db_statement_timeout_ms is not None:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+
+    if settings.db_server_side_pooler:
+        # Transaction-mode poolers hand each transaction to any backend, so
+        # named prepared statements must be unique and never cached.
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        return create_async_engine(url, echo=settings.db_echo, poolclass=NullPool, connect_args=connect_args)
+
+    connect_args["prepared_statement_cache_size"] = settings.db_prepared_statement_cache_size
+    return create_async_engine(
+        url,
+        echo=settings.db_echo,
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+
+
+def pool_stats(engine) -> dict:
+    if engine is None:
+        return {"pool": None}
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            wait_count=pool.wait_count,
+            wait_seconds_total=round(pool.wait_seconds_total, 6),
+            wait_seconds_max=round(pool.wait_seconds_max, 6),
+            timeouts=pool.timeouts,
+        )
+    return stats
+
+
+def listen_dsn(url: str | None = None) -> str:
+    """Plain asyncpg DSN for a change listener's dedicated connection."""
+    url = make_url(url or settings.stream_listen_url or settings.database_url)
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def shard_bucket(user_id: uuid.UUID, buckets: int | None = None) -> int:
+    """Stable bucket of a user id: the unit cli.rebalance_shards moves between shards."""
+    digest = hashlib.blake2b(user_id.bytes, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % (buckets or settings.shard_buckets)
+
+
+# How far a replica is behind: 0 once it has replayed everything the primary
+# had written when the check began, otherwise the age of the last transaction
+# it replayed (an overestimate after an idle spell, which only errs towards
+# the primary). NULL when it is not a standby or has replayed nothing yet.
+REPLICA_LAG = text("""
+    SELECT CASE
+        WHEN pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn) THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaSet:
+    """Streaming replicas of one database, for handlers that only read.
+
+    check() measures each replica's lag against the primary. session_factory()
+    hands out the replicas that answered and are at most
+    replica_max_lag_seconds behind, round-robin, and the primary's factory
+    when there are none. A replica whose connection fails during a request is
+    skipped until a later check finds it healthy.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.urls = list(urls)
+        self.engines = [build_engine(url) for url in self.urls]
+        self.sessions = [
+            sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, info={"replica": (self, index)})
+            for index, engine in enumerate(self.engines)
+        ]
+        # Seconds behind the primary; None until the first check and while down
+        self.lag: list[float | None] = [None] * len(self.urls)
+        self._turn = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.ejections = 0
+        self.check_failures = 0
+
+    def _name(self, index: int) -> str:
+        return make_url(self.urls[index]).render_as_string(hide_password=True)
+
+    def _healthy(self, lag: float | None) -> bool:
+        return lag is not None and lag <= settings.replica_max_lag_seconds
+
+    def healthy(self) -> list[int]:
+        return [index for index, lag in enumerate(self.lag) if self._healthy(lag)]
+
+    def session_factory(self, primary):
+        """A healthy replica's session factory, or `primary`."""
+        healthy = self.healthy()
+        if not healthy:
+            self.primary_reads += 1
+            return primary
+        self._turn += 1
+        self.replica_reads += 1
+        return self.sessions[healthy[self._turn % len(healthy)]]
+
+    def eject(self, index: int) -> None:
+        if self._healthy(self.lag[index]):
+            logger.warning("replica %s ejected: connection failed during a request", self._name(index))
+            self.ejections += 1
+        self.lag[index] = None
+
+    async def _measure(self, index: int, primary_lsn: str) -> float | None:
+        async with self.sessions[index]() as db:
+            lag = (await db.execute(REPLICA_LAG, {"primary_lsn": primary_lsn})).scalar_one()
+        return None if lag is None else float(lag)
+
+    async def check(self, primary) -> None:
+        """Measure every replica against the primary's current WAL position."""
+        async with primary() as db:
+            primary_lsn = (await db.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar_one()
+        for index in range(len(self.urls)):
+            try:
+                lag = await asyncio.wait_for(self._measure(index, primary_lsn), settings.replica_check_interval_seconds)
+                problem = "is not a streaming standby" if lag is None else f"is {lag:.1f}s behind"
+            except Exception as error:
+                self.check_failures += 1
+                lag, problem = None, f"failed its health check: {error!r}"
+            # Log changes of state only; checks run every second or so
+            if self._healthy(lag) != self._healthy(self.lag[index]):
+                if self._healthy(lag):
+                    logger.info("replica %s healthy, %.1fs behind", self._name(index), lag)
+                else:
+                    logger.warning("replica %s %s; reading from the primary instead", self._name(index), problem)
+            self.lag[index] = lag
+
+    def stats(self) -> dict:
+        stats = {
+            "replicas": len(self.urls),
+            "healthy": len(self.healthy()),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "ejections": self.ejections,
+            "check_failures": self.check_failures,
+        }
+        stats.update({f"lag_seconds_{index}": lag for index, lag in enumerate(self.lag) if lag is not None})
+        return stats
 
-engine = create_async_engine(settings.database_url, echo=True)
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+class RecentWriters:
+    """Users who wrote within the last `window` seconds. Their reads stay on
+    the primary, so they see their own writes whatever the replicas' lag."""
 
-async def get_db() -> AsyncSession:
-    async with async_session() as session:
+    def __init__(self, window: float):
+        self.window = window
+        self._until: OrderedDict[uuid.UUID, float] = OrderedDict()
+
+    def add(self, user_id: uuid.UUID) -> None:
+        now = time.monotonic()
+        # Kept in the order of their last write, so the expired ones are first
+        while self._until and next(iter(self._until.values())) <= now:
+            self._until.popitem(last=False)
+        self._until[user_id] = now + self.window
+        self._until.move_to_end(user_id)
+
+    def __contains__(self, user_id: uuid.UUID) -> bool:
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+
+class ShardRouter:
+    """An engine and session factory per SHARD_URLS entry, and which one holds a user."""
+
+    def __init__(
+        self,
+        urls: list[str],
+        bucket_map: dict[int, int] | None = None,
+        frozen_buckets=(),
+        replica_urls: list[list[str]] = (),
+    ):
+        self.urls = list(urls)
+        self.bucket_map = dict(bucket_map or {})
+        self.frozen_buckets = set(frozen_buckets)
+        misplaced = {bucket: shard for bucket, shard in self.bucket_map.items() if not 0 <= shard < len(self.urls)}
+        if misplaced:
+            raise ValueError(f"SHARD_BUCKET_MAP names shards that don't exist: {misplaced}")
+        if len(replica_urls) > len(self.urls):
+            raise ValueError(f"SHARD_REPLICA_URLS lists replicas for {len(replica_urls)} shards, but there are {len(self.urls)}")
+        self.engines = [build_engine(url) for url in self.urls]
+        self.sessions = [sessionmaker(engine, class_=AsyncSession, expire_on_commit=False) for engine in self.engines]
+        replica_urls = list(replica_urls) + [[]] * (len(self.urls) - len(replica_urls))
+        self.replicas = [ReplicaSet(shard_replicas) for shard_replicas in replica_urls]
+
+    def read_sessions(self, shard: int):
+        """Session factory for reads on `shard`: one of its replicas if healthy."""
+        return self.replicas[shard].session_factory(self.sessions[shard])
+
+    def shard_of_bucket(self, bucket: int) -> int:
+        return self.bucket_map.get(bucket, bucket % len(self.urls))
+
+    def shard_of(self, user_id: uuid.UUID) -> int:
+        return self.shard_of_bucket(shard_bucket(user_id))
+
+    def is_frozen(self, user_id: uuid.UUID) -> bool:
+        return shard_bucket(user_id) in self.frozen_buckets
+
+    def check_writable(self, user_id: uuid.UUID) -> None:
+        if self.is_frozen(user_id):
+            raise ShardMoving("This account is being moved, retry shortly")
+
+
+shards = None
+replicas = ReplicaSet([])
+if settings.storage_backend == "memory":
+    # No database at all; see session_for
+    engine = async_session = None
+    memory_repository = MemoryRepository()
+elif settings.shard_urls:
+    shards = ShardRouter(settings.shard_urls, settings.shard_bucket_map, settings.shard_frozen_buckets, settings.shard_replica_urls)
+    for shard_engine in shards.engines:
+        instrument_engine(shard_engine)
+    for replica_set in shards.replicas:
+        for replica_engine in replica_set.engines:
+            instrument_engine(replica_engine)
+    # No default database: sessions come from session_for(user_id)
+    engine = async_session = None
+else:
+    engine = build_engine(settings.database_url)
+    instrument_engine(engine)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    replicas = ReplicaSet(settings.replica_urls)
+    for replica_engine in replicas.engines:
+        instrument_engine(replica_engine)
+
+recent_writers = RecentWriters(settings.replica_sticky_seconds)
+
+
+def session_for(user_id: uuid.UUID):
+    """Session factory for the database holding the user's rows."""
+    if shards is not None:
+        return shards.sessions[shards.shard_of(user_id)]
+    if async_session is None:
+        raise UnsupportedOperation("This endpoint requires STORAGE_BACKEND=sql")
+    return async_session
+
+
+def all_sessions() -> list:
+    """A session factory per database, for jobs that visit every one; empty
+    with the memory backend."""
+    if shards is not None:
+        return shards.sessions
+    return [async_session] if async_session is not None else []
+
+
+def all_engines() -> list:
+    if shards is not None:
+        return shards.engines
+    return [engine] if engine is not None else []
+
+
+def replica_sets() -> list[tuple]:
+    """(primary session factory, ReplicaSet) for every database with replicas."""
+    if shards is not None:
+        pairs = zip(shards.sessions, shards.replicas)
+    else:
+        pairs = [(async_session, replicas)] if async_session is not None else []
+    return [(primary, replica_set) for primary, replica_set in pairs if replica_set.urls]
+
+
+def listen_dsns() -> list[str]:
+    # With shards, each one is listened to directly
+    if shards is not None:
+        return [listen_dsn(url) for url in shards.urls]
+    return [listen_dsn()] if async_session is not None else []
+
+
+async def get_user_db(user_id: uuid.UUID, request: Request) -> AsyncSession:
+    """Session on the database holding `user_id` (the path parameter). Writes
+    to a frozen bucket are refused here as in ShardedRepository, or they would
+    land on the source shard after the move copied it."""
+    if request.method not in READ_METHODS:
+        if shards is not None:
+            shards.check_writable(user_id)
+        recent_writers.add(user_id)
+    async with session_for(user_id)() as session:
         yield session
+
+
+def _eject_failed_replicas(sessions: list[AsyncSession], error: Exception) -> None:
+    # Lost or refused connections only: a failed query says nothing about the replica
+    if isinstance(error, exc.DBAPIError):
+        down = error.connection_invalidated or isinstance(error, exc.InterfaceError)
+    else:
+        down = isinstance(error, (OSError, asyncio.TimeoutError))
+    if not down:
+        return
+    for session in sessions:
+        replica = session.info.get("replica")
+        if replica is not None:
+            replica_set, index = replica
+            replica_set.eject(index)
+
+
+@asynccontextmanager
+async def open_repository(reader: uuid.UUID | None = None):
+    """Repository on the primary; with `reader`, one for a handler that only
+    reads that user's rows, served by a replica unless the user wrote within
+    replica_sticky_seconds."""
+    read_only = reader is not None and reader not in recent_writers
+    if shards is not None:
+        repository = ShardedRepository(shards, read_only=read_only)
+        from_replica = read_only and any(replica_set.urls for replica_set in shards.replicas)
+        try:
+            with reading_replica() if from_replica else nullcontext():
+                yield repository
+        except Exception as error:
+            _eject_failed_replicas(repository.sessions(), error)
+            raise
+        finally:
+            await repository.close()
+        return
+    if async_session is None:
+        yield memory_repository
+        return
+    session_factory = replicas.session_factory(async_session) if read_only else async_session
+    async with session_factory() as session:
+        try:
+            with reading_replica() if session_factory is not async_session else nullcontext():
+                yield SqlRepository(session)
+        except Exception as error:
+            _eject_failed_replicas([session], error)
+            raise
+
+
+async def get_repository() -> Repository:
+    async with open_repository() as repo:
+        yield repo
+
+
+write_behind = WriteBehindBuffer(open_repository)
@@ -1,15 +1,138 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from api.api_v1 import api_router
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, PlainTextResponse
+from core.background import start_periodic, stop_all
+from core.changes import hub
+from core.config import settings
+from core.metrics import MetricsMiddleware, register_stats, render
+from core.security import hasher_stats, shutdown_hasher
+from core.tokens import auth_stats
+from crud.archive import archive_completed_tasks
+from crud.cache import cache_stats
+from crud.counters import reconcile_counters
+from crud.purge import purge_deleted
+from crud.repository import ShardMoving
+from crud.sync import prune_change_log
+from crud.tokens import prune_revoked_tokens
+from db.session import all_sessions, engine, listen_dsns, pool_stats, replica_sets, replicas, shards, write_behind
 
-app = FastAPI(title="ToDo List API", version="0.0.1")
 
+# Maintenance jobs visit every database (one, or each shard in turn)
+async def prune_sync_log():
+    for session in all_sessions():
+        async with session() as db:
+            await prune_change_log(db)
+
+
+async def prune_token_revocations():
+    for session in all_sessions():
+        async with session() as db:
+            await prune_revoked_tokens(db)
+
+
+async def reconcile_task_counters():
+    for session in all_sessions():
+        async with session() as db:
+            await reconcile_counters(db)
+
+
+async def archive_tasks():
+    for session in all_sessions():
+        async with session() as db:
+            await archive_completed_tasks(db, settings.archive_after_days, settings.archive_batch_size)
+
+
+async def purge_deleted_rows():
+    for session in all_sessions():
+        async with session() as db:
+            await purge_deleted(db)
+
+
+async def check_replicas():
+    for primary, replica_set in replica_sets():
+        await replica_set.check(primary)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = []
+    if all_sessions():
+        background += [
+            start_periodic("prune-change-log", settings.sync_prune_interval_seconds, prune_sync_log),
+            start_periodic("prune-revoked-tokens", settings.revoked_token_prune_interval_seconds, prune_token_revocations),
+            start_periodic("reconcile-counters", settings.counter_reconcile_interval_seconds, reconcile_task_counters),
+            start_periodic("archive-tasks", settings.archive_interval_seconds, archive_tasks),
+            start_periodic("purge-deleted", settings.purge_interval_seconds, purge_deleted_rows),
+        ]
+        if replica_sets():
+            # Until the first check, reads go to the primary
+            background.append(start_periodic("check-replicas", settings.replica_check_interval_seconds, check_replicas))
+        # Wakes /sync/stream and /sync/ws clients of this worker
+        background += [
+            asyncio.create_task(hub.listen(dsn), name=f"change-listener-{index}") for index, dsn in enumerate(listen_dsns())
+        ]
+    yield
+    # Queued task updates were acknowledged to clients; write them before exiting
+    await write_behind.close()
+    await stop_all(background)
+    shutdown_hasher()
+
+
+app = FastAPI(title="ToDo List API", version="0.0.1", lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 app.include_router(api_router, prefix="/api/v1")
 
+
+@app.exception_handler(ShardMoving)
+async def shard_moving(request: Request, exc: ShardMoving):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+
+POOL_COUNTERS = {"wait_count", "wait_seconds_total", "timeouts"}
+REPLICA_COUNTERS = {"replica_reads", "primary_reads", "ejections", "check_failures"}
+if shards is None:
+    register_stats("db_pool", lambda: pool_stats(engine), counters=POOL_COUNTERS)
+    if replicas.urls:
+        register_stats("db_replicas", replicas.stats, counters=REPLICA_COUNTERS)
+    for index, replica_engine in enumerate(replicas.engines):
+        register_stats(f"db_pool_replica{index}", lambda replica_engine=replica_engine: pool_stats(replica_engine), counters=POOL_COUNTERS)
+else:
+    for index, shard_engine in enumerate(shards.engines):
+        register_stats(f"db_pool_shard{index}", lambda shard_engine=shard_engine: pool_stats(shard_engine), counters=POOL_COUNTERS)
+        if shards.replicas[index].urls:
+            register_stats(f"db_replicas_shard{index}", shards.replicas[index].stats, counters=REPLICA_COUNTERS)
+        for replica, replica_engine in enumerate(shards.replicas[index].engines):
+            register_stats(f"db_pool_shard{index}_replica{replica}", lambda replica_engine=replica_engine: pool_stats(replica_engine), counters=POOL_COUNTERS)
+register_stats("password_hasher", hasher_stats, counters={"completed", "rejected", "queue_wait_seconds_total", "hash_seconds_total"})
+register_stats("cache", cache_stats, counters={"hits", "misses", "evictions", "expirations", "invalidations", "errors", "loads", "coalesced"})
+register_stats("change_stream", hub.stats, counters={"notifications", "wakeups", "malformed", "reconnects", "overflows"})
+register_stats("write_behind", write_behind.stats, counters={"queued", "flushes", "written", "not_found", "failed", "errors", "dropped"})
+register_stats("auth", auth_stats, counters={"verified", "cache_hits", "rejected"})
+
 @app.get("/")
 def read_root():
     return RedirectResponse(url="/docs")
 
 @app.get("/version")
 def get_version():
-    return {"version": app.version}
\ No newline at end of file
+    return {"version": app.version}
+
+@app.get("/health")
+def get_health():
+    return {
+        "status": "ok",
+        "db_pool": pool_stats(engine),
+        "db_replicas": replicas.stats(),
+        "password_hasher": hasher_stats(),
+        "cache": cache_stats(),
+        "auth": auth_stats(),
+        "change_stream": hub.stats(),
+        "write_behind": write_behind.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
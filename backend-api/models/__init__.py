@@ -1 +1 @@
-from .models import Base, User, Category, Task
\ No newline at end of file
+from .models import Base, User, Category, Task, Project, ChangeLog, EntityVersion
\ No newline at end of file
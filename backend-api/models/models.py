@@ -1,10 +1,25 @@
-from sqlalchemy import String, Integer, Boolean, Text, TIMESTAMP, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, BigInteger, Boolean, Text, TIMESTAMP, ForeignKey, ForeignKeyConstraint, Index, Computed, text, select, func
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, column_property
 import uuid
 from datetime import datetime
 
 
+# Text search configuration for tasks.search_vector (stemming and stop words)
+SEARCH_CONFIG = "english"
+
+# categories, projects and tasks are hash-partitioned by user_id (see Alembic),
+# so every query scoped to one user touches a single partition. Unique keys on
+# a partitioned table must include user_id: the primary keys are (id, user_id)
+# and task references to categories/projects carry the user id along.
+BY_USER = {"postgresql_partition_by": "HASH (user_id)"}
+
+# Deletes set deleted_at and return; reads skip such rows, and crud.purge
+# removes them (and clears or removes what depends on them) in the background
+LIVE = text("deleted_at IS NULL")
+DELETED = text("deleted_at IS NOT NULL")
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -13,50 +28,88 @@ class User(Base):
     __tablename__ = "users"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    email: Mapped[str] = mapped_column(String(255), nullable=False)
     password_hash: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    deleted_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    # Refresh tokens issued before this are refused (see crud.tokens)
+    tokens_revoked_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
 
     # Relationships
     categories: Mapped[list["Category"]] = relationship("Category", back_populates="user")
     tasks: Mapped[list["Task"]] = relationship("Task", back_populates="user")
     projects: Mapped[list["Project"]] = relationship("Project", back_populates="user")
 
+    __table_args__ = (
+        # A deleted account's email is free again before the purge runs
+        Index("uq_users_email_live", "email", unique=True, postgresql_where=LIVE),
+        Index("ix_users_deleted_at", "deleted_at", postgresql_where=DELETED),
+    )
+
 
 class Category(Base):
     __tablename__ = "categories"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     name: Mapped[str] = mapped_column(String(50), nullable=False)
+    # Maintained by the task_counters() trigger (see Alembic)
+    task_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    completed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    deleted_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="categories")
-    tasks: Mapped[list["Task"]] = relationship("Task", back_populates="category")
+    tasks: Mapped[list["Task"]] = relationship(
+        "Task", back_populates="category", primaryjoin="Category.id == Task.category_id", foreign_keys="Task.category_id"
+    )
+
+    # Keyset pagination indexes: (user_id, sort_key, id)
+    __table_args__ = (
+        Index("ix_categories_user_id_name_id", "user_id", "name", "id"),
+        Index("ix_categories_deleted_at", "deleted_at", postgresql_where=DELETED),
+        BY_USER,
+    )
 
 
 class Project(Base):
     __tablename__ = "projects"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     create_day: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=datetime.utcnow)
     due_date: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    # Maintained by the task_counters() trigger (see Alembic); progress is
+    # completed_count as a percentage of task_count
+    task_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    completed_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     progress: Mapped[int] = mapped_column(Integer, default=0)
+    deleted_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="projects")
-    tasks: Mapped[list["Task"]] = relationship("Task", back_populates="project")
+    tasks: Mapped[list["Task"]] = relationship(
+        "Task", back_populates="project", primaryjoin="Project.id == Task.project_id", foreign_keys="Task.project_id"
+    )
+
+    # Keyset pagination indexes: (user_id, sort_key, id)
+    __table_args__ = (
+        Index("ix_projects_user_id_create_day_id", "user_id", "create_day", "id"),
+        Index("ix_projects_user_id_due_date_id", "user_id", "due_date", "id"),
+        Index("ix_projects_user_id_name_id", "user_id", "name", "id"),
+        Index("ix_projects_deleted_at", "deleted_at", postgresql_where=DELETED),
+        BY_USER,
+    )
 
 
 class Task(Base):
     __tablename__ = "tasks"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    category_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
-    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    category_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=True)
     is_completed: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -64,8 +117,182 @@ class Task(Base):
     priority: Mapped[int] = mapped_column(Integer, default=0)
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    # Set/cleared by the set_completed_at() trigger when is_completed flips
+    completed_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    deleted_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    # Full-text document, title weighted above description. Generated by Postgres;
+    # deferred so ordinary reads never fetch it.
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="tasks")
-    category: Mapped["Category"] = relationship("Category", back_populates="tasks")
-    project: Mapped["Project"] = relationship("Project", back_populates="tasks")
\ No newline at end of file
+    category: Mapped["Category"] = relationship(
+        "Category", back_populates="tasks", primaryjoin="Category.id == Task.category_id", foreign_keys=category_id
+    )
+    project: Mapped["Project"] = relationship(
+        "Project", back_populates="tasks", primaryjoin="Project.id == Task.project_id", foreign_keys=project_id
+    )
+
+    # Keyset pagination indexes: (user_id, sort_key, id), plus the filter columns
+    __table_args__ = (
+        # Deleting a category or project only clears the task's reference to it
+        ForeignKeyConstraint(["user_id", "category_id"], ["categories.user_id", "categories.id"], ondelete="SET NULL (category_id)"),
+        ForeignKeyConstraint(["user_id", "project_id"], ["projects.user_id", "projects.id"], ondelete="SET NULL (project_id)"),
+        Index("ix_tasks_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_tasks_user_id_updated_at_id", "user_id", "updated_at", "id"),
+        Index("ix_tasks_user_id_due_date_id", "user_id", "due_date", "id"),
+        Index("ix_tasks_user_id_priority_id", "user_id", "priority", "id"),
+        Index("ix_tasks_user_id_category_id", "user_id", "category_id"),
+        Index("ix_tasks_user_id_project_id", "user_id", "project_id"),
+        # Overdue counts only visit open, live tasks, without leaving the index
+        Index("ix_tasks_project_id_due_date_open", "project_id", "due_date", postgresql_where=text("NOT is_completed AND deleted_at IS NULL")),
+        Index("ix_tasks_category_id_due_date_open", "category_id", "due_date", postgresql_where=text("NOT is_completed AND deleted_at IS NULL")),
+        # The archive job's scan for old completed tasks
+        Index("ix_tasks_completed_at_done", "completed_at", postgresql_where=text("is_completed")),
+        Index("ix_tasks_deleted_at", "deleted_at", postgresql_where=DELETED),
+        # Search: btree_gin puts user_id in the same GIN index, so lookups never
+        # leave the user's own tasks
+        Index("ix_tasks_user_id_search_vector", "user_id", "search_vector", postgresql_using="gin"),
+        Index("ix_tasks_user_id_title_trgm", "user_id", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        # Covers the stats aggregate, so it runs as an index-only scan
+        Index(
+            "ix_tasks_user_id_stats",
+            "user_id",
+            postgresql_include=["priority", "category_id", "is_completed", "due_date", "completed_at", "deleted_at"],
+        ),
+        BY_USER,
+    )
+
+
+class ArchivedTask(Base):
+    """Completed tasks moved out of `tasks` by the archive job (crud.archive).
+
+    Same columns as Task minus the search document. Range-partitioned by
+    completed_at, one partition per month created by the job as it goes, so
+    `tasks` and its indexes only hold live work. Read through
+    `include_archived=true` on the task list and item endpoints.
+    """
+    __tablename__ = "tasks_archive"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    category_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    project_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    description: Mapped[str] = mapped_column(Text, nullable=True)
+    is_completed: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    due_date: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    priority: Mapped[int] = mapped_column(Integer)
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True))
+    # The partition key, so part of the primary key
+    completed_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True)
+    archived_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+    # Same keyset indexes as tasks, so merged listings stay index-ordered
+    __table_args__ = (
+        ForeignKeyConstraint(["user_id", "category_id"], ["categories.user_id", "categories.id"], ondelete="SET NULL (category_id)"),
+        ForeignKeyConstraint(["user_id", "project_id"], ["projects.user_id", "projects.id"], ondelete="SET NULL (project_id)"),
+        Index("ix_tasks_archive_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_tasks_archive_user_id_updated_at_id", "user_id", "updated_at", "id"),
+        Index("ix_tasks_archive_user_id_due_date_id", "user_id", "due_date", "id"),
+        Index("ix_tasks_archive_user_id_priority_id", "user_id", "priority", "id"),
+        # For ON DELETE SET NULL from categories and projects
+        Index("ix_tasks_archive_category_id", "category_id"),
+        Index("ix_tasks_archive_project_id", "project_id"),
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
+
+
+def _overdue_count(parent, fk):
+    # Depends on the clock, so it is counted at read time rather than stored
+    # (api.etag buckets these ETags by time for the same reason). The user_id
+    # match prunes the lookup to the parent's own tasks partition.
+    return column_property(
+        select(func.count())
+        .where(fk == parent.id, Task.user_id == parent.user_id, ~Task.is_completed, Task.due_date < func.now(), Task.deleted_at.is_(None))
+        .correlate_except(Task)
+        .scalar_subquery()
+    )
+
+
+Category.overdue_count = _overdue_count(Category, Task.category_id)
+Project.overdue_count = _overdue_count(Project, Task.project_id)
+
+
+class ChangeLog(Base):
+    """Row-level change feed for tasks, projects and categories.
+
+    Written by the log_change() trigger (see Alembic), never by the app.
+    `txid` is the writing transaction id; the sync endpoint only hands out rows
+    whose transaction is older than every still-running one, so a token never
+    skips a change that commits late.
+    """
+    __tablename__ = "change_log"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    txid: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=text("pg_current_xact_id()::text::bigint"))
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    entity: Mapped[str] = mapped_column(String(16), nullable=False)
+    entity_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    op: Mapped[str] = mapped_column(String(8), nullable=False)
+    changed_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+    __table_args__ = (
+        Index("ix_change_log_user_id_txid_id", "user_id", "txid", "id"),
+        Index("ix_change_log_changed_at", "changed_at"),
+    )
+
+
+class EntityVersion(Base):
+    """Per-user, per-entity write counter bumped by the log_change() trigger.
+
+    Committed atomically with the rows it counts, so it is a cheap validator
+    for conditional GETs (see api.etag).
+    """
+    __tablename__ = "entity_versions"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    entity: Mapped[str] = mapped_column(String(16), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class UserEmail(Base):
+    """Email -> user directory for sharded storage (crud.repository.ShardedRepository).
+
+    Kept on the first shard only: its primary key makes an email unique across
+    every shard, as uq_users_email_live does inside one database. A claim is
+    made before the user row is inserted and released when the user is
+    deleted or changes email.
+    """
+    __tablename__ = "user_emails"
+
+    email: Mapped[str] = mapped_column(String(255), primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    claimed_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+
+class RevokedToken(Base):
+    """Refresh tokens that were used or logged out, keyed by their jti.
+
+    Refreshing inserts the token's row, so a token works exactly once on
+    every worker and across restarts. Rows go once the token would have
+    expired anyway (crud.tokens.prune_revoked_tokens).
+    """
+    __tablename__ = "revoked_tokens"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    token_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
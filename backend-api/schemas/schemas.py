@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from datetime import date, datetime
 from typing import Optional
 from uuid import UUID
 
@@ -25,6 +25,18 @@ class User(UserBase):
         from_attributes = True
 
 
+class TokenPair(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+    # Seconds until the access token expires
+    expires_in: int
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class CategoryBase(BaseModel):
     name: str
 
@@ -40,6 +52,10 @@ class CategoryUpdate(BaseModel):
 class Category(CategoryBase):
     id: UUID
     user_id: UUID
+    # Server-maintained; see the task_counters() trigger
+    task_count: int = 0
+    completed_count: int = 0
+    overdue_count: int = 0
 
     class Config:
         from_attributes = True
@@ -75,24 +91,84 @@ class Task(TaskBase):
     project_id: Optional[UUID] = None
     updated_at: datetime
     created_at: datetime
+    completed_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class TaskSearchResult(Task):
+    # Higher is better; only comparable within one search
+    rank: float
+
+
+MAX_BATCH_SIZE = 500
+
+
+class TaskBatchCreate(BaseModel):
+    items: list[TaskCreate] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    atomic: bool = True
+
+
+class TaskUpdateQueued(BaseModel):
+    # 202 answer to a write-behind update; the change is committed shortly
+    id: UUID
+    status: str = "queued"
+
+
+class TaskBatchUpdateItem(TaskUpdate):
+    id: UUID
+
+
+class TaskBatchUpdate(BaseModel):
+    items: list[TaskBatchUpdateItem] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    atomic: bool = True
+
+    @field_validator("items")
+    @classmethod
+    def unique_ids(cls, items: list[TaskBatchUpdateItem]) -> list[TaskBatchUpdateItem]:
+        if len({item.id for item in items}) != len(items):
+            raise ValueError("each task id may appear only once per batch")
+        return items
+
+
+class TaskBatchDelete(BaseModel):
+    ids: list[UUID] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+    atomic: bool = True
+
+    @field_validator("ids")
+    @classmethod
+    def unique_ids(cls, ids: list[UUID]) -> list[UUID]:
+        if len(set(ids)) != len(ids):
+            raise ValueError("each task id may appear only once per batch")
+        return ids
+
+
+class TaskBatchItemResult(BaseModel):
+    index: int
+    id: Optional[UUID] = None
+    # "ok", "not_found", "error", or "rolled_back" when an atomic batch failed
+    status: str
+    task: Optional[Task] = None
+    error: Optional[str] = None
+
+
+class TaskBatchResult(BaseModel):
+    committed: bool
+    results: list[TaskBatchItemResult]
+
+
 class ProjectBase(BaseModel):
     name: str
 
 
 class ProjectCreate(ProjectBase):
     due_date: Optional[datetime] = None
-    progress: int = 0
 
 
 class ProjectUpdate(BaseModel):
     name: Optional[str] = None
     due_date: Optional[datetime] = None
-    progress: Optional[int] = None
 
 
 class Project(ProjectBase):
@@ -100,7 +176,91 @@ class Project(ProjectBase):
     user_id: UUID
     create_day: datetime
     due_date: Optional[datetime] = None
+    # Server-maintained from the project's tasks; see the task_counters() trigger
     progress: int
+    task_count: int = 0
+    completed_count: int = 0
+    overdue_count: int = 0
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class SyncDeleted(BaseModel):
+    tasks: list[UUID] = []
+    projects: list[UUID] = []
+    categories: list[UUID] = []
+
+
+class SyncResponse(BaseModel):
+    # Pass back as `since` on the next call
+    token: str
+    has_more: bool = False
+    # Set when no usable `since` was given: reload the full lists, then keep polling with `token`
+    full_resync: bool = False
+    tasks: list[Task] = []
+    projects: list[Project] = []
+    categories: list[Category] = []
+    deleted: SyncDeleted = SyncDeleted()
+
+
+
+class TaskImportRow(TaskCreate):
+    """One imported task. Categories and projects may be given by id or by name."""
+
+    # Optional so re-running an import with the same ids skips rows already loaded
+    id: Optional[UUID] = None
+    category: Optional[str] = Field(None, max_length=50)
+    project: Optional[str] = Field(None, max_length=255)
+    # Kept for completed tasks so history survives the migration; defaults to now
+    completed_at: Optional[datetime] = None
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    rows_read: int = 0
+    rows_imported: int = 0
+    # Rows whose id already existed
+    rows_skipped: int = 0
+    rows_failed: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    errors: list[ImportRowError] = []
+    errors_truncated: bool = False
+
+
+class PriorityStats(BaseModel):
+    priority: Optional[int] = None
+    total: int
+    completed: int
+    overdue: int
+
+
+class CategoryStats(BaseModel):
+    # None groups the tasks without a category
+    category_id: Optional[UUID] = None
+    name: Optional[str] = None
+    total: int
+    completed: int
+    overdue: int
+
+
+class DailyCompletions(BaseModel):
+    day: date
+    completed: int
+
+
+class UserStats(BaseModel):
+    total: int = 0
+    completed: int = 0
+    open: int = 0
+    overdue: int = 0
+    by_priority: list[PriorityStats] = []
+    by_category: list[CategoryStats] = []
+    # One entry per day of the window, oldest first, zero-filled
+    completions: list[DailyCompletions] = []
+    generated_at: datetime
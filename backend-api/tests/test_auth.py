@@ -0,0 +1,155 @@
+import sys
+import os
+import asyncio
+import uuid
+from collections import OrderedDict
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from core.config import settings
+
+# db.session (under the auth endpoints) builds its default engine at import
+settings.storage_backend = "memory"
+
+from api.api_v1.endpoints import auth
+from core import tokens
+from crud import tokens as crud_tokens
+from crud.memory import MemoryRepository
+from schemas.schemas import RefreshRequest, UserCreate, UserUpdate
+from core.tokens import ACCESS, REFRESH, InvalidToken, Denylist, issue_token, verify_access_token, verify_refresh_token
+
+
+def test_access_token_round_trip_and_tampering():
+    user_id = uuid.uuid4()
+    token, expires_in = issue_token(user_id, ACCESS)
+    header, claims, signature = token.split(".")
+    forged_claims = tokens._b64encode(tokens._b64decode(claims).replace(str(user_id).encode(), str(uuid.uuid4()).encode()))
+
+    assert verify_access_token(token).user_id == user_id
+    assert expires_in > 0
+    with pytest.raises(InvalidToken, match="signature"):
+        verify_access_token(f"{header}.{forged_claims}.{signature}")
+    with pytest.raises(InvalidToken, match="Malformed"):
+        verify_access_token("not-a-token")
+
+
+def test_token_kinds_are_not_interchangeable_and_expiry_is_enforced():
+    user_id = uuid.uuid4()
+    refresh, _ = issue_token(user_id, REFRESH)
+    expired, _ = issue_token(user_id, ACCESS, ttl=-1)
+
+    with pytest.raises(InvalidToken, match="access"):
+        verify_access_token(refresh)
+    assert verify_refresh_token(refresh).user_id == user_id
+    with pytest.raises(InvalidToken, match="expired"):
+        verify_access_token(expired)
+
+
+def test_key_rotation_keeps_old_tokens_valid_until_the_key_is_dropped(monkeypatch):
+    user_id = uuid.uuid4()
+    monkeypatch.setattr(tokens, "_principals", OrderedDict())
+    monkeypatch.setattr(tokens, "_keys", {"k1": b"first-secret"})
+    monkeypatch.setattr(tokens, "_active_kid", "k1")
+    old_token, _ = issue_token(user_id, ACCESS)
+
+    monkeypatch.setattr(tokens, "_keys", {"k1": b"first-secret", "k2": b"second-secret"})
+    monkeypatch.setattr(tokens, "_active_kid", "k2")
+    new_token, _ = issue_token(user_id, ACCESS)
+    assert verify_access_token(old_token).user_id == user_id
+    assert verify_access_token(new_token).user_id == user_id
+
+    monkeypatch.setattr(tokens, "_principals", OrderedDict())
+    monkeypatch.setattr(tokens, "_keys", {"k2": b"second-secret"})
+    with pytest.raises(InvalidToken, match="signing key"):
+        verify_access_token(old_token)
+    assert verify_access_token(new_token).user_id == user_id
+
+
+def test_denylist_revokes_single_tokens_and_whole_users(monkeypatch):
+    monkeypatch.setattr(tokens, "denylist", Denylist(max_entries=2))
+    first, second = uuid.uuid4(), uuid.uuid4()
+    token, _ = issue_token(first, ACCESS)
+    other, _ = issue_token(second, ACCESS)
+    principal = verify_access_token(token)
+
+    tokens.denylist.revoke(principal)
+    with pytest.raises(InvalidToken, match="revoked"):
+        verify_access_token(token)
+    assert verify_access_token(other).user_id == second
+
+    monkeypatch.setattr(tokens.time, "time", lambda real=tokens.time.time: real() + 1)
+    tokens.denylist.revoke_user(second)
+    with pytest.raises(InvalidToken, match="revoked"):
+        verify_access_token(other)
+
+
+def test_denylist_keeps_revocations_until_they_expire(monkeypatch):
+    denylist = Denylist(max_entries=2)
+    principals = [verify_access_token(issue_token(uuid.uuid4(), ACCESS)[0]) for _ in range(5)]
+    for principal in principals:
+        denylist.revoke(principal)
+
+    # Over the limit: nothing is dropped early, or its token would work again
+    assert all(denylist.is_revoked(principal) for principal in principals)
+
+    monkeypatch.setattr(tokens.time, "time", lambda real=tokens.time.time: real() + 3600)
+    denylist._prune()
+    assert len(denylist) == 0
+
+
+def test_refresh_tokens_work_once_and_not_after_a_password_change(monkeypatch):
+    repo = MemoryRepository()
+    user = asyncio.run(repo.create_user(UserCreate(email="a@example.com", password="first-password")))
+    first, _ = issue_token(user.id, REFRESH)
+
+    pair = asyncio.run(auth.refresh(RefreshRequest(refresh_token=first), repo))
+    with pytest.raises(HTTPException) as replay:
+        asyncio.run(auth.refresh(RefreshRequest(refresh_token=first), repo))
+    assert replay.value.status_code == 401
+
+    # Tokens carry whole seconds: move the change past the second they were issued in
+    monkeypatch.setattr(tokens.time, "time", lambda real=tokens.time.time: real() - 2)
+    older, _ = issue_token(user.id, REFRESH)
+    monkeypatch.undo()
+    asyncio.run(repo.update_user(user.id, UserUpdate(password="second-password")))
+    with pytest.raises(HTTPException):
+        asyncio.run(auth.refresh(RefreshRequest(refresh_token=older), repo))
+    # A login after the change
+    newer, _ = issue_token(user.id, REFRESH)
+    assert asyncio.run(auth.refresh(RefreshRequest(refresh_token=newer), repo)).refresh_token != pair.refresh_token
+
+
+def test_spending_a_refresh_token_is_one_conditional_insert():
+    statements = []
+
+    async def execute(stmt):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(scalar_one_or_none=lambda: None)
+
+    mock_db = AsyncMock()
+    mock_db.execute = execute
+    principal = verify_refresh_token(issue_token(uuid.uuid4(), REFRESH)[0])
+
+    assert asyncio.run(crud_tokens.spend_refresh_token(mock_db, principal)) is False
+    (sql,) = statements
+    assert sql.startswith("INSERT INTO revoked_tokens") and "FROM users" in sql
+    assert "users.tokens_revoked_at <= " in sql and "ON CONFLICT DO NOTHING" in sql
+    assert "users.deleted_at IS NULL" in sql
+
+
+def test_a_deleted_account_cannot_refresh():
+    repo = MemoryRepository()
+    user = asyncio.run(repo.create_user(UserCreate(email="gone@example.com", password="password")))
+    token, _ = issue_token(user.id, REFRESH)
+
+    asyncio.run(repo.delete_user(user.id))
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(auth.refresh(RefreshRequest(refresh_token=token), repo))
+    assert refused.value.status_code == 401
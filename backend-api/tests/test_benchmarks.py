@@ -0,0 +1,56 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.compare import compare
+from benchmarks.runner import db_usage, parse_metrics, percentile
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 95) == 0.0
+
+
+def test_db_usage_is_the_delta_between_scrapes():
+    before = parse_metrics(
+        'http_request_db_statements_sum{method="GET",route="/api/v1/tasks/"} 10.0\n'
+        'http_request_db_statements_count{method="GET",route="/api/v1/tasks/"} 5\n'
+        'http_request_db_seconds_sum{method="GET",route="/api/v1/tasks/"} 0.5\n'
+    )
+    after = parse_metrics(
+        "# TYPE http_request_db_statements histogram\n"
+        'http_request_db_statements_bucket{method="GET",route="/api/v1/tasks/",le="1"} 3\n'
+        'http_request_db_statements_sum{method="GET",route="/api/v1/tasks/"} 40.0\n'
+        'http_request_db_statements_count{method="GET",route="/api/v1/tasks/"} 15\n'
+        'http_request_db_seconds_sum{method="GET",route="/api/v1/tasks/"} 1.5\n'
+    )
+
+    usage = db_usage(before, after)
+
+    assert usage == {("GET", "/api/v1/tasks/"): {"db_statements_per_request": 3.0, "db_ms_per_request": 100.0}}
+
+
+def test_compare_flags_latency_and_query_count_regressions():
+    base = {"endpoints": {
+        "GET /a": {"rps": 100, "p50_ms": 5, "p95_ms": 10, "p99_ms": 20, "db_statements_per_request": 2},
+        "GET /b": {"rps": 100, "p50_ms": 5, "p95_ms": 10, "p99_ms": 20, "db_statements_per_request": 2},
+    }}
+    new = {"endpoints": {
+        "GET /a": {"rps": 90, "p50_ms": 6, "p95_ms": 10.5, "p99_ms": 25, "db_statements_per_request": 3},
+        "GET /b": {"rps": 80, "p50_ms": 6, "p95_ms": 15, "p99_ms": 25, "db_statements_per_request": 2},
+        "GET /c": {"rps": 10, "p50_ms": 1, "p95_ms": 1, "p99_ms": 1},
+    }}
+
+    lines, regressions = compare(base, new, threshold=10)
+
+    assert regressions == [
+        "GET /a: 2 -> 3 statements per request",
+        "GET /b: p95 10 -> 15 ms (+50.0%)",
+    ]
+    assert "GET /c: only in new" in lines
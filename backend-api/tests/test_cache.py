@@ -0,0 +1,102 @@
+import sys
+import os
+import asyncio
+import uuid
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pydantic import TypeAdapter
+
+from crud import cache
+from crud.cache import MemoryCache, cached, invalidate
+
+INT = TypeAdapter(int)
+
+
+def test_cached_hits_until_invalidated():
+    async def run():
+        user_id = uuid.uuid4()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        assert await cached("tasks", user_id, ("list",), load, INT) == 1
+        assert await cached("tasks", user_id, ("list",), load, INT) == 1
+        await invalidate(user_id, "tasks")
+        assert await cached("tasks", user_id, ("list",), load, INT) == 2
+        # other users and namespaces are untouched
+        assert await cached("projects", user_id, ("list",), load, INT) == 3
+        assert await cached("projects", user_id, ("list",), load, INT) == 3
+
+    with patch.object(cache, "backend", MemoryCache(100, cache._stats)):
+        asyncio.run(run())
+
+
+def test_memory_cache_evicts_lru_and_expires_entries():
+    async def run():
+        stats = {"evictions": 0, "expirations": 0}
+        backend = MemoryCache(2, stats)
+        await backend.set("a", 1, INT, ttl=60)
+        await backend.set("b", 2, INT, ttl=60)
+        await backend.get("a", INT)
+        await backend.set("c", 3, INT, ttl=60)
+
+        assert await backend.get("b", INT) is cache._MISSING
+        assert await backend.get("a", INT) == 1
+        assert stats["evictions"] == 1
+
+        await backend.set("d", 4, INT, ttl=-1)
+        assert await backend.get("d", INT) is cache._MISSING
+        assert stats["expirations"] == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_identical_misses_share_one_load_until_invalidated():
+    async def run():
+        user_id = uuid.uuid4()
+        release = asyncio.Event()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            number = len(calls)
+            await release.wait()
+            return number
+
+        first = [asyncio.create_task(cached("tasks", user_id, ("list",), load, INT)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # A write lands while the load is in flight: later readers start afresh
+        await invalidate(user_id, "tasks")
+        after = asyncio.create_task(cached("tasks", user_id, ("list",), load, INT))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*first), await after, len(calls)
+
+    with patch.object(cache, "backend", cache.NullCache()), patch.dict(cache._stats, {"loads": 0, "coalesced": 0}):
+        shared, fresh, loads = asyncio.run(run())
+        assert cache._stats["coalesced"] == 2
+
+    assert shared == [1, 1, 1]
+    assert fresh == 2
+    assert loads == 2
+    assert cache._inflight == {}
+
+
+def test_failed_load_is_raised_to_every_waiter():
+    async def run():
+        user_id = uuid.uuid4()
+
+        async def load():
+            await asyncio.sleep(0)
+            raise ValueError("Invalid cursor")
+
+        return await asyncio.gather(*(cached("tasks", user_id, ("list",), load, INT) for _ in range(2)), return_exceptions=True)
+
+    with patch.object(cache, "backend", cache.NullCache()):
+        results = asyncio.run(run())
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
@@ -0,0 +1,83 @@
+import sys
+import os
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api import stream as stream_module
+from api.stream import CHANGES, HEARTBEAT, RESET, ChangeStream
+from core.changes import ChangeHub
+from core.config import settings
+from crud import sync
+from schemas.schemas import SyncDeleted, SyncResponse
+
+
+@asynccontextmanager
+async def fake_session():
+    yield None
+
+
+def make_log(monkeypatch):
+    """A fake change log: append (txid, deleted task id) and get_changes reads it."""
+    log = []
+
+    async def get_changes(db, user_id, since, limit):
+        position = sync.decode_token(since)[0] if since else 0
+        pending = [(txid, task_id) for txid, task_id in log if txid > position]
+        rows = pending[:limit]
+        txid = rows[-1][0] if rows else max(position, 1)
+        deleted = SyncDeleted(tasks=[task_id for _, task_id in rows])
+        return SyncResponse(token=sync.encode_token(txid, 0), has_more=len(pending) > limit, full_resync=since is None, deleted=deleted)
+
+    monkeypatch.setattr(sync, "get_changes", get_changes)
+    return log
+
+
+def test_stream_sends_initial_token_then_wakes_on_notify_and_heartbeats(monkeypatch):
+    log = make_log(monkeypatch)
+    hub = ChangeHub()
+    monkeypatch.setattr(stream_module, "hub", hub)
+    monkeypatch.setattr(settings, "stream_heartbeat_seconds", 0.05)
+    user_id, task_id = uuid.uuid4(), uuid.uuid4()
+
+    async def run():
+        async with ChangeStream(fake_session, user_id, None) as stream:
+            frames = [await stream.next_frame()]
+            frames.append(await stream.next_frame())
+            log.append((7, task_id))
+            hub._on_notification(None, 0, "change_log", f"{user_id}:7")
+            frames.append(await stream.next_frame())
+            hub._on_notification(None, 0, "change_log", "garbage")
+            return frames, hub.stats()
+
+    frames, stats = asyncio.run(run())
+
+    assert frames[0][0] == CHANGES and frames[0][1].full_resync
+    assert frames[1] == (HEARTBEAT, None)
+    assert frames[2][0] == CHANGES and frames[2][1].deleted.tasks == [task_id]
+    assert sync.decode_token(frames[2][1].token)[0] == 7
+    assert (stats["streams"], stats["wakeups"], stats["malformed"]) == (1, 1, 1)
+
+
+def test_slow_consumer_gets_reset_instead_of_unbounded_buffering(monkeypatch):
+    log = make_log(monkeypatch)
+    hub = ChangeHub()
+    monkeypatch.setattr(stream_module, "hub", hub)
+    monkeypatch.setattr(settings, "stream_send_buffer", 2)
+    monkeypatch.setattr(settings, "stream_batch_limit", 1)
+    user_id = uuid.uuid4()
+    log.extend((txid, uuid.uuid4()) for txid in range(2, 10))
+
+    async def run():
+        async with ChangeStream(fake_session, user_id, sync.encode_token(1, 0)) as stream:
+            await asyncio.sleep(0.05)  # the producer runs ahead while nobody reads
+            frames = [await stream.next_frame() for _ in range(3)]
+        return frames, hub.stats()
+
+    frames, stats = asyncio.run(run())
+
+    assert [kind for kind, _ in frames] == [CHANGES, CHANGES, RESET]
+    assert stats["overflows"] == 1
+    assert stats["streams"] == 0
@@ -0,0 +1,87 @@
+import sys
+import os
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.dialects import postgresql
+
+from crud.counters import reconcile_counters
+from crud.crud import PROJECT_COLUMNS
+from models.models import Task
+
+
+class DummyResult:
+    def __init__(self, row):
+        self._row = row
+
+    def one(self):
+        return self._row
+
+
+def test_reconcile_walks_batches_and_invalidates_fixed_users():
+    user_id = uuid.uuid4()
+    results = [
+        # projects: two batches, then past the end
+        DummyResult(SimpleNamespace(last_id="5", users=[user_id, user_id])),
+        DummyResult(SimpleNamespace(last_id="9", users=None)),
+        DummyResult(SimpleNamespace(last_id=None, users=None)),
+        # categories: empty table
+        DummyResult(SimpleNamespace(last_id=None, users=None)),
+    ]
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(side_effect=results)
+    invalidate = AsyncMock()
+
+    with patch("crud.counters.invalidate", invalidate):
+        fixed = asyncio.run(reconcile_counters(mock_db, batch_size=5))
+
+    assert fixed == {"projects": 2, "categories": 0}
+    assert [call.args[1]["after"] for call in mock_db.execute.await_args_list[:3]] == [
+        "00000000-0000-0000-0000-000000000000", "5", "9",
+    ]
+    invalidate.assert_awaited_once_with(user_id, "projects")
+
+
+def test_project_list_reads_counters_without_scanning_tasks():
+    from sqlalchemy import select
+
+    sql = str(select(*PROJECT_COLUMNS).compile(dialect=postgresql.dialect()))
+
+    assert "projects.task_count" in sql and "AS overdue_count" in sql
+    # overdue is the only task lookup, restricted to open tasks past due
+    assert "NOT tasks.is_completed" in sql and "tasks.due_date < now()" in sql
+    # on the project's own tasks partition, through the open, live tasks index
+    assert "tasks.user_id = projects.user_id" in sql and "tasks.deleted_at IS NULL" in sql
+    index = next(ix for ix in Task.__table__.indexes if ix.name == "ix_tasks_project_id_due_date_open")
+    assert [c.name for c in index.columns] == ["project_id", "due_date"]
+    assert str(index.dialect_options["postgresql"]["where"]) == "NOT is_completed AND deleted_at IS NULL"
+
+
+def test_updates_return_the_overdue_count_in_the_same_statement():
+    from crud import cache
+    from crud.cache import NullCache
+    from crud.crud import update_category, update_project
+    from models.models import Category, Project
+    from schemas.schemas import CategoryUpdate, ProjectUpdate
+
+    for update, model, body in ((update_category, Category, CategoryUpdate(name="Home")), (update_project, Project, ProjectUpdate(name="Launch"))):
+        statements = []
+        entity = model(id=uuid.uuid4(), user_id=uuid.uuid4(), name="old")
+
+        async def execute(stmt, params=None):
+            statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+            return SimpleNamespace(one_or_none=lambda: (entity, 3))
+
+        mock_db = AsyncMock()
+        mock_db.execute = execute
+        with patch.object(cache, "backend", NullCache()):
+            updated = asyncio.run(update(mock_db, entity.id, body, entity.user_id))
+
+        (sql,) = statements
+        assert sql.startswith(f"UPDATE {model.__tablename__}") and "RETURNING" in sql and "count(*)" in sql.split("RETURNING")[1]
+        assert updated.overdue_count == 3
+        mock_db.refresh.assert_not_awaited()
@@ -0,0 +1,48 @@
+import sys
+import os
+import asyncio
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi import Request, Response
+
+from core.config import settings
+import api.etag as etag_module
+from api.etag import make_etag, etag_matches, not_modified
+
+
+def test_etag_changes_with_version_and_params():
+    etag = make_etag("task", 3, ("list", "created_at", None, 100))
+
+    assert etag == make_etag("task", 3, ("list", "created_at", None, 100))
+    assert etag != make_etag("task", 4, ("list", "created_at", None, 100))
+    assert etag != make_etag("task", 3, ("list", "priority", None, 100))
+
+
+def test_if_none_match_parsing():
+    etag = make_etag("project", 1, ("item", 1))
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert not etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_project_etags_roll_over_with_the_clock_and_task_etags_do_not(monkeypatch):
+    class Repo:
+        async def get_entity_version(self, user_id, entity):
+            return 7
+
+    def etag(entity, now):
+        monkeypatch.setattr(etag_module.time, "time", lambda: now)
+        response = Response()
+        request = Request({"type": "http", "headers": []})
+        assert asyncio.run(not_modified(request, response, Repo(), uuid.uuid4(), entity, "item", 1)) is None
+        return response.headers["ETag"]
+
+    monkeypatch.setattr(settings, "overdue_etag_seconds", 60)
+    # overdue_count may have changed although nothing was written
+    assert etag("project", 60.0) == etag("project", 119.0) != etag("project", 120.0)
+    assert etag("task", 60.0) == etag("task", 120.0)
@@ -0,0 +1,112 @@
+import sys
+import os
+import asyncio
+import csv
+import gzip
+import io
+import json
+import uuid
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crud import export
+from crud.export import stream_export, CSV_COLUMNS
+
+
+class Row(SimpleNamespace):
+    def _asdict(self):
+        return dict(vars(self))
+
+
+class DummyResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class DummySession:
+    """Returns one batch per execute() call: user, categories, projects, tasks, archived tasks."""
+
+    def __init__(self, sections):
+        self._sections = iter(sections)
+        self.closed = False
+        self.statements = []
+        self.log = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def execute(self, stmt):
+        self.statements.append(str(stmt))
+        self.log.append("read")
+        return DummyResult(next(self._sections))
+
+    async def rollback(self):
+        self.log.append("end")
+
+
+def _collect(session, fmt, compress=False):
+    async def run():
+        chunks = []
+        async for chunk in stream_export(lambda: session, uuid.uuid4(), fmt, compress):
+            session.log.append("yield")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    return asyncio.run(run())
+
+
+def _sections():
+    user_id = uuid.uuid4()
+    return [
+        [Row(id=user_id, email="a@example.com", created_at=None)],
+        [],
+        [Row(name="Launch", id=uuid.uuid4(), user_id=user_id, create_day=None, due_date=None, progress=0)],
+        [Row(title="t1", is_completed=True, id=uuid.uuid4()), Row(title="t2", is_completed=False, id=uuid.uuid4())],
+        [Row(title="archived", is_completed=True, id=uuid.uuid4())],
+    ]
+
+
+def test_ndjson_export_tags_each_record_and_closes_session():
+    session = DummySession(_sections())
+
+    lines = [json.loads(line) for line in _collect(session, "ndjson").splitlines()]
+
+    assert [line["record_type"] for line in lines] == ["user", "project", "task", "task", "task"]
+    assert lines[2]["title"] == "t1"
+    assert session.closed
+
+
+def test_gzipped_csv_export_uses_union_header():
+    body = gzip.decompress(_collect(DummySession(_sections()), "csv", compress=True)).decode()
+
+    rows = list(csv.DictReader(io.StringIO(body)))
+
+    assert list(rows[0].keys()) == ["record_type", *CSV_COLUMNS]
+    assert [row["record_type"] for row in rows] == ["user", "project", "task", "task", "task"]
+    assert rows[2]["is_completed"] == "true"
+    assert rows[0]["title"] == ""
+
+
+def test_export_reads_in_keyset_batches_and_holds_no_transaction_while_the_client_reads(monkeypatch):
+    monkeypatch.setattr(export.settings, "export_batch_size", 2)
+    sections = _sections()
+    for task in sections[3]:
+        task.created_at = None
+    # A full batch of tasks asks for more after the last one it got; the next comes back empty
+    sections.insert(4, [])
+    session = DummySession(sections)
+
+    _collect(session, "ndjson")
+
+    # Every read's transaction ends before its rows go out
+    assert all(step == "end" for step, before in zip(session.log[1:], session.log) if before == "read")
+    assert "ORDER BY tasks.created_at, tasks.id" in session.statements[3]
+    assert "(tasks.created_at, tasks.id) > (" in session.statements[4]
+    assert "REPEATABLE READ" not in " ".join(session.statements)
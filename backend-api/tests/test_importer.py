@@ -0,0 +1,68 @@
+import sys
+import os
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crud.importer import read_csv, read_ndjson, import_tasks
+
+
+class DummyResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def _collect(records):
+    return [record async for record in records]
+
+
+def test_readers_split_records_across_chunks():
+    ndjson = asyncio.run(_collect(read_ndjson(_chunks(b'{"title": "a"}\n{"tit', b'le": "b"}\nnot json\n\n[1]'))))
+    assert ndjson[:2] == [(1, {"title": "a"}), (2, {"title": "b"})]
+    assert ndjson[2][0] == 3 and ndjson[2][1].startswith("invalid JSON")
+    assert ndjson[3] == (5, "expected a JSON object")
+
+    rows = asyncio.run(_collect(read_csv(_chunks(b'\xef\xbb\xbftitle,description,priority\r\n"x","multi\nline",2\n', b"y,,\nz\n"))))
+    assert rows[0] == (2, {"title": "x", "description": "multi\nline", "priority": "2"})
+    assert rows[1] == (4, {"title": "y"})
+    assert rows[2] == (5, "expected 3 fields, got 1")
+
+
+def test_import_resolves_names_once_per_batch_and_reports_errors():
+    user_id = uuid.uuid4()
+    work_id = uuid.uuid4()
+    records = [
+        (1, {"title": "a", "category": "Work"}),
+        (2, {"title": "b", "category": "Work", "priority": "high"}),
+        (3, {"title": "c", "category_id": str(uuid.uuid4())}),
+        (4, {"title": "d"}),
+    ]
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(return_value=DummyResult([SimpleNamespace(id=work_id, name="Work")]))
+    loaded = []
+
+    async def fake_load(db, batch):
+        loaded.extend(batch)
+        return len(batch)
+
+    with patch("crud.importer._load", side_effect=fake_load), patch("crud.importer.invalidate", AsyncMock()):
+        report = asyncio.run(import_tasks(mock_db, user_id, _chunks(*records), batch_size=10))
+
+    assert (report.rows_read, report.rows_imported, report.rows_failed) == (4, 2, 2)
+    assert [error.line for error in report.errors] == [2, 3]
+    assert [record[4] for record in loaded] == ["a", "d"]
+    assert loaded[0][2] == work_id and loaded[1][2] is None
+    # categories: one lookup for the batch; projects: nothing to resolve
+    assert mock_db.execute.await_count == 1
+    mock_db.commit.assert_awaited_once()
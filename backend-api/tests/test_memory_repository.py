@@ -0,0 +1,118 @@
+import sys
+import os
+import asyncio
+import inspect
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.exc import IntegrityError
+
+from crud.memory import MemoryRepository
+from crud.repository import Repository, ShardedRepository, SqlRepository, UnsupportedOperation
+from schemas.schemas import CategoryCreate, ProjectCreate, TaskCreate, TaskUpdate, TaskBatchUpdateItem
+
+
+def test_task_pages_follow_postgres_order_with_nulls():
+    async def run():
+        repo = MemoryRepository()
+        user_id = uuid.uuid4()
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for i, days in enumerate([3, None, 1, None, 2]):
+            due = base + timedelta(days=days) if days is not None else None
+            await repo.create_task(TaskCreate(title=f"t{i}", due_date=due), user_id)
+
+        pages = {}
+        for sort in ("due_date", "-due_date"):
+            titles, cursor = [], None
+            while True:
+                body, cursor = await repo.get_tasks_json(user_id, sort=sort, cursor=cursor, limit=2)
+                titles += [task["title"] for task in json.loads(body)]
+                if cursor is None:
+                    break
+            pages[sort] = titles
+        return pages
+
+    pages = asyncio.run(run())
+
+    # ASC puts NULLs last, DESC first; the two are exact mirrors
+    assert pages["due_date"][:3] == ["t2", "t4", "t0"]
+    assert set(pages["due_date"][3:]) == {"t1", "t3"}
+    assert pages["-due_date"] == pages["due_date"][::-1]
+
+
+def test_filters_counters_and_set_null_on_category_delete():
+    async def run():
+        repo = MemoryRepository()
+        user_id = uuid.uuid4()
+        category = await repo.create_category(CategoryCreate(name="home"), user_id)
+        project = await repo.create_project(ProjectCreate(name="move"), user_id)
+        past = datetime.now(timezone.utc) - timedelta(days=1)
+        tasks = [
+            await repo.create_task(TaskCreate(title=f"t{i}", category_id=category.id, project_id=project.id, due_date=past), user_id)
+            for i in range(4)
+        ]
+        done = await repo.update_task(tasks[0].id, TaskUpdate(is_completed=True), user_id)
+        await repo.delete_task(tasks[1].id, user_id)
+        open_body, _ = await repo.get_tasks_json(user_id, is_completed=False, category_id=category.id)
+        counted = await repo.get_project(project.id, user_id), await repo.get_category(category.id, user_id)
+        version = await repo.get_entity_version(user_id, "task")
+        await repo.delete_category(category.id, user_id)
+        orphan = await repo.get_task(tasks[2].id, user_id)
+        return done, json.loads(open_body), counted, version, orphan, await repo.get_entity_version(user_id, "task")
+
+    done, open_tasks, (project, category), version, orphan, version_after = asyncio.run(run())
+
+    assert done.completed_at is not None
+    assert sorted(task["title"] for task in open_tasks) == ["t2", "t3"]
+    assert (project.task_count, project.completed_count, project.progress, project.overdue_count) == (3, 1, 33, 2)
+    assert (category.task_count, category.completed_count, category.overdue_count) == (3, 1, 2)
+    assert orphan.category_id is None
+    assert version_after > version
+
+
+def test_atomic_batch_update_with_a_missing_id_changes_nothing():
+    async def run():
+        repo = MemoryRepository()
+        user_id = uuid.uuid4()
+        task = await repo.create_task(TaskCreate(title="keep", priority=1), user_id)
+        items = [TaskBatchUpdateItem(id=task.id, priority=3), TaskBatchUpdateItem(id=uuid.uuid4(), priority=2)]
+        result = await repo.update_tasks(items, user_id, atomic=True)
+        return result, await repo.get_task(task.id, user_id)
+
+    result, task = asyncio.run(run())
+
+    assert result.committed is False
+    assert [item.status for item in result.results] == ["rolled_back", "not_found"]
+    assert task.priority == 1
+
+
+def test_unknown_reference_raises_integrity_error_and_search_is_unsupported():
+    repo = MemoryRepository()
+    user_id = uuid.uuid4()
+
+    with pytest.raises(IntegrityError):
+        asyncio.run(repo.create_task(TaskCreate(title="x", category_id=uuid.uuid4()), user_id))
+    for call in (repo.search_tasks_json(user_id, "x"), repo.get_changes(user_id, 0)):
+        with pytest.raises(UnsupportedOperation) as exc_info:
+            asyncio.run(call)
+        assert exc_info.value.status_code == 501
+
+
+def test_every_backend_implements_the_full_repository_interface():
+    # A method left out of a backend is a TypeError at instantiation, and a
+    # renamed parameter would break callers passing it by keyword. The SQL
+    # backends may pass keyword-only options through as **options.
+    for backend in (MemoryRepository, SqlRepository, ShardedRepository):
+        assert not backend.__abstractmethods__, backend
+        for name in Repository.__abstractmethods__:
+            params = inspect.signature(getattr(backend, name)).parameters
+            forwards = any(p.kind is p.VAR_KEYWORD for p in params.values())
+            for expected in inspect.signature(getattr(Repository, name)).parameters.values():
+                if expected.kind is expected.KEYWORD_ONLY and forwards:
+                    continue
+                assert expected.name in params and params[expected.name].kind is expected.kind, (backend, name, expected.name)
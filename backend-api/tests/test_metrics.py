@@ -0,0 +1,83 @@
+import sys
+import os
+import asyncio
+import sqlite3
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from core import metrics
+from core.metrics import Counter, Histogram, MetricsMiddleware, instrument_engine
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    counter = Counter("hits_total", "Hits.", ("route",))
+    counter.inc('/"b"')
+
+    lines = list(histogram.samples()) + list(counter.samples())
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'hits_total{route="/\\"b\\""} 1.0' in lines
+
+
+def test_middleware_attributes_statements_to_route_and_warns_on_n_plus_one(caplog):
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    class Route:
+        path = "/items/{item_id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/items/1"}
+    with patch.object(metrics.settings, "db_query_warn_threshold", 2), caplog.at_level("WARNING"):
+        asyncio.run(MetricsMiddleware(app)(scope, None, send))
+
+    assert metrics.REQUESTS.values[("GET", "/items/{item_id}", "200")] >= 1
+    assert metrics.REQUEST_STATEMENTS.values[("GET", "/items/{item_id}")][-1] >= 3
+    assert "possible N+1" in caplog.text and "(3x): SELECT 1" in caplog.text
+
+
+def test_pool_counts_only_checkouts_that_waited():
+    from core.config import settings
+
+    # db.session builds its default engine at import
+    settings.storage_backend = "memory"
+    from db.session import TimedQueuePool
+
+    pool = TimedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.05)
+
+    def checkouts():
+        first = pool.connect()
+        first.close()
+        again = pool.connect()
+        assert pool.wait_count == 0
+
+        with pytest.raises(TimeoutError):
+            pool.connect()
+        again.close()
+
+    # The async queue is driven from inside a greenlet, as under an async engine
+    asyncio.run(greenlet_spawn(checkouts))
+    assert pool.wait_count == 1 and pool.timeouts == 1 and pool.wait_seconds_max >= 0.05
@@ -0,0 +1,60 @@
+import sys
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from models.models import Task
+from crud.crud import TASK_SORTS
+from crud.pagination import encode_cursor, decode_cursor, keyset_paginate, page_results
+
+
+def test_cursor_round_trip_keeps_datetime_and_id():
+    row_id = uuid.uuid4()
+    due = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    cursor = encode_cursor("-due_date", due, row_id)
+
+    assert decode_cursor(cursor, "-due_date", Task.due_date) == (due, row_id)
+
+
+def test_cursor_is_rejected_for_other_sort_or_garbage():
+    cursor = encode_cursor("priority", 3, uuid.uuid4())
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "created_at", Task.created_at)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "priority", Task.priority)
+
+
+def test_keyset_paginate_orders_by_sort_key_then_id():
+    cursor = encode_cursor("priority", 2, uuid.uuid4())
+    stmt = keyset_paginate(select(Task), Task.id, TASK_SORTS, "priority", cursor, 10)
+
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert "(tasks.priority, tasks.id) > (" in sql
+    assert "ORDER BY tasks.priority ASC, tasks.id ASC" in sql
+    assert "LIMIT" in sql
+
+
+def test_page_results_emits_cursor_only_when_more_rows_exist():
+    class Row:
+        def __init__(self, priority):
+            self.id = uuid.uuid4()
+            self.priority = priority
+
+    rows = [Row(p) for p in range(3)]
+
+    page, next_cursor = page_results(rows, "priority", 2)
+    assert page == rows[:2]
+    assert decode_cursor(next_cursor, "priority", Task.priority) == (1, rows[1].id)
+
+    page, next_cursor = page_results(rows, "priority", 3)
+    assert page == rows and next_cursor is None
@@ -0,0 +1,142 @@
+import sys
+import os
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.dialects import postgresql
+
+from crud import cache, crud, purge
+from crud.cache import NullCache
+
+
+class DummyResult:
+    def __init__(self, rows=(), rowcount=0, value=None):
+        self._rows = list(rows)
+        self.rowcount = rowcount
+        self._value = value
+
+    def all(self):
+        return self._rows
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: self._rows)
+
+    def scalar_one_or_none(self):
+        return self._value
+
+
+def test_deletes_only_mark_rows_and_reads_skip_marked_ones():
+    statements = []
+
+    async def execute(stmt, params=None):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        # A category with more tasks than one purge batch
+        big = purge.settings.purge_batch_size + 1 if "RETURNING categories.task_count" in statements[-1] else None
+        return DummyResult(rowcount=1, value=big)
+
+    mock_db = AsyncMock()
+    mock_db.execute = execute
+    user_id = uuid.uuid4()
+
+    with patch.object(cache, "backend", NullCache()):
+        assert asyncio.run(crud.delete_category(mock_db, uuid.uuid4(), user_id))
+        assert asyncio.run(crud.delete_user(mock_db, user_id))
+        asyncio.run(crud.get_task(mock_db, uuid.uuid4(), user_id))
+
+    category, user, task = statements
+    assert category.startswith("UPDATE categories SET deleted_at=now()") and "categories.deleted_at IS NULL" in category
+    assert user.startswith("UPDATE users SET deleted_at=now()")
+    assert "tasks.deleted_at IS NULL" in task
+
+
+def test_deleting_a_small_parent_detaches_its_tasks_in_the_same_transaction():
+    statements = []
+
+    async def execute(stmt, params=None):
+        statements.append(" ".join(str(stmt).split()))
+        return DummyResult(rowcount=1, value=3)
+
+    mock_db = AsyncMock()
+    mock_db.execute = execute
+    user_id, project_id = uuid.uuid4(), uuid.uuid4()
+
+    with patch.object(cache, "backend", NullCache()):
+        assert asyncio.run(crud.delete_project(mock_db, project_id, user_id))
+
+    project, *detached = statements
+    assert project.startswith("UPDATE projects SET deleted_at=now()") and "RETURNING projects.task_count" in project
+    assert detached == [
+        f"UPDATE {tasks} SET project_id = NULL WHERE user_id = :user_id AND project_id = :parent_id"
+        for tasks in ("tasks", "tasks_archive")
+    ]
+    mock_db.commit.assert_awaited_once()
+
+
+def test_task_filters_match_live_parents_only():
+    statements = []
+
+    async def execute(stmt, params=None):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return DummyResult()
+
+    mock_db = AsyncMock()
+    mock_db.execute = execute
+
+    with patch.object(cache, "backend", NullCache()):
+        asyncio.run(crud.get_tasks_json(mock_db, uuid.uuid4(), project_id=uuid.uuid4(), category_id=uuid.uuid4()))
+
+    (sql,) = statements
+    assert "EXISTS (SELECT projects.id" in sql and "projects.deleted_at IS NULL" in sql
+    assert "EXISTS (SELECT categories.id" in sql and "categories.deleted_at IS NULL" in sql
+
+
+def test_purge_removes_users_then_detaches_and_removes_parents_then_tasks(monkeypatch):
+    monkeypatch.setattr(purge.settings, "purge_batch_size", 2)
+    monkeypatch.setattr(purge.settings, "purge_batch_pause_seconds", 0)
+    user_id, category_id = uuid.uuid4(), uuid.uuid4()
+    deleted_users = iter([[user_id], []])
+    deleted_categories = iter([[(category_id, user_id)], []])
+    # Full batches go round again; a short one ends the loop
+    detached = iter([2, 1, 0])
+    log = []
+
+    async def execute(stmt, params=None):
+        sql = " ".join(str(stmt).split())
+        if sql.startswith("SELECT id FROM users"):
+            return DummyResult(next(deleted_users))
+        if sql.startswith("SELECT id, user_id FROM categories"):
+            return DummyResult(next(deleted_categories))
+        if sql.startswith("SELECT id, user_id FROM projects"):
+            return DummyResult()
+        if "app.purging" in sql:
+            log.append("purging")
+            return DummyResult()
+        if sql.startswith("UPDATE "):
+            log.append(("detach", sql.split()[1]))
+            return DummyResult(rowcount=next(detached))
+        log.append(sql.split(" WHERE")[0].replace("WITH picked AS ( SELECT id, user_id FROM tasks", "purge tasks"))
+        return DummyResult(rowcount=1)
+
+    mock_db = AsyncMock()
+    mock_db.execute = execute
+    invalidated = []
+
+    async def invalidate(user_id, *namespaces):
+        invalidated.append(namespaces)
+
+    monkeypatch.setattr(purge, "invalidate", invalidate)
+    result = asyncio.run(purge.purge_deleted(mock_db))
+
+    user_rows = [f"DELETE FROM {table}" for table in purge.USER_TABLES]
+    assert log == (
+        [step for statement in user_rows for step in ("purging", statement)]
+        + ["DELETE FROM users"]
+        + [("detach", "tasks"), ("detach", "tasks"), ("detach", "tasks_archive"), "DELETE FROM categories"]
+        + ["purge tasks"]
+    )
+    assert result == {"users": 1, "user_rows": 7, "categories": 1, "projects": 0, "detached_tasks": 3, "tasks": 1}
+    assert invalidated == [("tasks", "stats")]
@@ -0,0 +1,126 @@
+import sys
+import os
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.config import settings
+
+# db.session builds its default engine at import; these tests build replica sets by hand
+settings.storage_backend = "memory"
+
+from pydantic import TypeAdapter
+
+import db.session as session_module
+from crud import cache
+from db.session import RecentWriters, ReplicaSet, _eject_failed_replicas
+
+URLS = ["postgresql+asyncpg://u:p@localhost/replica0", "postgresql+asyncpg://u:p@localhost/replica1"]
+
+
+class FakeSession:
+    """Answers every statement with `value`, or raises it."""
+
+    def __init__(self, value):
+        self.value = value
+        self.info = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, params=None):
+        if isinstance(self.value, Exception):
+            raise self.value
+        return SimpleNamespace(scalar_one=lambda: self.value)
+
+
+def test_reads_rotate_over_healthy_replicas_and_fall_back_to_the_primary(monkeypatch):
+    monkeypatch.setattr(settings, "replica_max_lag_seconds", 2.0)
+    replicas = ReplicaSet(URLS)
+    primary = object()
+
+    # Nothing checked yet
+    assert replicas.session_factory(primary) is primary
+
+    replicas.lag = [0.0, 0.5]
+    picked = {replicas.session_factory(primary) for _ in range(4)}
+    assert picked == set(replicas.sessions)
+
+    replicas.lag = [0.0, 3.0]
+    assert {replicas.session_factory(primary) for _ in range(4)} == {replicas.sessions[0]}
+
+    replicas.eject(0)
+    assert replicas.session_factory(primary) is primary
+    assert replicas.stats()["ejections"] == 1 and replicas.stats()["primary_reads"] == 2
+
+
+def test_check_measures_lag_and_drops_unreachable_replicas(monkeypatch):
+    monkeypatch.setattr(settings, "replica_max_lag_seconds", 2.0)
+    replicas = ReplicaSet(URLS)
+    replicas.sessions = [lambda: FakeSession(0.25), lambda: FakeSession(ConnectionRefusedError())]
+
+    asyncio.run(replicas.check(lambda: FakeSession("0/3000060")))
+    assert replicas.lag == [0.25, None]
+    assert replicas.healthy() == [0] and replicas.check_failures == 1
+
+    # Not a standby (the URL points at a primary): lag is NULL
+    replicas.sessions[0] = lambda: FakeSession(None)
+    asyncio.run(replicas.check(lambda: FakeSession("0/3000060")))
+    assert replicas.healthy() == []
+
+
+def test_connection_failures_eject_the_replica_but_query_errors_do_not():
+    replicas = ReplicaSet(URLS)
+    replicas.lag = [0.0, 0.0]
+    session = FakeSession(None)
+    session.info["replica"] = (replicas, 1)
+
+    _eject_failed_replicas([session], ValueError("bad cursor"))
+    assert replicas.healthy() == [0, 1]
+    _eject_failed_replicas([session], ConnectionResetError())
+    assert replicas.healthy() == [0]
+
+
+def test_recent_writers_expire_after_the_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(session_module.time, "monotonic", lambda: now[0])
+    writers = RecentWriters(5.0)
+    first, second = uuid.uuid4(), uuid.uuid4()
+
+    writers.add(first)
+    now[0] = 103.0
+    writers.add(second)
+    assert first in writers and second in writers
+
+    now[0] = 106.0
+    assert first not in writers and second in writers
+    writers.add(second)
+    assert list(writers._until) == [second]
+
+
+def test_loads_served_by_a_replica_are_not_stored_in_the_cache(monkeypatch):
+    replicas = ReplicaSet(URLS[:1])
+    replicas.lag = [0.0]
+    replicas.sessions = [lambda: FakeSession("replica")]
+    monkeypatch.setattr(session_module, "replicas", replicas)
+    monkeypatch.setattr(session_module, "async_session", lambda: FakeSession("primary"))
+    monkeypatch.setattr(cache, "backend", cache.MemoryCache(100, cache._stats))
+    user_id = uuid.uuid4()
+
+    async def read(reader):
+        async with session_module.open_repository(reader=reader) as repo:
+            async def load():
+                return (await repo.db.execute("SELECT")).scalar_one()
+
+            return await cache.cached("tasks", user_id, ("item",), load, TypeAdapter(str))
+
+    # A lagging replica may answer with a row from before the write the key's
+    # version already counts; other workers must not be served it from the cache
+    assert asyncio.run(read(user_id)) == "replica"
+    assert asyncio.run(read(None)) == "primary"
+    assert asyncio.run(read(user_id)) == "primary"
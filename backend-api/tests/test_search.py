@@ -0,0 +1,40 @@
+import sys
+import os
+import asyncio
+import uuid
+from unittest.mock import AsyncMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.dialects import postgresql
+
+from crud import cache
+from crud.cache import NullCache
+from crud.crud import search_tasks_json
+from crud.pagination import encode_cursor
+
+
+class DummyResult:
+    def all(self):
+        return []
+
+
+def test_search_is_scoped_ranked_and_keyset_paginated():
+    statements = []
+
+    async def execute(stmt):
+        statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        return DummyResult()
+
+    mock_db = AsyncMock()
+    mock_db.execute = execute
+    cursor = encode_cursor("-rank", 0.25, uuid.uuid4())
+
+    with patch.object(cache, "backend", NullCache()):
+        body, next_cursor = asyncio.run(search_tasks_json(mock_db, uuid.uuid4(), "groceris", cursor=cursor, limit=10))
+
+    assert (body, next_cursor) == (b"[]", None)
+    sql = statements[0]
+    assert "tasks.user_id = " in sql
+    assert "tasks.search_vector @@ websearch_to_tsquery" in sql and "<%% tasks.title" in sql
+    assert "ORDER BY rank DESC, tasks.id DESC" in sql
@@ -0,0 +1,36 @@
+import sys
+import os
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+passlib_context = pytest.importorskip("passlib.context")
+
+from core.config import settings
+from core.security import hash_password, verify_password, hasher_stats
+
+
+def test_hash_and_verify_run_in_executor():
+    async def run():
+        hashed = await hash_password("s3cret")
+        assert hashed != "s3cret"
+        assert await verify_password("s3cret", hashed) == (True, None)
+        assert (await verify_password("wrong", hashed))[0] is False
+
+    asyncio.run(run())
+    assert hasher_stats()["completed"] >= 3
+
+
+def test_verify_rehashes_when_rounds_setting_changed():
+    old_context = passlib_context.CryptContext(
+        schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=settings.password_hash_rounds + 1000
+    )
+    old_hash = old_context.hash("s3cret")
+
+    ok, new_hash = asyncio.run(verify_password("s3cret", old_hash))
+
+    assert ok is True
+    assert new_hash is not None
+    assert f"${settings.password_hash_rounds}$" in new_hash
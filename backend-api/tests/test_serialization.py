@@ -0,0 +1,19 @@
+import sys
+import os
+import json
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine
+
+from benchmarks.bench_serialization import create_schema, seed, orm_path, core_path
+
+
+def test_core_row_json_matches_schema_serialization():
+    engine = create_engine("sqlite://")
+    create_schema(engine)
+    user_id = uuid.uuid4()
+    seed(engine, user_id, 20)
+
+    assert json.loads(core_path(engine, user_id)) == json.loads(orm_path(engine, user_id))
@@ -0,0 +1,203 @@
+import sys
+import os
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.exc import IntegrityError
+
+from core.config import settings
+
+# db.session builds its default engine at import; these tests build routers by hand
+settings.storage_backend = "memory"
+
+from crud import crud, directory
+from crud.repository import ShardedRepository, ShardMoving
+from db import session
+from db.session import ShardRouter, get_user_db, shard_bucket
+from schemas.schemas import TaskUpdate, UserCreate
+
+URLS = ["postgresql+asyncpg://u:p@localhost/shard0", "postgresql+asyncpg://u:p@localhost/shard1"]
+
+
+class FakeSession:
+    def __init__(self, shard):
+        self.shard = shard
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def make_router(bucket_map=None, frozen=()):
+    router = ShardRouter(URLS, bucket_map, frozen)
+    router.sessions = [lambda shard=shard: FakeSession(shard) for shard in range(len(URLS))]
+    return router
+
+
+def test_buckets_are_stable_and_the_map_overrides_round_robin():
+    user_id = uuid.UUID("6b1f0c4e-2d7a-4c39-9a51-0f3e8d2c7b14")
+    bucket = shard_bucket(user_id)
+
+    assert bucket == shard_bucket(user_id, 1024) and 0 <= bucket < 1024
+    assert make_router().shard_of(user_id) == bucket % 2
+    assert make_router({bucket: 1 - bucket % 2}).shard_of(user_id) == 1 - bucket % 2
+    with pytest.raises(ValueError):
+        ShardRouter(URLS, {bucket: 5})
+
+
+def test_calls_go_to_the_users_shard_and_frozen_buckets_refuse_writes(monkeypatch):
+    user_id = uuid.uuid4()
+    calls = []
+
+    async def get_task(db, task_id, user_id, include_archived=False):
+        calls.append(db.shard)
+
+    async def update_task(db, task_id, task_update, user_id):
+        calls.append(db.shard)
+
+    monkeypatch.setattr(crud, "get_task", get_task)
+    monkeypatch.setattr(crud, "update_task", update_task)
+
+    async def run(router):
+        repo = ShardedRepository(router)
+        try:
+            await repo.get_task(uuid.uuid4(), user_id)
+            await repo.update_task(uuid.uuid4(), TaskUpdate(title="x"), user_id)
+        finally:
+            await repo.close()
+
+    asyncio.run(run(make_router()))
+    assert calls == [make_router().shard_of(user_id)] * 2
+
+    with pytest.raises(ShardMoving):
+        asyncio.run(run(make_router(frozen=[shard_bucket(user_id)])))
+
+
+def test_raw_sessions_refuse_writes_to_frozen_buckets_too(monkeypatch):
+    user_id = uuid.uuid4()
+    monkeypatch.setattr(session, "shards", make_router(frozen=[shard_bucket(user_id)]))
+
+    async def first_session(method):
+        return await anext(get_user_db(user_id, SimpleNamespace(method=method)))
+
+    # The admin import takes a raw session, not the repository
+    with pytest.raises(ShardMoving):
+        asyncio.run(first_session("POST"))
+    assert asyncio.run(first_session("GET")).shard == session.shards.shard_of(user_id)
+
+
+class FakeDirectory:
+    """crud.directory on a dict; must only ever be asked on the first shard."""
+
+    def __init__(self, monkeypatch):
+        self.owners = {}
+        self.claimed_at = {}
+        for name in ("get_email_owner", "claim_email", "release_email"):
+            monkeypatch.setattr(directory, name, getattr(self, name))
+
+    async def get_email_owner(self, db, email):
+        assert db.shard == 0
+        return self.owners.get(email)
+
+    async def claim_email(self, db, email, user_id, replacing=None):
+        assert db.shard == 0
+        if self.owners.get(email) != replacing:
+            return False
+        if replacing is not None and time.time() - self.claimed_at[email] < directory.CLAIM_GRACE.total_seconds():
+            return False
+        self.owners[email], self.claimed_at[email] = user_id, time.time()
+        return True
+
+    async def release_email(self, db, email, user_id):
+        assert db.shard == 0
+        if self.owners.get(email) == user_id:
+            del self.owners[email]
+
+
+def test_duplicate_email_on_another_shard_is_an_integrity_error(monkeypatch):
+    # Created before the directory: no claim, found by asking every shard
+    existing = SimpleNamespace(id=uuid.uuid4(), email="a@example.com")
+    emails = FakeDirectory(monkeypatch)
+
+    async def get_user_by_email(db, email):
+        return existing if db.shard == 1 else None
+
+    async def create_user(db, user, user_id=None):
+        raise AssertionError("must not insert")
+
+    monkeypatch.setattr(crud, "get_user_by_email", get_user_by_email)
+    monkeypatch.setattr(crud, "create_user", create_user)
+
+    async def run():
+        repo = ShardedRepository(make_router())
+        try:
+            assert await repo.get_user_by_email("a@example.com") is existing
+            await repo.create_user(UserCreate(email="a@example.com", password="secret123"))
+        finally:
+            await repo.close()
+
+    with pytest.raises(IntegrityError):
+        asyncio.run(run())
+    # The claim made for the refused signup is given back
+    assert emails.owners == {}
+
+
+def test_racing_signups_for_one_email_on_different_shards_only_one_wins(monkeypatch):
+    emails = FakeDirectory(monkeypatch)
+    users = {}
+
+    async def get_user_by_email(db, email):
+        # Neither signup has inserted yet when both check
+        await asyncio.sleep(0)
+        return None
+
+    async def create_user(db, user, user_id=None):
+        users[user_id] = SimpleNamespace(id=user_id, email=user.email)
+        return users[user_id]
+
+    async def get_user(db, user_id):
+        return users.get(user_id)
+
+    async def delete_user(db, user_id):
+        return users.pop(user_id, None) is not None
+
+    for name, fake in (("get_user_by_email", get_user_by_email), ("create_user", create_user), ("get_user", get_user), ("delete_user", delete_user)):
+        monkeypatch.setattr(crud, name, fake)
+
+    async def signup():
+        repo = ShardedRepository(make_router())
+        try:
+            return await repo.create_user(UserCreate(email="a@example.com", password="secret123"))
+        finally:
+            await repo.close()
+
+    async def run():
+        return await asyncio.gather(signup(), signup(), return_exceptions=True)
+
+    results = asyncio.run(run())
+    (winner,) = [result for result in results if not isinstance(result, Exception)]
+    assert [type(result) for result in results if isinstance(result, Exception)] == [IntegrityError]
+    assert emails.owners == {"a@example.com": winner.id}
+
+    async def delete():
+        repo = ShardedRepository(make_router())
+        try:
+            return await repo.delete_user(winner.id)
+        finally:
+            await repo.close()
+
+    # Deleting the account frees the email at once
+    assert asyncio.run(delete())
+    assert emails.owners == {}
@@ -0,0 +1,75 @@
+import sys
+import os
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from zoneinfo import ZoneInfo
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.dialects import postgresql
+
+from crud import cache
+from crud.cache import NullCache
+from crud.stats import get_user_stats
+
+
+class DummyResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+def _row(by_priority=1, by_category=1, by_day=1, priority=None, category_id=None, category_name=None, day=None, total=0, completed=0, overdue=0):
+    return SimpleNamespace(**locals())
+
+
+def test_stats_are_split_from_grouping_sets_and_histogram_is_zero_filled():
+    today = datetime.now(ZoneInfo("UTC")).date()
+    work_id = uuid.uuid4()
+    rows = [
+        _row(total=10, completed=4, overdue=2),
+        _row(by_priority=0, priority=3, total=6, completed=1, overdue=2),
+        _row(by_priority=0, priority=0, total=4, completed=3),
+        _row(by_category=0, category_id=work_id, category_name="Work", total=7, completed=2, overdue=1),
+        _row(by_category=0, total=3, completed=2, overdue=1),
+        _row(by_day=0, day=today, total=3, completed=3),
+        _row(by_day=0, day=None, total=7, completed=1),
+    ]
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(return_value=DummyResult(rows))
+
+    with patch.object(cache, "backend", NullCache()):
+        stats = asyncio.run(get_user_stats(mock_db, uuid.uuid4(), days=7))
+
+    assert (stats.total, stats.completed, stats.open, stats.overdue) == (10, 4, 6, 2)
+    assert [item.priority for item in stats.by_priority] == [0, 3]
+    assert [item.name for item in stats.by_category] == ["Work", None]
+    assert len(stats.completions) == 7
+    assert stats.completions[0].day == today - timedelta(days=6)
+    assert [item.completed for item in stats.completions] == [0, 0, 0, 0, 0, 0, 3]
+    mock_db.execute.assert_awaited_once()
+
+
+def test_stats_reject_unknown_time_zone():
+    with pytest.raises(ValueError):
+        asyncio.run(get_user_stats(AsyncMock(), uuid.uuid4(), tz="Mars/Olympus"))
+
+
+def test_stats_count_archived_tasks():
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(return_value=DummyResult([]))
+
+    with patch.object(cache, "backend", NullCache()):
+        asyncio.run(get_user_stats(mock_db, uuid.uuid4()))
+
+    sql = str(mock_db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "UNION ALL" in sql and "FROM tasks_archive" in sql
+    # Only the hot table has soft deletes
+    assert sql.count("deleted_at IS NULL") == 3
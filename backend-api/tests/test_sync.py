@@ -0,0 +1,99 @@
+import sys
+import os
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from crud.sync import encode_token, decode_token, get_changes, SyncTokenExpired, END_OF_TX
+
+
+class DummyResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalar_one(self):
+        return self._rows
+
+    def one(self):
+        return self._rows
+
+    def all(self):
+        return self._rows
+
+    def scalars(self):
+        return self
+
+
+def test_token_round_trip_and_expiry():
+    assert decode_token(encode_token(42, 7)) == (42, 7)
+
+    with patch("crud.sync.time.time", return_value=time.time() - 400 * 86400):
+        old = encode_token(42, 7)
+    with pytest.raises(SyncTokenExpired):
+        decode_token(old)
+    with pytest.raises(ValueError):
+        decode_token("garbage!")
+
+
+def test_get_changes_without_token_requests_full_resync():
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(return_value=DummyResult((100, None)))
+
+    response = asyncio.run(get_changes(mock_db, uuid.uuid4(), None))
+
+    assert response.full_resync is True
+    assert decode_token(response.token) == (99, END_OF_TX)
+
+
+def test_get_changes_collapses_to_latest_op_and_advances_to_horizon():
+    task_id = uuid.uuid4()
+    rows = [
+        SimpleNamespace(txid=10, id=1, entity="task", entity_id=task_id, op="upsert"),
+        SimpleNamespace(txid=11, id=2, entity="task", entity_id=task_id, op="delete"),
+    ]
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(side_effect=[DummyResult((50, None)), DummyResult(rows)])
+
+    response = asyncio.run(get_changes(mock_db, uuid.uuid4(), encode_token(5, 0)))
+
+    assert response.deleted.tasks == [task_id]
+    assert response.tasks == []
+    assert response.has_more is False
+    assert decode_token(response.token) == (49, END_OF_TX)
+    # horizon + change_log only: nothing to load for a deleted row
+    assert mock_db.execute.await_count == 2
+
+
+def test_a_task_archived_between_two_syncs_still_arrives():
+    user_id, task_id = uuid.uuid4(), uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    archived = SimpleNamespace(
+        id=task_id, user_id=user_id, title="done", description=None, is_completed=True, due_date=None, priority=0,
+        category_id=None, project_id=None, updated_at=now, created_at=now, completed_at=now,
+    )
+    rows = [SimpleNamespace(txid=10, id=1, entity="task", entity_id=task_id, op="upsert")]
+    mock_db = AsyncMock()
+    # horizon, change_log, hot tasks (moved out since), archive
+    mock_db.execute = AsyncMock(side_effect=[DummyResult((50, None)), DummyResult(rows), DummyResult([]), DummyResult([archived])])
+
+    response = asyncio.run(get_changes(mock_db, user_id, encode_token(5, 0)))
+
+    assert [task.id for task in response.tasks] == [task_id]
+    assert response.deleted.tasks == []
+    assert "FROM tasks_archive" in str(mock_db.execute.await_args_list[3].args[0])
+
+
+def test_tokens_from_before_a_shard_move_require_a_full_resync():
+    token = encode_token(5, 0)
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(return_value=DummyResult((50, int(time.time()) + 1)))
+
+    with pytest.raises(SyncTokenExpired):
+        asyncio.run(get_changes(mock_db, uuid.uuid4(), token))
@@ -0,0 +1,147 @@
+import sys
+import os
+import asyncio
+import uuid
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy.exc import IntegrityError
+
+from models.models import Task
+from schemas.schemas import TaskCreate, TaskBatchUpdateItem, TaskUpdate
+from crud import archive
+from crud.crud import BATCH_INTEGRITY_ERROR, create_tasks, update_tasks, delete_tasks, update_task, delete_task
+
+
+class DummyResult:
+    def __init__(self, values):
+        self._values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._values
+
+    def scalar_one(self):
+        return self._values[0]
+
+
+def make_task(task_id, user_id):
+    now = datetime.now()
+    return Task(id=task_id, user_id=user_id, title="t", is_completed=False, priority=0, updated_at=now, created_at=now)
+
+
+def test_create_tasks_uses_one_multi_row_insert():
+    async def run():
+        user_id = uuid.uuid4()
+        mock_db = AsyncMock()
+        mock_db.execute = AsyncMock(return_value=DummyResult([make_task(uuid.uuid4(), user_id) for _ in range(3)]))
+
+        result = await create_tasks(mock_db, [TaskCreate(title=f"t{i}") for i in range(3)], user_id)
+
+        assert result.committed is True
+        assert [item.status for item in result.results] == ["ok", "ok", "ok"]
+        mock_db.execute.assert_awaited_once()
+        assert len(mock_db.execute.await_args.args[1]) == 3
+        mock_db.commit.assert_awaited_once()
+
+    asyncio.run(run())
+
+
+def test_update_tasks_groups_by_fields_and_rolls_back_atomic_batch_on_missing_row():
+    async def run():
+        user_id, found, missing = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        mock_db = AsyncMock()
+        # The missing id is not in the archive either: set flag, restore nothing, reset flag
+        mock_db.execute = AsyncMock(side_effect=[DummyResult([make_task(found, user_id)]), DummyResult([])] + [DummyResult([])] * 3)
+
+        items = [TaskBatchUpdateItem(id=found, title="x"), TaskBatchUpdateItem(id=missing, priority=2)]
+        result = await update_tasks(mock_db, items, user_id, atomic=True)
+
+        assert result.committed is False
+        assert [item.status for item in result.results] == ["rolled_back", "not_found"]
+        assert "FROM (VALUES" in str(mock_db.execute.await_args_list[0].args[0])
+        mock_db.rollback.assert_awaited_once()
+        mock_db.commit.assert_not_awaited()
+
+    asyncio.run(run())
+
+
+def test_delete_tasks_best_effort_commits_found_rows():
+    async def run():
+        user_id, found, missing = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        mock_db = AsyncMock()
+        mock_db.execute = AsyncMock(side_effect=[DummyResult([found])] + [DummyResult([])] * 3)
+
+        result = await delete_tasks(mock_db, [found, missing], user_id, atomic=False)
+
+        assert result.committed is True
+        assert [item.status for item in result.results] == ["ok", "not_found"]
+        assert "= ANY (" in str(mock_db.execute.await_args_list[0].args[0])
+        mock_db.commit.assert_awaited_once()
+
+    asyncio.run(run())
+
+
+def test_atomic_create_names_the_item_with_a_bad_reference():
+    async def run():
+        user_id = uuid.uuid4()
+        bad = TaskCreate(title="b", project_id=uuid.uuid4())
+
+        async def execute(stmt, params=None):
+            # The multi-row insert fails as a whole; the replay fails on the bad item only
+            rows = params or [stmt.compile().params]
+            if any(row.get("project_id") == bad.project_id for row in rows):
+                raise IntegrityError("INSERT", None, Exception("fk"))
+            return DummyResult([make_task(uuid.uuid4(), user_id)])
+
+        mock_db = AsyncMock()
+        mock_db.execute = execute
+        mock_db.begin_nested = MagicMock(return_value=AsyncMock())
+
+        result = await create_tasks(mock_db, [TaskCreate(title="a"), bad, TaskCreate(title="c")], user_id, atomic=True)
+
+        assert result.committed is False
+        assert [item.status for item in result.results] == ["rolled_back", "error", "rolled_back"]
+        assert result.results[1].error == BATCH_INTEGRITY_ERROR
+        assert mock_db.rollback.await_count == 2
+        mock_db.commit.assert_not_awaited()
+
+    asyncio.run(run())
+
+
+def test_writes_to_archived_tasks_move_them_back_first():
+    async def run():
+        user_id, archived = uuid.uuid4(), uuid.uuid4()
+        statements = []
+
+        async def execute(stmt, params=None, **kwargs):
+            statements.append(str(stmt))
+            if str(stmt) == str(archive.RESTORE):
+                return DummyResult([archived])
+            # The task is only in tasks once it has been restored
+            found = str(archive.RESTORE) in statements
+            task = make_task(archived, user_id) if found else None
+            returned = [archived if "SET deleted_at" in str(stmt) else task] if found else []
+            return MagicMock(scalar_one_or_none=lambda: task, rowcount=len(returned), scalars=lambda: DummyResult(returned))
+
+        for write in (
+            lambda db: update_task(db, archived, TaskUpdate(title="x"), user_id),
+            lambda db: delete_task(db, archived, user_id),
+            lambda db: update_tasks(db, [TaskBatchUpdateItem(id=archived, title="x")], user_id),
+            lambda db: delete_tasks(db, [archived], user_id),
+        ):
+            statements.clear()
+            mock_db = AsyncMock()
+            mock_db.execute = execute
+            result = await write(mock_db)
+
+            assert result and getattr(result, "committed", True)
+            assert statements[1:4] == [str(archive.ARCHIVING), str(archive.RESTORE), str(archive.NOT_ARCHIVING)]
+            assert statements[0].startswith("UPDATE tasks") and statements[4] == statements[0]
+            mock_db.commit.assert_awaited_once()
+
+    asyncio.run(run())
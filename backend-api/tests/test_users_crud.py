@@ -2,7 +2,9 @@ import sys
 import os
 import asyncio
 import uuid
-from unittest.mock import AsyncMock, Mock
+from unittest.mock import AsyncMock
+
+import pytest
 
 # Ensure backend-api package root is on sys.path so imports like `models` work when pytest runs
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -14,12 +16,15 @@ if "passlib" not in sys.modules:
     context_mod = types.ModuleType("passlib.context")
 
     class CryptContext:
-        def __init__(self, schemes=None, deprecated=None):
+        def __init__(self, schemes=None, deprecated=None, **kwargs):
             pass
 
         def hash(self, pwd: str) -> str:
             return f"hashed-{pwd}"
 
+        def verify_and_update(self, pwd: str, hashed: str):
+            return hashed == f"hashed-{pwd}", None
+
     context_mod.CryptContext = CryptContext
     passlib_mod.context = context_mod
     sys.modules["passlib"] = passlib_mod
@@ -27,7 +32,8 @@ if "passlib" not in sys.modules:
 
 from models.models import User
 from schemas.schemas import UserCreate, UserUpdate
-from crud.crud import create_user, get_user_by_email, update_user, delete_user
+from crud.crud import create_user, get_user_by_email, update_user, delete_user, set_password_hash
+from sqlalchemy.exc import IntegrityError
 
 
 class DummyResult:
@@ -38,12 +44,15 @@ class DummyResult:
     def scalar_one_or_none(self):
         return self._value
 
+    def scalar_one(self):
+        return self._value
+
 
-def test_create_user_calls_db_methods():
+def test_create_user_inserts_with_returning_in_one_statement():
     async def run():
+        stored = User(email="test@example.com", password_hash="h")
         mock_db = AsyncMock()
-        # `AsyncSession.add()` is a regular method (not awaited), so mock it with Mock()
-        mock_db.add = Mock()
+        mock_db.execute = AsyncMock(return_value=DummyResult(stored))
         mock_db.commit = AsyncMock()
         mock_db.refresh = AsyncMock()
 
@@ -51,12 +60,28 @@ def test_create_user_calls_db_methods():
 
         created = await create_user(mock_db, user_in)
 
-        assert created.email == "test@example.com"
-        assert hasattr(created, "password_hash")
-        assert created.password_hash != "s3cret"
-        mock_db.add.assert_called()
+        assert created is stored
+        mock_db.execute.assert_awaited_once()
+        stmt = mock_db.execute.await_args.args[0]
+        params = stmt.compile().params
+        assert stmt._returning
+        assert params["email"] == "test@example.com"
+        assert params["password_hash"] != "s3cret"
         mock_db.commit.assert_awaited()
-        mock_db.refresh.assert_awaited()
+        mock_db.refresh.assert_not_awaited()
+
+    asyncio.run(run())
+
+
+def test_create_user_duplicate_email_rolls_back_and_reraises():
+    async def run():
+        mock_db = AsyncMock()
+        mock_db.execute = AsyncMock(side_effect=IntegrityError("INSERT", {}, Exception("duplicate key")))
+        mock_db.rollback = AsyncMock()
+
+        with pytest.raises(IntegrityError):
+            await create_user(mock_db, UserCreate(email="dup@example.com", password="pw"))
+        mock_db.rollback.assert_awaited()
 
     asyncio.run(run())
 
@@ -79,15 +104,16 @@ def test_update_user_returns_updated_user_and_commits():
         user_id = uuid.uuid4()
         updated_user = User(email="updated@example.com", password_hash="h")
 
-        # First execute (the update) can return any object; second (get_user) should return DummyResult(updated_user)
+        # The UPDATE ... RETURNING hands back the row, no follow-up SELECT
         mock_db = AsyncMock()
-        mock_db.execute = AsyncMock(side_effect=[DummyResult(None), DummyResult(updated_user)])
+        mock_db.execute = AsyncMock(return_value=DummyResult(updated_user))
         mock_db.commit = AsyncMock()
 
         upd = UserUpdate(email="updated@example.com", password="newpw")
         result = await update_user(mock_db, user_id, upd)
 
         assert result is updated_user
+        mock_db.execute.assert_awaited_once()
         mock_db.commit.assert_awaited()
 
     asyncio.run(run())
@@ -104,3 +130,19 @@ def test_delete_user_returns_true_when_row_deleted():
         mock_db.commit.assert_awaited()
 
     asyncio.run(run())
+
+
+def test_set_password_hash_skips_deleted_users():
+    async def run():
+        mock_db = AsyncMock()
+        mock_db.execute = AsyncMock(return_value=DummyResult(None, rowcount=0))
+        mock_db.commit = AsyncMock()
+
+        ok = await set_password_hash(mock_db, uuid.uuid4(), "new-hash")
+
+        assert ok is False
+        stmt = mock_db.execute.await_args.args[0]
+        assert "users.deleted_at IS NULL" in str(stmt)
+        mock_db.commit.assert_awaited()
+
+    asyncio.run(run())
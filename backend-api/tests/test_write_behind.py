@@ -0,0 +1,129 @@
+import sys
+import os
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.config import settings
+from crud.memory import MemoryRepository
+from crud.writebehind import WriteBehindBuffer
+from schemas.schemas import TaskCreate, TaskUpdate
+
+
+class CountingRepository(MemoryRepository):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        self.fail = 0
+
+    async def update_tasks(self, items, user_id, atomic=True):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("database unavailable")
+        self.batches.append(items)
+        return await super().update_tasks(items, user_id, atomic)
+
+
+def make_buffer(repo):
+    @asynccontextmanager
+    async def open_repository():
+        yield repo
+
+    return WriteBehindBuffer(open_repository)
+
+
+def test_updates_merge_per_field_and_flush_as_one_batch(monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_flush_ms", 10_000)
+
+    async def run():
+        repo = CountingRepository()
+        buffer = make_buffer(repo)
+        user_id = uuid.uuid4()
+        first = await repo.create_task(TaskCreate(title="a", priority=0), user_id)
+        second = await repo.create_task(TaskCreate(title="b", priority=0), user_id)
+        for priority in (1, 2, 3):
+            buffer.submit(user_id, first.id, TaskUpdate(priority=priority))
+        buffer.submit(user_id, first.id, TaskUpdate(is_completed=True))
+        buffer.submit(user_id, second.id, TaskUpdate(title="renamed"))
+        before = await repo.get_task(first.id, user_id)
+        await buffer.flush(user_id)
+        return repo.batches, before, await repo.get_task(first.id, user_id), await repo.get_task(second.id, user_id), buffer.stats()
+
+    batches, before, first, second, stats = asyncio.run(run())
+
+    assert before.priority == 0
+    assert len(batches) == 1 and len(batches[0]) == 2
+    assert (first.priority, first.is_completed, first.completed_at is not None) == (3, True, True)
+    assert second.title == "renamed" and second.priority == 0
+    assert (stats["queued"], stats["flushes"], stats["written"], stats["pending_tasks"]) == (5, 1, 2, 0)
+
+
+def test_timer_and_op_limit_flush_without_a_read(monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_flush_ms", 5)
+    monkeypatch.setattr(settings, "write_behind_max_ops", 3)
+
+    async def run():
+        repo = CountingRepository()
+        buffer = make_buffer(repo)
+        user_id = uuid.uuid4()
+        task = await repo.create_task(TaskCreate(title="a"), user_id)
+        buffer.submit(user_id, task.id, TaskUpdate(priority=1))
+        await asyncio.sleep(0.05)
+        monkeypatch.setattr(settings, "write_behind_flush_ms", 10_000)
+        for priority in (2, 3, 4):
+            buffer.submit(user_id, task.id, TaskUpdate(priority=priority))
+        await asyncio.sleep(0.01)
+        return [[item.priority for item in batch] for batch in repo.batches]
+
+    assert asyncio.run(run()) == [[1], [4]]
+
+
+def test_failed_write_is_requeued_under_newer_updates_and_close_flushes(monkeypatch):
+    monkeypatch.setattr(settings, "write_behind_flush_ms", 10_000)
+
+    async def run():
+        repo = CountingRepository()
+        buffer = make_buffer(repo)
+        user_id = uuid.uuid4()
+        task = await repo.create_task(TaskCreate(title="a"), user_id)
+        buffer.submit(user_id, task.id, TaskUpdate(title="old", priority=1))
+        repo.fail = 1
+        try:
+            await buffer.flush(user_id)
+        except ConnectionError:
+            pass
+        buffer.submit(user_id, task.id, TaskUpdate(title="new"))
+        await buffer.close()
+        return await repo.get_task(task.id, user_id), buffer.stats()
+
+    task, stats = asyncio.run(run())
+
+    assert (task.title, task.priority) == ("new", 1)
+    assert (stats["errors"], stats["flushes"], stats["pending_users"]) == (1, 1, 0)
+
+
+def test_failed_flush_fails_writes_but_not_reads(monkeypatch):
+    # db.session (under api.writes) builds its default engine at import
+    monkeypatch.setattr(settings, "storage_backend", "memory")
+    from starlette.requests import Request
+    from api import writes
+
+    async def broken_flush(user_id):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(writes.write_behind, "flush", broken_flush)
+    user_id = uuid.uuid4()
+
+    async def settle(method):
+        request = Request({"type": "http", "method": method, "headers": []})
+        async for _ in writes.settle_writes(request, user_id):
+            pass
+
+    asyncio.run(settle("GET"))
+    # A write must not run ahead of queued updates that could not be committed
+    with pytest.raises(ConnectionError):
+        asyncio.run(settle("POST"))